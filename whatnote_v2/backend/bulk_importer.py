@@ -0,0 +1,326 @@
+"""
+批量导入
+把一个目录树或 zip 压缩包中的文件一次性导入展板：文件并行复制到 files 目录并直接写入窗口配置，
+图标按网格统一排列，写入登记为服务端写入，文件监控不会为这些文件逐个创建窗口或重新扫描展板。
+只在分配文件名和写入窗口配置时持有展板写锁；复制期间文件名登记为保留，其他上传和孤立文件补建会跳过这些文件名。
+导入计划（每个文件分配的文件名和窗口ID）可以由调用方保存，中断后按原计划继续，已导入的文件不会重复导入。
+PDF 文本提取和 Office 文档转换由调用方提交到后台任务队列
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import metrics
+from config import IMPORT_ICON_COLUMNS, IMPORT_MAX_EXTRACTED_SIZE, IMPORT_WORKERS
+from conversion_cache import file_sha256
+from storage.upload_stream import get_staging_dir
+
+# 可导入的文件类型 -> 窗口类型（与上传到窗口时的类型一致）
+IMPORT_WINDOW_TYPES = {
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image', '.bmp': 'image', '.webp': 'image',
+    '.mp4': 'video', '.avi': 'video', '.mov': 'video', '.wmv': 'video', '.flv': 'video', '.webm': 'video',
+    '.mp3': 'audio', '.wav': 'audio', '.flac': 'audio', '.aac': 'audio', '.ogg': 'audio',
+    '.pdf': 'pdf',
+    '.doc': 'document', '.docx': 'document', '.ppt': 'document', '.pptx': 'document', '.xls': 'document', '.xlsx': 'document',
+    '.txt': 'text', '.md': 'text',
+}
+
+# 与前端桌面网格一致
+GRID_SIZE = 80
+GRID_MARGIN = 20
+
+
+# 导入计划中保存的字段（source 在继续导入时按 index 重新对应）
+PLAN_KEYS = ("index", "name", "filename", "window_id", "type")
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+def _is_hidden(parts) -> bool:
+    return any(part.startswith('.') or part == '__MACOSX' for part in parts)
+
+
+class BulkImporter:
+    """把目录或 zip 中的文件批量导入展板"""
+
+    def __init__(self, content_manager, workers: int = IMPORT_WORKERS):
+        self.content_manager = content_manager
+        self.workers = workers
+
+    # ---------- 收集文件 ----------
+
+    def _iter_directory(self, source: Path) -> Iterator[Tuple[Path, str]]:
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not _is_hidden([d]))
+            for name in sorted(files):
+                if not _is_hidden([name]):
+                    yield Path(root) / name, name
+
+    def _extract_zip(self, source: Path, work_dir: Path) -> List[Tuple[Optional[Path], str]]:
+        """解压到暂存目录（只取文件名，忽略压缩包内的目录结构，防止路径穿越；解压前检查总大小）"""
+        files = []
+        with zipfile.ZipFile(source) as archive:
+            members = []
+            for index, member in enumerate(archive.infolist()):
+                parts = Path(member.filename).parts
+                if member.is_dir() or not parts or _is_hidden(parts):
+                    continue
+                members.append((index, member, parts[-1]))
+            # 读取时 zipfile 不会超出声明的大小，按声明的大小检查即可
+            extracted_size = sum(member.file_size for _, member, name in members
+                                 if Path(name).suffix.lower() in IMPORT_WINDOW_TYPES)
+            if extracted_size > IMPORT_MAX_EXTRACTED_SIZE:
+                raise ValueError(f"解压后的大小超过限制: {extracted_size} > {IMPORT_MAX_EXTRACTED_SIZE} 字节")
+            for index, member, name in members:
+                if Path(name).suffix.lower() not in IMPORT_WINDOW_TYPES:
+                    # 不支持的类型不解压，只计入跳过的文件数
+                    files.append((None, name))
+                    continue
+                target = work_dir / f"{index}_{name}"
+                with archive.open(member) as src, open(target, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                files.append((target, name))
+        return files
+
+    # ---------- 导入 ----------
+
+    def run(self, board_id: str, source: str,
+            progress: Optional[Callable[[int, int, str], None]] = None,
+            should_cancel: Optional[Callable[[], bool]] = None,
+            resume_plan: Optional[List[Dict]] = None,
+            on_plan: Optional[Callable[[List[Dict]], None]] = None) -> Dict:
+        """
+        导入目录或 zip，返回 {"windows": [...], "imported", "skipped", "failed", "seconds", "files_per_second"}
+
+        on_plan(plan) 在开始复制前收到可JSON序列化的导入计划；中断后把它作为 resume_plan 传回即可继续：
+        已写入窗口配置的文件直接计入结果，其余文件按原来分配的文件名重新复制
+        """
+        source = Path(source)
+        if not source.exists():
+            raise FileNotFoundError(f"导入源不存在: {source}")
+        board_dir = self.content_manager.file_manager.get_board_dir(board_id)
+        if not board_dir:
+            raise ValueError(f"展板不存在: {board_id}")
+        files_dir = board_dir / "files"
+        files_dir.mkdir(exist_ok=True)
+
+        work_dir = None
+        try:
+            if source.is_dir():
+                candidates = list(self._iter_directory(source))
+                move = False
+            elif zipfile.is_zipfile(source):
+                work_dir = Path(tempfile.mkdtemp(dir=get_staging_dir(board_dir)))
+                candidates = self._extract_zip(source, work_dir)
+                move = True
+            else:
+                raise ValueError(f"导入源必须是目录或zip文件: {source}")
+
+            files = [(path, name) for path, name in candidates if Path(name).suffix.lower() in IMPORT_WINDOW_TYPES]
+            skipped = len(candidates) - len(files)
+            # 分配文件名时独占展板，并保留这些文件名直到窗口配置写入，避免与上传或另一批导入的文件名冲突
+            content_manager = self.content_manager
+            with content_manager.locks.write(board_id):
+                if resume_plan is None:
+                    plan, done = self._plan(board_id, files_dir, files), []
+                else:
+                    plan, done = self._resume_plan(files_dir, files, resume_plan)
+                content_manager.reserve_filenames(board_id, [item["filename"] for item in plan])
+            if on_plan is not None and resume_plan is None:
+                on_plan([{key: item[key] for key in PLAN_KEYS} for item in plan])
+            try:
+                # 复制文件不持有展板锁，同一展板的读取和其他修改不必等待整批复制完成
+                copied, failed, seconds, cancelled = self._import_files(
+                    board_id, files_dir, plan, move, progress, should_cancel)
+                with content_manager.locks.write(board_id):
+                    windows = [self._existing_window(item) for item in done]
+                    windows += [self._write_window(files_dir, item) for item in copied]
+            finally:
+                content_manager.release_filenames(board_id, [item["filename"] for item in plan])
+            self._layout_icons(board_id, windows)
+            if cancelled:
+                # 已复制的文件保留为窗口
+                raise ImportCancelled()
+        finally:
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        return {
+            "windows": windows,
+            "imported": len(windows),
+            "skipped": skipped,
+            "failed": failed,
+            "seconds": round(seconds, 3),
+            "files_per_second": round(len(windows) / seconds, 1) if seconds > 0 else 0.0,
+        }
+
+    def _plan(self, board_id: str, files_dir: Path, files: List[Tuple[Path, str]]) -> List[Dict]:
+        """一次列出 files 目录，在内存中分配不冲突的文件名和窗口ID"""
+        taken = {entry.name for entry in files_dir.iterdir()}
+        timestamp = int(time.time() * 1000)
+        window_index = self.content_manager.window_index
+        plan = []
+        for index, (path, name) in enumerate(files):
+            stem = self.content_manager._sanitize_filename(Path(name).stem)
+            extension = Path(name).suffix
+            filename = f"{stem}{extension}"
+            counter = 1
+            # 同时避开内容文件、它的配置文件名和其他导入保留的文件名
+            while filename in taken or f"{filename}.json" in taken \
+                    or self.content_manager.is_filename_reserved(board_id, filename):
+                filename = f"{stem}({counter}){extension}"
+                counter += 1
+            taken.add(filename)
+            taken.add(f"{filename}.json")
+
+            window_id = f"window_{timestamp}_{index}"
+            while window_index.lookup(window_id):
+                timestamp += 1
+                window_id = f"window_{timestamp}_{index}"
+            plan.append({
+                "index": index,
+                "name": name,
+                "source": path,
+                "filename": filename,
+                "window_id": window_id,
+                "type": IMPORT_WINDOW_TYPES[extension.lower()],
+            })
+        return plan
+
+    def _resume_plan(self, files_dir: Path, files: List[Tuple[Path, str]],
+                     saved_plan: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """按保存的计划继续导入，返回 (还需要复制的计划项, 已导入的计划项)"""
+        plan, done = [], []
+        for saved in saved_plan:
+            index = saved["index"]
+            if index >= len(files) or files[index][1] != saved["name"]:
+                raise ValueError("导入源在上次导入后发生了变化，无法继续导入")
+            item = dict(saved, source=files[index][0])
+            if self.content_manager._sidecar_exists(files_dir / f"{item['filename']}.json"):
+                done.append(item)
+            else:
+                # 上次可能只复制了一部分
+                item["resumed"] = True
+                plan.append(item)
+        print(f"继续上次的批量导入: 已导入 {len(done)} 个文件，还需导入 {len(plan)} 个")
+        return plan, done
+
+    def _import_one(self, board_id: str, files_dir: Path, item: Dict, move: bool) -> Dict:
+        """复制单个文件（不持有展板锁，文件名已保留）"""
+        content_manager = self.content_manager
+        target = files_dir / item["filename"]
+        if item.get("resumed") and target.exists():
+            content_manager._unlink_board_file(target)
+        sha256 = None
+        if content_manager.blob_store and content_manager.blob_store.accepts(item["filename"]):
+            sha256 = file_sha256(item["source"])
+        with content_manager.write_intents.writing(target):
+            content_manager._place_file(str(item["source"]), target, move=move, sha256=sha256)
+        return item
+
+    @staticmethod
+    def _existing_window(item: Dict) -> Dict:
+        """上次已导入的文件对应的窗口（用于提交后续任务和排列图标）"""
+        return {"id": item["window_id"], "title": item["filename"], "type": item["type"],
+                "file_path": f"files/{item['filename']}"}
+
+    def _write_window(self, files_dir: Path, item: Dict) -> Dict:
+        """写入已复制文件的窗口配置（持有展板写锁时调用）"""
+        now = datetime.now().isoformat()
+        window_data = {
+            "id": item["window_id"],
+            "title": item["filename"],
+            "type": item["type"],
+            "x": 100,
+            "y": 100,
+            "width": 400,
+            "height": 300,
+            "hidden": True,
+            "file_path": f"files/{item['filename']}",
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.content_manager._write_window_json(files_dir / f"{item['filename']}.json", window_data)
+        return window_data
+
+    def _import_files(self, board_id: str, files_dir: Path, plan: List[Dict], move: bool,
+                      progress, should_cancel) -> Tuple[List[Dict], int, float, bool]:
+        """并行复制文件，返回 (已复制的计划项, 失败数, 耗时, 是否被取消)"""
+        total = len(plan)
+        copied: List[Dict] = []
+        failed = 0
+        cancelled = False
+        started = time.monotonic()
+        if progress:
+            progress(0, total, f"准备导入 {total} 个文件")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk-import") as executor:
+            futures = [executor.submit(self._import_one, board_id, files_dir, item, move) for item in plan]
+            for done, future in enumerate(futures, start=1):
+                if should_cancel and should_cancel():
+                    # 未开始的文件不再复制，正在复制的文件完成后一并写入窗口配置
+                    cancelled = True
+                    for pending in futures[done - 1:]:
+                        pending.cancel()
+                    for pending in futures[done - 1:]:
+                        if not pending.cancelled() and pending.exception() is None:
+                            copied.append(pending.result())
+                    break
+                try:
+                    copied.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    print(f"导入文件失败: {plan[done - 1]['source']}, 错误: {e}")
+                if progress:
+                    elapsed = time.monotonic() - started
+                    rate = done / elapsed if elapsed > 0 else 0.0
+                    progress(done, total, f"已导入 {done}/{total} 个文件，{rate:.1f} 文件/秒")
+
+        seconds = time.monotonic() - started
+        metrics.increment("bulk_import.files", len(copied))
+        metrics.observe("bulk_import.files_per_second", len(copied) / seconds if seconds > 0 else 0.0)
+        print(f"批量导入完成: {len(copied)} 个文件，失败 {failed} 个，耗时 {seconds:.1f} 秒")
+        return copied, failed, seconds, cancelled
+
+    def _layout_icons(self, board_id: str, windows: List[Dict]):
+        """把新窗口的图标按行优先排列在已占用网格之后，一次写入图标位置文件"""
+        if not windows:
+            return
+        positions = self.content_manager.get_icon_positions(board_id)
+        occupied = set()
+        for item in positions.values():
+            grid = (item or {}).get("gridPosition") or {}
+            if "gridX" in grid and "gridY" in grid:
+                occupied.add((grid["gridX"], grid["gridY"]))
+
+        cells = self._free_cells(occupied)
+        icon_positions = [{"windowId": window_id, **item} for window_id, item in positions.items()]
+        for window in windows:
+            if window["id"] in positions:
+                # 继续上次的导入时，已排列过的图标保持不动
+                continue
+            grid_x, grid_y = next(cells)
+            icon_positions.append({
+                "windowId": window["id"],
+                "position": {"x": GRID_MARGIN + grid_x * GRID_SIZE, "y": GRID_MARGIN + grid_y * GRID_SIZE},
+                "gridPosition": {"gridX": grid_x, "gridY": grid_y},
+            })
+        self.content_manager.save_icon_positions(board_id, icon_positions)
+
+    @staticmethod
+    def _free_cells(occupied) -> Iterator[Tuple[int, int]]:
+        row = 0
+        while True:
+            for col in range(IMPORT_ICON_COLUMNS):
+                if (col, row) not in occupied:
+                    yield col, row
+            row += 1
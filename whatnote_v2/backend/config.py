@@ -16,4 +16,124 @@ WS_PORT = 8001
 
 # 日志配置
 LOG_LEVEL = "INFO"
-LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s" 
\ No newline at end of file
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s" 
+# 孤立文件后台补建配置（秒）
+ORPHAN_RECONCILE_MIN_INTERVAL = 5.0   # 同一展板两次补建的最小间隔
+ORPHAN_RECONCILE_SETTLE_DELAY = 1.0   # 文件事件后等待写入稳定的时间
+ORPHAN_SWEEP_INTERVAL = 300.0         # 全量巡检间隔
+
+# 存储I/O线程池大小（阻塞的文件操作在此线程池中执行，避免阻塞事件循环）
+STORAGE_IO_WORKERS = 8
+
+# 上传配置
+MAX_UPLOAD_SIZE = 4 * 1024 * 1024 * 1024  # 单个文件上限 4GB
+UPLOAD_CHUNK_SIZE = 1024 * 1024           # 流式写入分块大小 1MB
+UPLOAD_SESSION_CHUNK_SIZE = 8 * 1024 * 1024  # 分块上传建议的分块大小 8MB
+UPLOAD_SESSION_TTL = 24 * 60 * 60            # 未完成的上传会话保留 24 小时
+UPLOAD_DEDUP_PROOF_BYTES = 4096               # 按哈希去重时客户端需要提交的随机区间长度（证明确实持有该内容）
+
+# 内容寻址存储（可选）：相同内容的上传文件在展板间以硬链接共享
+BLOB_STORE_ENABLED = False
+BLOB_STORE_EXCLUDE_EXTENSIONS = [".txt", ".md"]  # 文本文件会被原地编辑，不共享
+
+# PDF文本提取配置
+PDF_EXTRACT_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # 提取进程数
+PDF_EXTRACT_PAGES_PER_TASK = 20                          # 每个提取任务处理的页数
+PDF_EXTRACT_MAX_ATTEMPTS = 3                             # 提取失败的页自动重试到的总次数（手动重新提取不受限制）
+
+# 后台任务队列配置（文档转换、PDF文本提取）
+JOB_CONCURRENCY = 2          # 同时执行的任务数
+JOB_HISTORY_LIMIT = 200      # 保留的已结束任务记录数
+JOB_PROGRESS_INTERVAL = 0.5  # 进度广播的最小间隔（秒）
+
+# LibreOffice 转换进程池配置
+OFFICE_BINARY = None                                   # soffice 路径，None 时在 PATH 中查找
+OFFICE_POOL_SIZE = max(1, min(4, (os.cpu_count() or 2) // 2))  # 常驻工作进程数
+OFFICE_JOB_TIMEOUT = 120            # 单个文件转换超时（秒）
+OFFICE_WORKER_MAX_JOBS = 50         # 工作进程处理多少个文件后回收重启
+OFFICE_WORKER_START_TIMEOUT = 30    # 等待工作进程启动的时间（秒）
+
+# 文档转换结果缓存（按文档哈希，LRU淘汰）
+CONVERSION_CACHE_ENABLED = True
+CONVERSION_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 缓存上限 2GB
+CONVERSION_CACHE_INDEX_SAVE_INTERVAL = 60.0  # 命中只更新内存中的使用时间，最多每隔多少秒写一次索引
+
+# 文档转PDF时各平台的后端尝试顺序（后端依赖的模块在第一次使用时才导入）
+# 可用后端: office_com, print_driver, pandoc, libreoffice, docx_html
+CONVERTER_FALLBACK_ORDER = {
+    "win32": {
+        "word": ["office_com", "print_driver", "pandoc", "libreoffice"],
+        "powerpoint": ["office_com", "print_driver", "libreoffice"],
+        "excel": ["office_com", "libreoffice"],
+    },
+    "default": {
+        "word": ["libreoffice", "pandoc"],
+        "powerpoint": ["libreoffice"],
+        "excel": ["libreoffice"],
+    },
+}
+
+# WebSocket发送配置：每个连接有自己的有界发送队列和发送协程
+WS_OUTBOX_SIZE = 256                  # 每个连接最多排队的消息数
+WS_SLOW_CONSUMER_POLICY = "coalesce"  # 队列满时: drop_oldest（丢弃最旧）、coalesce（合并同类消息后丢弃最旧）、disconnect（断开）
+WS_SEND_TIMEOUT = 10.0                # 单条消息发送超时（秒），超时视为连接失效
+
+# 文件监控事件合并：同一展板在该时间窗口（秒）内的文件事件合并为净变化后一起处理
+WATCHER_BATCH_WINDOW = 0.3
+
+# 服务端写入意图：写入结束后在该时间（秒）内到达的同一路径事件视为服务端自己的写入，文件监控直接忽略
+WRITE_INTENT_GRACE = 1.0
+WRITE_INTENT_MAX_ENTRIES = 10000  # 超过该条目数时清理已过期的意图
+
+# 文件修改通知的尾沿防抖：连续修改在最后一次修改后延迟（秒）再通知，按扩展名配置
+WATCHER_DEBOUNCE_DELAYS = {
+    ".md": 0.5,
+    ".txt": 0.5,
+    ".json": 0.5,
+    ".pdf": 2.0,
+    ".mp4": 3.0,
+    ".mov": 3.0,
+}
+WATCHER_DEBOUNCE_DEFAULT = 1.0       # 其他扩展名的延迟
+WATCHER_DEBOUNCE_MAX_WAIT = 10.0     # 持续修改时最长等待时间，超过后立即通知
+WATCHER_DEBOUNCE_MAX_PENDING = 10000 # 待通知文件数上限，超出时提前通知最早到期的文件
+
+# 批量导入
+IMPORT_WORKERS = 8          # 并行复制文件的线程数
+IMPORT_ICON_COLUMNS = 12    # 导入的图标每行排列的数量
+IMPORT_MAX_EXTRACTED_SIZE = 16 * 1024 * 1024 * 1024  # zip 解压后的总大小上限 16GB
+# 导入 API 允许按路径导入的本机目录（其下的目录或 zip）；为空时 API 只接受上传的 zip，
+# 按路径导入请停止后端后使用 import_files.py --offline
+IMPORT_ALLOWED_ROOTS = []
+
+# 元数据存储后端: json（每个窗口一个 JSON 配置文件，默认）或 sqlite（课程、展板、窗口配置、图标位置、回收站、对话记录保存在 SQLite 中）
+METADATA_BACKEND = "json"
+METADATA_DB_FILE = DATA_DIR / "metadata.db"
+# sqlite 后端下是否同时写出 JSON 配置文件，保持数据目录可直接阅读；关闭后可用 migrate_metadata.py export 按需导出
+METADATA_SIDECAR_EXPORT = True
+
+# 原子写入（临时文件 + rename）的持久性，按调用位置配置:
+# strict（fsync 文件并立即 fsync 目录）、normal（fsync 文件，目录 fsync 批量执行）、relaxed（不 fsync，只保证原子替换）
+ATOMIC_WRITE_DURABILITY = {
+    "trash_info": "strict",
+    "window_config": "normal",
+    "window_content": "normal",
+    "conversation": "normal",
+    "course_info": "normal",
+    "board_info": "normal",
+    "icon_positions": "relaxed",
+    "pdf_manifest": "normal",
+    "pdf_page": "normal",
+    "upload_session": "normal",
+    "job_record": "normal",
+    "window_index": "relaxed",   # 丢失后可以从配置文件重建
+    "conversion_cache": "relaxed",  # 转换缓存索引，丢失后只是缓存失效
+}
+ATOMIC_DIR_SYNC_INTERVAL = 1.0  # normal 级别下目录 fsync 的合并间隔（秒）
+
+# 文本窗口内容的延迟写入：编辑器按键级别的纯内容保存先进入内存缓冲，合并后再写盘
+AUTOSAVE_ENABLED = True
+AUTOSAVE_IDLE_SECONDS = 1.0                   # 最后一次修改后空闲多久写盘
+AUTOSAVE_MAX_DELAY_SECONDS = 5.0              # 持续修改时最长多久写一次盘
+AUTOSAVE_MAX_PENDING_BYTES = 8 * 1024 * 1024  # 缓冲内容总量上限，超过后立即写盘
+AUTOSAVE_RETRY_SECONDS = 5.0                  # 写盘失败后多久重试
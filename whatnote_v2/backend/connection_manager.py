@@ -0,0 +1,242 @@
+"""
+WebSocket连接管理
+客户端按展板或课程订阅事件，带 board_id 的事件只发送给订阅了该展板、其所属课程或全部事件的连接。
+订阅关系保存在 主题 -> 连接集合 的注册表中，按主题查找接收者是 O(1)，不需要遍历所有连接。
+
+每个连接有自己的有界发送队列和发送协程：广播只是把消息放入各连接的队列，慢客户端不会拖慢其他客户端。
+队列满时按 WS_SLOW_CONSUMER_POLICY 处理（丢弃最旧、合并同类消息或断开连接）
+"""
+
+import asyncio
+import itertools
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+import metrics
+from config import WS_OUTBOX_SIZE, WS_SEND_TIMEOUT, WS_SLOW_CONSUMER_POLICY
+from logger import info, error
+
+# 订阅全部事件的主题（调试控制台使用）
+TOPIC_ALL = "*"
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_COALESCE = "coalesce"
+POLICY_DISCONNECT = "disconnect"
+
+
+def board_topic(board_id: str) -> str:
+    return f"board:{board_id}"
+
+
+def course_topic(course_id: str) -> str:
+    return f"course:{course_id}"
+
+
+class Outbox:
+    """单个连接的有界发送队列，由独立的发送协程消费"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket: WebSocket, on_failure: Callable[[WebSocket], None],
+                 max_size: int = WS_OUTBOX_SIZE, policy: str = WS_SLOW_CONSUMER_POLICY):
+        self.id = next(self._ids)
+        self.websocket = websocket
+        self.max_size = max_size
+        self.policy = policy
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        # (合并键, 消息)
+        self._queue: Deque[Tuple[Optional[str], str]] = deque()
+        self._ready = asyncio.Event()
+        self._on_failure = on_failure
+        self._task = asyncio.get_event_loop().create_task(self._writer())
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def put(self, message: str, coalesce_key: Optional[str] = None) -> bool:
+        """放入消息（不等待发送），返回False表示按策略需要断开该连接"""
+        if coalesce_key and self.policy == POLICY_COALESCE:
+            # 队列中同一键的旧消息已经过时（如同一任务的进度）：移除旧消息，新消息排到队尾保持顺序
+            for index, (key, _) in enumerate(self._queue):
+                if key == coalesce_key:
+                    del self._queue[index]
+                    self._queue.append((coalesce_key, message))
+                    self.coalesced += 1
+                    metrics.increment("ws.coalesced")
+                    return True
+
+        if len(self._queue) >= self.max_size:
+            if self.policy == POLICY_DISCONNECT:
+                metrics.increment("ws.slow_disconnects")
+                return False
+            self._queue.popleft()
+            self.dropped += 1
+            metrics.increment("ws.dropped")
+
+        self._queue.append((coalesce_key, message))
+        self._ready.set()
+        return True
+
+    async def _writer(self):
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                _, message = self._queue.popleft()
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(message), WS_SEND_TIMEOUT)
+                    self.sent += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error(f"发送消息失败: {e}")
+                    metrics.increment("ws.send_failures")
+                    self._on_failure(self.websocket)
+                    return
+            self._ready.clear()
+
+    def close(self):
+        self._task.cancel()
+        self._queue.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "id": self.id,
+            "queue_depth": self.depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+class ConnectionManager:
+    def __init__(self, course_resolver: Optional[Callable[[str], Optional[str]]] = None):
+        self.active_connections: List[WebSocket] = []
+        # 主题 -> 订阅该主题的连接；连接 -> 已订阅的主题（断开时清理）
+        self._subscribers: Dict[str, Set[WebSocket]] = {}
+        self._topics: Dict[WebSocket, Set[str]] = {}
+        self._outboxes: Dict[WebSocket, Outbox] = {}
+        # board_id -> course_id，用于把展板事件同时投递给课程订阅者
+        self.course_resolver = course_resolver
+
+    async def connect(self, websocket: WebSocket):
+        await websocket.accept()
+        self.active_connections.append(websocket)
+        self._topics[websocket] = set()
+        self._outboxes[websocket] = Outbox(websocket, self.disconnect)
+        metrics.set_gauge("ws.connections", len(self.active_connections))
+        info(f"WebSocket连接已建立，当前连接数: {len(self.active_connections)}")
+
+    def disconnect(self, websocket: WebSocket):
+        for topic in self._topics.pop(websocket, set()):
+            self._remove_subscriber(topic, websocket)
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox:
+            outbox.close()
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+            metrics.set_gauge("ws.connections", len(self.active_connections))
+            info(f"WebSocket连接已断开，当前连接数: {len(self.active_connections)}")
+
+    # ---------- 订阅 ----------
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        connection_topics = self._topics.setdefault(websocket, set())
+        for topic in topics:
+            self._subscribers.setdefault(topic, set()).add(websocket)
+            connection_topics.add(topic)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]):
+        connection_topics = self._topics.get(websocket, set())
+        for topic in topics:
+            connection_topics.discard(topic)
+            self._remove_subscriber(topic, websocket)
+
+    def _remove_subscriber(self, topic: str, websocket: WebSocket):
+        subscribers = self._subscribers.get(topic)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def subscriptions(self, websocket: WebSocket) -> Dict:
+        """连接当前的订阅（按展板、课程分组）"""
+        topics = self._topics.get(websocket, set())
+        return {
+            "boards": sorted(t.split(":", 1)[1] for t in topics if t.startswith("board:")),
+            "courses": sorted(t.split(":", 1)[1] for t in topics if t.startswith("course:")),
+            "all": TOPIC_ALL in topics,
+        }
+
+    @staticmethod
+    def topics_from_request(data: Dict) -> List[str]:
+        """从订阅请求 {"boards": [...], "courses": [...], "all": bool} 中解析主题"""
+        topics = [board_topic(board_id) for board_id in data.get("boards") or []]
+        topics += [course_topic(course_id) for course_id in data.get("courses") or []]
+        if data.get("all"):
+            topics.append(TOPIC_ALL)
+        return topics
+
+    def recipients(self, board_id: str) -> Set[WebSocket]:
+        """展板事件的接收者：订阅了该展板、所属课程或全部事件的连接"""
+        recipients = set(self._subscribers.get(board_topic(board_id), ()))
+        recipients |= self._subscribers.get(TOPIC_ALL, set())
+        course_id = self.course_resolver(board_id) if self.course_resolver else None
+        if course_id:
+            recipients |= self._subscribers.get(course_topic(course_id), set())
+        return recipients
+
+    # ---------- 发送 ----------
+
+    async def send_personal_message(self, message: str, websocket: WebSocket):
+        self._send_all([websocket], message)
+
+    async def publish(self, message: str, board_id: Optional[str] = None, coalesce_key: Optional[str] = None):
+        """发送事件：带 board_id 的只发给订阅者，否则发给所有连接
+
+        coalesce_key 相同的消息在慢连接的队列中只保留最新一条（如同一任务的进度）
+        """
+        if board_id is None:
+            self._send_all(list(self.active_connections), message, coalesce_key)
+        else:
+            self._send_all(self.recipients(board_id), message, coalesce_key)
+
+    async def broadcast(self, message: str, coalesce_key: Optional[str] = None):
+        self._send_all(list(self.active_connections), message, coalesce_key)
+
+    def _send_all(self, connections: Iterable[WebSocket], message: str, coalesce_key: Optional[str] = None):
+        """放入各连接的发送队列，由各自的发送协程并发发送"""
+        slow_connections = []
+        for connection in connections:
+            outbox = self._outboxes.get(connection)
+            if outbox and not outbox.put(message, coalesce_key):
+                slow_connections.append(connection)
+
+        # 按策略断开跟不上的连接
+        for connection in slow_connections:
+            info("WebSocket连接发送队列已满，断开连接")
+            self.disconnect(connection)
+            asyncio.get_event_loop().create_task(self._close(connection))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
+
+    def stats(self) -> Dict:
+        """各连接的发送队列状态"""
+        connections = [outbox.stats() for outbox in self._outboxes.values()]
+        return {
+            "connections": len(connections),
+            "topics": len(self._subscribers),
+            "max_queue_depth": max((c["queue_depth"] for c in connections), default=0),
+            "dropped": sum(c["dropped"] for c in connections),
+            "coalesced": sum(c["coalesced"] for c in connections),
+            "per_connection": connections,
+        }
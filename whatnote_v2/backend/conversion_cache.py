@@ -0,0 +1,159 @@
+"""
+文档转换结果缓存
+按 源文件SHA-256 + 转换器版本 缓存转换输出（PDF/HTML/文本），重复上传同一文档时直接复制缓存结果。
+缓存总大小超过上限时按最近使用时间淘汰（LRU），索引保存在缓存目录的 index.json：
+新增和淘汰条目时立即写入，命中只更新内存中的使用时间，按间隔合并写入（关闭时 flush）
+"""
+
+import hashlib
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+import metrics
+from config import CONVERSION_CACHE_INDEX_SAVE_INTERVAL, CONVERSION_CACHE_MAX_BYTES
+from storage.atomic_write import atomic_write_json
+
+INDEX_FILE = "index.json"
+
+
+def file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ConversionCache:
+    """转换结果的磁盘缓存"""
+
+    def __init__(self, cache_dir: Path, version: str, max_bytes: int = CONVERSION_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.version = version
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._hits = 0
+        self._misses = 0
+        self._bytes_saved = 0
+        # 命中后尚未写入索引的使用时间
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+
+    def _key(self, sha256: str) -> str:
+        return hashlib.sha256(f"{sha256}:{self.version}".encode()).hexdigest()
+
+    def _load(self):
+        """读取索引，丢弃文件已丢失的条目和索引之外的目录"""
+        try:
+            with open(self.cache_dir / INDEX_FILE, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        for key, entry in entries.items():
+            if (self.cache_dir / key / entry["filename"]).exists():
+                self._entries[key] = entry
+        for entry_dir in self.cache_dir.iterdir():
+            if entry_dir.is_dir() and entry_dir.name not in self._entries:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+        self._save()
+
+    def _save(self):
+        atomic_write_json(self.cache_dir / INDEX_FILE, self._entries, kind="conversion_cache", indent=None)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def flush(self):
+        """写入命中后尚未保存的使用时间"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def get(self, sha256: str, output_path: Path) -> Optional[str]:
+        """命中时把缓存结果复制为 output_path 的文件名 + 缓存结果的扩展名，返回该路径"""
+        key = self._key(sha256)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                metrics.increment("conversion_cache.misses")
+                return None
+            cached_file = self.cache_dir / key / entry["filename"]
+            target = Path(output_path).with_suffix(Path(entry["filename"]).suffix)
+            try:
+                shutil.copy2(cached_file, target)
+            except OSError as e:
+                print(f"读取转换缓存失败: {cached_file}, 错误: {e}")
+                self._entries.pop(key, None)
+                self._save()
+                self._misses += 1
+                metrics.increment("conversion_cache.misses")
+                return None
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            self._dirty = True
+            if time.monotonic() - self._last_save >= CONVERSION_CACHE_INDEX_SAVE_INTERVAL:
+                self._save()
+            self._hits += 1
+            self._bytes_saved += entry["size"]
+        metrics.increment("conversion_cache.hits")
+        metrics.increment("conversion_cache.bytes_saved", entry["size"])
+        return str(target)
+
+    def put(self, sha256: str, result_path: Path):
+        """缓存转换结果（复制一份），必要时淘汰最久未使用的条目"""
+        result_path = Path(result_path)
+        size = result_path.stat().st_size
+        if size > self.max_bytes:
+            return
+        key = self._key(sha256)
+        entry_dir = self.cache_dir / key
+        with self._lock:
+            if entry_dir.exists():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            entry_dir.mkdir()
+            shutil.copy2(result_path, entry_dir / result_path.name)
+            self._entries[key] = {
+                "filename": result_path.name,
+                "size": size,
+                "created_at": time.time(),
+                "last_used": time.time(),
+                "hits": 0,
+            }
+            self._evict()
+            self._save()
+        metrics.increment("conversion_cache.stored")
+
+    def _evict(self):
+        """按最近使用时间淘汰，直到总大小不超过上限"""
+        total = self._total_bytes()
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.cache_dir / key, ignore_errors=True)
+            del self._entries[key]
+            total -= entry["size"]
+            metrics.increment("conversion_cache.evicted")
+
+    def stats(self) -> Dict:
+        """缓存统计：条目数、占用字节数、命中率和节省的输出字节数"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "bytes_saved": self._bytes_saved,
+            }
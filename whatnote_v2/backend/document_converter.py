@@ -1,23 +1,122 @@
 """
 文档转换服务
 支持Word文档转换为PDF
+
+各转换后端（Office COM、打印驱动、pandoc、LibreOffice、python-docx）依赖的模块在第一次使用时才导入，
+按平台配置的顺序依次尝试（config.CONVERTER_FALLBACK_ORDER）
 """
+import importlib
 import os
+import sys
 import tempfile
+import threading
 from pathlib import Path
-from typing import Optional
-import pypandoc
-from docx import Document
+from typing import Dict, List, Optional
 import subprocess
 import shutil
-import docx2txt
-import win32com.client
 import time
+import metrics
+from config import CONVERSION_CACHE_ENABLED, CONVERTER_FALLBACK_ORDER, DATA_DIR
+from conversion_cache import ConversionCache, file_sha256
+from office_pool import OfficeWorkerPool, find_office_binary
+
+# 转换器版本：转换逻辑变化时递增，旧的缓存结果随之失效
+CONVERTER_VERSION = "2"
+
+# 转换后端：支持的平台（未指定为所有平台）、依赖的模块、依赖的可执行文件、自定义探测函数
+CONVERTER_BACKENDS = {
+    "office_com": {"platforms": ["win32"], "module": "win32com.client"},
+    "print_driver": {"platforms": ["win32"], "binary": "powershell"},
+    "pandoc": {"module": "pypandoc"},
+    "libreoffice": {"probe": find_office_binary},
+    "docx_html": {"module": "docx"},
+    "docx_text": {"module": "docx2txt"},
+}
+
+# 各文档类型转PDF时，每个后端对应的转换方法
+PDF_CONVERTERS = {
+    "word": {
+        "office_com": "_convert_with_office_com",
+        "print_driver": "_convert_with_print_driver",
+        "pandoc": "_convert_with_pandoc",
+        "libreoffice": "_convert_with_libreoffice",
+        "docx_html": "_convert_with_docx_to_html",
+    },
+    "powerpoint": {
+        "office_com": "_convert_ppt_with_office_com",
+        "print_driver": "_convert_ppt_with_print_driver",
+        "libreoffice": "_convert_with_libreoffice",
+    },
+    "excel": {
+        "office_com": "_convert_excel_with_office_com",
+        "libreoffice": "_convert_with_libreoffice",
+    },
+}
+
+
+class ConverterBackends:
+    """转换后端注册表：每个后端第一次使用时才探测可用性并导入依赖模块，结果缓存"""
+
+    def __init__(self, platform: str = sys.platform):
+        self.platform = platform
+        self._modules: Dict[str, object] = {}
+        self._available: Dict[str, bool] = {}
+        self._lock = threading.RLock()
+
+    def load(self, name: str):
+        """导入后端依赖的模块（只导入一次），返回模块对象"""
+        module_name = CONVERTER_BACKENDS[name].get("module")
+        if not module_name:
+            return None
+        with self._lock:
+            if module_name not in self._modules:
+                with metrics.timer(f"converter.import.{name}"):
+                    self._modules[module_name] = importlib.import_module(module_name)
+            return self._modules[module_name]
+
+    def available(self, name: str) -> bool:
+        """探测后端在当前平台是否可用"""
+        with self._lock:
+            if name in self._available:
+                return self._available[name]
+            spec = CONVERTER_BACKENDS.get(name, {})
+            ok = bool(spec)
+            reason = "未知的转换后端"
+            if ok and spec.get("platforms") and self.platform not in spec["platforms"]:
+                ok, reason = False, f"不支持当前平台 {self.platform}"
+            if ok and spec.get("binary") and not shutil.which(spec["binary"]):
+                ok, reason = False, f"未找到 {spec['binary']}"
+            if ok and spec.get("probe") and not spec["probe"]():
+                ok, reason = False, "探测失败"
+            if ok and spec.get("module"):
+                try:
+                    self.load(name)
+                except Exception as e:
+                    ok, reason = False, f"无法导入 {spec['module']}: {e}"
+            if not ok:
+                print(f"转换后端 {name} 不可用: {reason}")
+            self._available[name] = ok
+            return ok
+
+    def order(self, file_type: str) -> List[str]:
+        """当前平台下该文档类型的后端尝试顺序"""
+        orders = CONVERTER_FALLBACK_ORDER.get(self.platform) or CONVERTER_FALLBACK_ORDER["default"]
+        return orders.get(file_type, [])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"platform": self.platform, "available": dict(self._available), "loaded": list(self._modules)}
+
 
 class DocumentConverter:
     def __init__(self):
         self.temp_dir = Path(tempfile.gettempdir()) / "whatnote_converter"
         self.temp_dir.mkdir(exist_ok=True)
+        self.backends = ConverterBackends()
+        # 常驻的LibreOffice工作进程池，首次使用时启动
+        self.office_pool = OfficeWorkerPool()
+        # 按文档哈希缓存转换结果，重复上传的文档不再转换
+        self.cache = ConversionCache(DATA_DIR / "conversion_cache", CONVERTER_VERSION) if CONVERSION_CACHE_ENABLED else None
     
     def convert_office_to_pdf(self, file_path: str, output_dir: str) -> Optional[str]:
         """
@@ -44,19 +143,29 @@ class DocumentConverter:
             pdf_filename = file_path_obj.stem + ".pdf"
             pdf_path = Path(output_dir) / pdf_filename
             
-            print(f"开始转换{file_type}文档: {file_path_obj.name} -> {pdf_filename}")
-            
-            # 根据文件类型选择转换方法
-            if file_type == 'word':
-                return self._convert_word_to_pdf(file_path_obj, pdf_path)
-            elif file_type == 'powerpoint':
-                return self._convert_ppt_to_pdf(file_path_obj, pdf_path)
-            elif file_type == 'excel':
-                return self._convert_excel_to_pdf(file_path_obj, pdf_path)
-            else:
+            if file_type == 'unknown':
                 print(f"不支持的文件类型: {file_extension}")
                 return None
             
+            # 相同内容的文档已经转换过：直接使用缓存结果
+            source_hash = file_sha256(file_path_obj) if self.cache else None
+            if source_hash:
+                cached = self.cache.get(source_hash, pdf_path)
+                if cached:
+                    print(f"使用转换缓存: {file_path_obj.name} -> {Path(cached).name}")
+                    return cached
+            
+            print(f"开始转换{file_type}文档: {file_path_obj.name} -> {pdf_filename}")
+            
+            result = self._convert_to_pdf(file_type, file_path_obj, pdf_path)
+            
+            if result and source_hash and Path(result).exists():
+                try:
+                    self.cache.put(source_hash, Path(result))
+                except Exception as e:
+                    print(f"保存转换缓存失败: {e}")
+            return result
+            
         except Exception as e:
             print(f"Office文档转PDF转换异常: {e}")
             return None
@@ -72,147 +181,45 @@ class DocumentConverter:
         else:
             return 'unknown'
     
-    def _convert_word_to_pdf(self, word_path: Path, pdf_path: Path) -> Optional[str]:
-        """转换Word文档为PDF"""
-        try:
-            # 方法1: 使用Microsoft Office COM接口转换（最高质量）
-            try:
-                result = self._convert_with_office_com(word_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"Office COM转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"Office COM转换失败: {e}")
-            
-            # 方法2: 使用系统打印驱动转换
+    def _convert_to_pdf(self, file_type: str, source_path: Path, pdf_path: Path) -> Optional[str]:
+        """按平台配置的顺序尝试各转换后端，跳过当前平台不可用的后端"""
+        converters = PDF_CONVERTERS.get(file_type, {})
+        for backend in self.backends.order(file_type):
+            method_name = converters.get(backend)
+            if not method_name or not self.backends.available(backend):
+                continue
             try:
-                result = self._convert_with_print_driver(word_path, pdf_path)
+                result = getattr(self, method_name)(source_path, pdf_path)
                 if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"打印驱动转换成功: {pdf_path}")
+                    print(f"{backend} 转换成功: {pdf_path}")
+                    metrics.increment(f"converter.{backend}.success")
                     return result
             except Exception as e:
-                print(f"打印驱动转换失败: {e}")
-            
-            # 方法3: 使用pypandoc转换
-            try:
-                pypandoc.convert_file(
-                    str(word_path),
-                    'pdf',
-                    outputfile=str(pdf_path),
-                    extra_args=['--pdf-engine=xelatex']
-                )
-                if pdf_path.exists():
-                    print(f"pypandoc转换成功: {pdf_path}")
-                    return str(pdf_path)
-            except Exception as e:
-                print(f"pypandoc转换失败: {e}")
-            
-            # 方法4: 使用LibreOffice转换
-            try:
-                result = self._convert_with_libreoffice(word_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"LibreOffice转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"LibreOffice转换失败: {e}")
-            
-            print(f"所有Word转换方法都失败了: {word_path.name}")
-            return None
-            
-        except Exception as e:
-            print(f"Word转换异常: {e}")
-            return None
-    
-    def _convert_ppt_to_pdf(self, ppt_path: Path, pdf_path: Path) -> Optional[str]:
-        """转换PowerPoint文档为PDF"""
-        try:
-            # 方法1: 使用PowerPoint COM接口转换（最高质量）
-            try:
-                result = self._convert_ppt_with_office_com(ppt_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"PowerPoint COM转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"PowerPoint COM转换失败: {e}")
-            
-            # 方法2: 使用PowerPoint打印驱动转换
-            try:
-                result = self._convert_ppt_with_print_driver(ppt_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"PowerPoint打印驱动转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"PowerPoint打印驱动转换失败: {e}")
-            
-            # 方法3: 使用LibreOffice转换
-            try:
-                result = self._convert_with_libreoffice(ppt_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"LibreOffice转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"LibreOffice转换失败: {e}")
-            
-            print(f"所有PowerPoint转换方法都失败了: {ppt_path.name}")
-            return None
-            
-        except Exception as e:
-            print(f"PowerPoint转换异常: {e}")
-            return None
+                print(f"{backend} 转换失败: {e}")
+            metrics.increment(f"converter.{backend}.failure")
+        
+        print(f"所有{file_type}转换方法都失败了: {source_path.name}")
+        return None
     
-    def _convert_excel_to_pdf(self, excel_path: Path, pdf_path: Path) -> Optional[str]:
-        """转换Excel文档为PDF"""
-        try:
-            # 方法1: 使用Excel COM接口转换（最高质量）
-            try:
-                result = self._convert_excel_with_office_com(excel_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"Excel COM转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"Excel COM转换失败: {e}")
-            
-            # 方法2: 使用LibreOffice转换
-            try:
-                result = self._convert_with_libreoffice(excel_path, pdf_path)
-                if result and result.endswith('.pdf') and Path(result).exists():
-                    print(f"LibreOffice转换成功: {pdf_path}")
-                    return result
-            except Exception as e:
-                print(f"LibreOffice转换失败: {e}")
-            
-            print(f"所有Excel转换方法都失败了: {excel_path.name}")
-            return None
-            
-        except Exception as e:
-            print(f"Excel转换异常: {e}")
-            return None
+    def _convert_with_pandoc(self, word_path: Path, pdf_path: Path) -> Optional[str]:
+        """使用pypandoc转换"""
+        pypandoc = self.backends.load("pandoc")
+        pypandoc.convert_file(
+            str(word_path),
+            'pdf',
+            outputfile=str(pdf_path),
+            extra_args=['--pdf-engine=xelatex']
+        )
+        if pdf_path.exists():
+            return str(pdf_path)
+        return None
     
     def _convert_with_libreoffice(self, word_path: Path, pdf_path: Path) -> Optional[str]:
-        """使用LibreOffice转换"""
+        """使用LibreOffice转换（复用进程池中的常驻工作进程）"""
         try:
-            # 检查LibreOffice是否安装
-            result = subprocess.run(['libreoffice', '--version'], 
-                                 capture_output=True, text=True, timeout=10)
-            if result.returncode != 0:
-                raise Exception("LibreOffice未安装")
-            
-            # 使用LibreOffice转换
-            cmd = [
-                'libreoffice',
-                '--headless',
-                '--convert-to', 'pdf',
-                '--outdir', str(pdf_path.parent),
-                str(word_path)
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-            if result.returncode == 0 and pdf_path.exists():
-                print(f"LibreOffice转换成功: {pdf_path}")
-                return str(pdf_path)
-            else:
-                raise Exception(f"LibreOffice转换失败: {result.stderr}")
-                
+            result = self.office_pool.convert(word_path, pdf_path)
+            print(f"LibreOffice转换成功: {pdf_path}")
+            return result
         except Exception as e:
             print(f"LibreOffice转换异常: {e}")
             raise
@@ -221,7 +228,7 @@ class DocumentConverter:
         """使用python-docx转换为HTML，然后尝试转PDF"""
         try:
             # 读取Word文档
-            doc = Document(word_path)
+            doc = self.backends.load("docx_html").Document(word_path)
             
             # 创建HTML内容
             html_content = self._docx_to_html(doc)
@@ -233,6 +240,7 @@ class DocumentConverter:
             
             # 尝试使用pypandoc将HTML转PDF
             try:
+                pypandoc = self.backends.load("pandoc")
                 pypandoc.convert_file(
                     str(html_path),
                     'pdf',
@@ -262,7 +270,7 @@ class DocumentConverter:
         """将Word文档转换为纯文本"""
         try:
             # 使用docx2txt提取文本
-            text_content = docx2txt.process(str(word_path))
+            text_content = self.backends.load("docx_text").process(str(word_path))
             
             if not text_content or not text_content.strip():
                 print(f"Word文档为空或无法提取文本: {word_path.name}")
@@ -289,7 +297,7 @@ class DocumentConverter:
             print(f"尝试转换为HTML: {word_path.name}")
             
             # 读取Word文档
-            doc = Document(word_path)
+            doc = self.backends.load("docx_html").Document(word_path)
             
             # 创建HTML内容
             html_content = self._docx_to_html(doc)
@@ -315,7 +323,7 @@ class DocumentConverter:
             print(f"尝试使用Office COM接口转换: {word_path.name}")
             
             # 启动Word应用程序
-            word_app = win32com.client.Dispatch("Word.Application")
+            word_app = self.backends.load("office_com").Dispatch("Word.Application")
             word_app.Visible = False  # 不显示Word窗口
             word_app.DisplayAlerts = False  # 不显示警告
             
@@ -395,7 +403,7 @@ class DocumentConverter:
             print(f"尝试使用PowerPoint COM接口转换: {ppt_path.name}")
             
             # 启动PowerPoint应用程序
-            ppt_app = win32com.client.Dispatch("PowerPoint.Application")
+            ppt_app = self.backends.load("office_com").Dispatch("PowerPoint.Application")
             ppt_app.Visible = False  # 不显示PowerPoint窗口
             ppt_app.DisplayAlerts = False  # 不显示警告
             
@@ -467,7 +475,7 @@ class DocumentConverter:
             print(f"尝试使用Excel COM接口转换: {excel_path.name}")
             
             # 启动Excel应用程序
-            excel_app = win32com.client.Dispatch("Excel.Application")
+            excel_app = self.backends.load("office_com").Dispatch("Excel.Application")
             excel_app.Visible = False  # 不显示Excel窗口
             excel_app.DisplayAlerts = False  # 不显示警告
             
@@ -505,7 +513,7 @@ class DocumentConverter:
             print(f"Excel COM转换异常: {e}")
             raise
     
-    def _docx_to_html(self, doc: Document) -> str:
+    def _docx_to_html(self, doc) -> str:
         """将docx文档转换为HTML"""
         html_parts = []
         html_parts.append("""
@@ -562,6 +570,12 @@ class DocumentConverter:
         html_parts.append("</body></html>")
         return "\n".join(html_parts)
     
+    def shutdown(self):
+        """结束LibreOffice工作进程，写入转换缓存的使用记录"""
+        self.office_pool.shutdown()
+        if self.cache:
+            self.cache.flush()
+    
     def cleanup_temp_files(self):
         """清理临时文件"""
         try:
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+批量导入命令行工具
+
+把目录或 zip 中的文件导入展板。默认通过正在运行的后端导入（文件监控会跳过这批文件，
+PDF 文本提取和 Office 文档转换进入后台任务队列），并轮询任务进度；
+后端没有运行时（或指定 --offline）直接写入数据目录，并行提取 PDF 文本。
+
+用法:
+    python import_files.py board-123 ~/课程资料
+    python import_files.py board-123 lectures.zip --server http://localhost:8081
+    python import_files.py board-123 ~/课程资料 --offline
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from config import API_HOST, API_PORT, JOB_CONCURRENCY
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _request(url: str, method: str = "GET"):
+    request = urllib.request.Request(url, method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def import_via_server(server: str, board_id: str, source: str, poll_interval: float) -> int:
+    """提交导入任务并轮询进度"""
+    query = urllib.parse.urlencode({"path": source})
+    job = _request(f"{server}/api/boards/{board_id}/import?{query}", method="POST")
+    job_id = job["job_id"]
+    print(f"已提交导入任务: {job_id}")
+
+    while True:
+        job = _request(f"{server}/api/jobs/{job_id}")
+        progress = job.get("progress") or {}
+        if progress.get("message"):
+            print(f"\r{progress['message']}", end="", flush=True)
+        if job["status"] in TERMINAL_STATUSES:
+            print()
+            break
+        time.sleep(poll_interval)
+
+    if job["status"] != "completed":
+        print(f"导入{job['status']}: {job.get('error') or ''}")
+        return 1
+    result = job["result"]
+    print(f"导入完成: {result['imported']} 个文件，跳过 {result['skipped']} 个，失败 {result['failed']} 个，"
+          f"{result['files_per_second']} 文件/秒")
+    if result.get("followup_job_ids"):
+        print(f"已提交 {len(result['followup_job_ids'])} 个PDF提取/文档转换任务")
+    return 0
+
+
+def import_offline(board_id: str, source: str) -> int:
+    """直接写入数据目录（后端未运行时使用）"""
+    from bulk_importer import BulkImporter
+    from storage.file_manager import FileSystemManager
+    from storage.content_manager import ContentManager
+
+    file_manager = FileSystemManager()
+    file_manager.board_index.rebuild()
+    content_manager = ContentManager(file_manager)
+
+    def progress(current, total, message):
+        print(f"\r{message}", end="", flush=True)
+
+    try:
+        result = BulkImporter(content_manager).run(board_id, source, progress=progress)
+    finally:
+        print()
+    print(f"导入完成: {result['imported']} 个文件，跳过 {result['skipped']} 个，失败 {result['failed']} 个，"
+          f"{result['files_per_second']} 文件/秒")
+
+    pdf_windows = [window for window in result["windows"] if window["type"] == "pdf"]
+    if pdf_windows:
+        print(f"正在提取 {len(pdf_windows)} 个PDF的文本...")
+        with ThreadPoolExecutor(max_workers=JOB_CONCURRENCY) as executor:
+            list(executor.map(
+                lambda window: content_manager.extract_pdf_text_to_pages(board_id, window["id"], window),
+                pdf_windows
+            ))
+    if any(window["type"] == "document" for window in result["windows"]):
+        print("Office文档已按原格式导入；通过后端导入时会自动转换为PDF")
+
+    content_manager.window_index.save()
+    content_manager.pdf_extractor.shutdown()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把目录或zip中的文件批量导入展板")
+    parser.add_argument("board_id", help="目标展板ID")
+    parser.add_argument("source", help="要导入的目录或zip文件")
+    parser.add_argument("--server", default=f"http://{API_HOST}:{API_PORT}", help="后端地址")
+    parser.add_argument("--offline", action="store_true", help="不通过后端，直接写入数据目录")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="轮询任务进度的间隔（秒）")
+    args = parser.parse_args()
+
+    source = os.path.abspath(os.path.expanduser(args.source))
+    if not os.path.exists(source):
+        print(f"导入源不存在: {source}")
+        return 1
+
+    if not args.offline:
+        try:
+            return import_via_server(args.server.rstrip("/"), args.board_id, source, args.poll_interval)
+        except urllib.error.HTTPError as e:
+            print(f"导入失败: {e.code} {e.read().decode('utf-8', errors='ignore')}")
+            if e.code == 403:
+                print("请在 config.py 的 IMPORT_ALLOWED_ROOTS 中加入导入源所在的目录，或停止后端后使用 --offline 导入")
+            return 1
+        except urllib.error.URLError:
+            print(f"无法连接后端 {args.server}，改为直接写入数据目录")
+    return import_offline(args.board_id, source)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+后台任务队列
+耗时的文档转换和PDF文本提取作为任务在后台执行：任务记录持久化到 jobs 目录（重启后未完成的任务重新排队），
+并发数可配置，可以取消，进度和状态变化通过 /ws/logs 广播
+"""
+
+import asyncio
+import copy
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import metrics
+from config import JOB_CONCURRENCY, JOB_HISTORY_LIMIT, JOB_PROGRESS_INTERVAL
+from storage.async_storage import StorageExecutor
+from storage.atomic_write import atomic_write_json
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobCancelled(Exception):
+    """任务被取消（由任务处理函数在检查到取消请求时抛出）"""
+
+
+class JobContext:
+    """传给任务处理函数的上下文：参数、进度上报和取消检查"""
+
+    def __init__(self, queue: "JobQueue", job: Dict):
+        self._queue = queue
+        self.job_id = job["id"]
+        self.board_id = job.get("board_id")
+        self.params = dict(job["params"])
+        # 上次执行时保存的恢复信息（服务重启后任务重新排队时不为None）
+        self.checkpoint = job.get("checkpoint")
+
+    def progress(self, current: int, total: int, message: str = ""):
+        """上报进度，例如 progress(37, 400, "第 37/400 页")"""
+        self._queue._report_progress(self.job_id, current, total, message)
+
+    def save_checkpoint(self, data: Dict):
+        """保存恢复信息（随任务记录持久化），任务重新执行时从 context.checkpoint 读取，用于跳过已完成的工作"""
+        self.checkpoint = data
+        self._queue._save_checkpoint(self.job_id, data)
+
+    def is_cancelled(self) -> bool:
+        return self._queue._is_cancel_requested(self.job_id)
+
+    def check_cancelled(self):
+        """已请求取消时抛出 JobCancelled"""
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def submit(self, job_type: str, params: Dict, board_id: str = None) -> Dict:
+        """提交后续任务（例如文档转换完成后提取PDF文本）"""
+        return self._queue.submit(job_type, params, board_id=board_id)
+
+
+class JobQueue:
+    """本地持久化任务队列"""
+
+    def __init__(self, jobs_dir: Path, websocket_manager, concurrency: int = JOB_CONCURRENCY):
+        self.jobs_dir = Path(jobs_dir)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        self.websocket_manager = websocket_manager
+        self.concurrency = concurrency
+
+        self._handlers: Dict[str, Callable[[JobContext], Optional[Dict]]] = {}
+        self._jobs: Dict[str, Dict] = {}
+        self._cancel_requested = set()
+        self._last_progress_sent: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # 串行化任务记录的写入，后写入的总是较新的快照
+        self._persist_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # 任务处理函数在独立的线程池中执行，长时间运行的任务不占用存储线程池
+        self._executor = StorageExecutor(concurrency, name="job_workers")
+
+    def register_handler(self, job_type: str, handler: Callable[[JobContext], Optional[Dict]]):
+        """注册任务处理函数：handler(context) 在线程池中执行，返回结果字典"""
+        self._handlers[job_type] = handler
+
+    # ---------- 持久化 ----------
+
+    def _job_file(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _persist(self, job: Dict):
+        """在 _lock 下复制任务记录，再原子写入（调用方不能持有 _lock）"""
+        try:
+            with self._persist_lock:
+                with self._lock:
+                    snapshot = copy.deepcopy(job)
+                atomic_write_json(self._job_file(snapshot["id"]), snapshot, kind="job_record")
+        except Exception as e:
+            print(f"保存任务记录失败: {job['id']}, 错误: {e}")
+
+    def _load_jobs(self) -> List[Dict]:
+        """读取任务记录，清理超出保留数量的已结束任务，返回需要重新排队的任务"""
+        jobs = []
+        for job_file in self.jobs_dir.glob("*.json"):
+            try:
+                with open(job_file, "r", encoding="utf-8") as f:
+                    jobs.append(json.load(f))
+            except Exception as e:
+                print(f"读取任务记录失败: {job_file}, 错误: {e}")
+        jobs.sort(key=lambda job: job.get("created_at", 0))
+
+        finished = [job for job in jobs if job.get("status") in FINISHED_STATES]
+        for job in finished[:max(len(finished) - JOB_HISTORY_LIMIT, 0)]:
+            self._job_file(job["id"]).unlink(missing_ok=True)
+            jobs.remove(job)
+
+        pending = []
+        with self._lock:
+            for job in jobs:
+                if job.get("status") in (JOB_QUEUED, JOB_RUNNING):
+                    # 上次运行时未完成：重新排队（任务处理函数需要可重入，可以用 checkpoint 跳过已完成的工作）
+                    job["status"] = JOB_QUEUED
+                    job["started_at"] = None
+                    pending.append(job)
+                self._jobs[job["id"]] = job
+        return pending
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """在当前事件循环中启动工作协程，并恢复未完成的任务"""
+        self._loop = asyncio.get_event_loop()
+        self._queue = asyncio.Queue()
+        for job in self._load_jobs():
+            self._persist(job)
+            self._queue.put_nowait(job["id"])
+        self._update_gauges()
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.concurrency)]
+        print(f"后台任务队列已启动，并发数: {self.concurrency}，待执行任务: {self._queue.qsize()}")
+
+    async def stop(self):
+        """停止工作协程（正在执行的任务记录保持为running，下次启动时重新排队）"""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        print("后台任务队列已停止")
+
+    # ---------- 提交、查询、取消 ----------
+
+    def submit(self, job_type: str, params: Dict, board_id: str = None) -> Dict:
+        """提交任务（可在任意线程调用），返回任务记录"""
+        if job_type not in self._handlers:
+            raise ValueError(f"未知的任务类型: {job_type}")
+        job = {
+            "id": f"job_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}",
+            "type": job_type,
+            "board_id": board_id,
+            "params": params,
+            "status": JOB_QUEUED,
+            "progress": {"current": 0, "total": 0, "message": ""},
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+        self._persist(job)
+        metrics.increment("jobs.submitted")
+        self._loop.call_soon_threadsafe(self._enqueue, job["id"])
+        return self._view(job)
+
+    def _enqueue(self, job_id: str):
+        self._queue.put_nowait(job_id)
+        self._update_gauges()
+        self._broadcast_status(self._jobs[job_id])
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._view(job) if job else None
+
+    def list_jobs(self, status: str = None, board_id: str = None, limit: int = 100) -> List[Dict]:
+        """按创建时间倒序列出任务"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values()
+                    if (status is None or job["status"] == status)
+                    and (board_id is None or job.get("board_id") == board_id)]
+            jobs.sort(key=lambda job: job["created_at"], reverse=True)
+            return [self._view(job) for job in jobs[:limit]]
+
+    def stats(self) -> Dict:
+        """队列状态：排队数、执行中数和各状态的任务数"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": counts.get(JOB_QUEUED, 0),
+            "running": counts.get(JOB_RUNNING, 0),
+            "counts": counts,
+        }
+
+    def cancel(self, job_id: str) -> Optional[Dict]:
+        """取消任务：排队中的任务直接取消，执行中的任务在下一个检查点停止"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] in FINISHED_STATES:
+                return self._view(job) if job else None
+            if job["status"] == JOB_QUEUED:
+                job["status"] = JOB_CANCELLED
+                job["finished_at"] = time.time()
+            else:
+                self._cancel_requested.add(job_id)
+        if job["status"] == JOB_CANCELLED:
+            self._persist(job)
+            metrics.increment("jobs.cancelled")
+            self._update_gauges()
+            self._loop.call_soon_threadsafe(self._broadcast_status, job)
+        return self._view(job)
+
+    def _is_cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancel_requested
+
+    @staticmethod
+    def _view(job: Dict) -> Dict:
+        """任务记录加上排队和执行耗时"""
+        view = dict(job)
+        view.pop("checkpoint", None)
+        now = time.time()
+        started_at = job.get("started_at")
+        finished_at = job.get("finished_at")
+        view["wait_seconds"] = round((started_at or finished_at or now) - job["created_at"], 3)
+        view["run_seconds"] = round((finished_at or now) - started_at, 3) if started_at else None
+        return view
+
+    # ---------- 执行 ----------
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if not job or job["status"] != JOB_QUEUED:
+                    # 排队期间已被取消
+                    continue
+                job["status"] = JOB_RUNNING
+                job["started_at"] = time.time()
+            self._persist(job)
+            self._update_gauges()
+            self._broadcast_status(job)
+            metrics.observe("jobs.wait", job["started_at"] - job["created_at"])
+
+            handler = self._handlers.get(job["type"])
+            context = JobContext(self, job)
+            try:
+                if handler is None:
+                    raise ValueError(f"未知的任务类型: {job['type']}")
+                result = await self._executor.run(handler, context)
+                status, error_message = JOB_COMPLETED, None
+            except JobCancelled:
+                result, status, error_message = None, JOB_CANCELLED, None
+            except Exception as e:
+                print(f"任务执行失败: {job_id}, 错误: {e}")
+                result, status, error_message = None, JOB_FAILED, str(e)
+
+            with self._lock:
+                job["status"] = status
+                job["result"] = result
+                job["error"] = error_message
+                job["finished_at"] = time.time()
+                self._cancel_requested.discard(job_id)
+                self._last_progress_sent.pop(job_id, None)
+            self._persist(job)
+            self._update_gauges()
+            metrics.increment(f"jobs.{status}")
+            metrics.observe(f"jobs.run.{job['type']}", job["finished_at"] - job["started_at"])
+            self._broadcast_status(job)
+
+    def _save_checkpoint(self, job_id: str, data: Dict):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            job["checkpoint"] = data
+        self._persist(job)
+
+    def _report_progress(self, job_id: str, current: int, total: int, message: str):
+        """记录进度并（节流后）广播，在任务线程中调用"""
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return
+            job["progress"] = {"current": current, "total": total, "message": message}
+            last_sent = self._last_progress_sent.get(job_id, 0.0)
+            if now - last_sent < JOB_PROGRESS_INTERVAL and current < total:
+                return
+            self._last_progress_sent[job_id] = now
+            event = {
+                "type": "job_progress",
+                "job_id": job_id,
+                "job_type": job["type"],
+                "board_id": job.get("board_id"),
+                "progress": dict(job["progress"]),
+                "timestamp": now,
+            }
+        self._persist(job)
+        self._loop.call_soon_threadsafe(self._broadcast, event)
+
+    def _update_gauges(self):
+        stats = self.stats()
+        metrics.set_gauge("jobs.queue_depth", stats["queue_depth"])
+        metrics.set_gauge("jobs.running", stats["running"])
+
+    def _broadcast_status(self, job: Dict):
+        self._broadcast({
+            "type": "job_status",
+            "board_id": job.get("board_id"),
+            "job": self._view(job),
+            "timestamp": time.time(),
+        })
+
+    def _broadcast(self, message: Dict):
+        """在事件循环线程中调用；展板任务的事件只发给该展板的订阅者"""
+        if self.websocket_manager:
+            # 同一任务较新的进度/状态会替换慢连接队列中较旧的一条
+            job_id = message.get("job_id") or message["job"]["id"]
+            self._loop.create_task(self.websocket_manager.publish(
+                json.dumps(message, ensure_ascii=False), board_id=message.get("board_id"),
+                coalesce_key=f"{message['type']}:{job_id}"
+            ))
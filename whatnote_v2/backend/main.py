@@ -3,7 +3,7 @@ WhatNote V2 Backend API
 使用绝对导入，通过run.py设置sys.path
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi import Request
@@ -15,15 +15,25 @@ import os
 from typing import List, Dict, Optional
 from pathlib import Path
 from datetime import datetime
-from config import API_HOST, API_PORT, DATA_DIR
+from config import API_HOST, API_PORT, DATA_DIR, IMPORT_ALLOWED_ROOTS, STORAGE_IO_WORKERS
 from logger import info, error
+import metrics
 
 # 导入新的存储管理器
 from storage.file_manager import FileSystemManager
 from storage.content_manager import ContentManager
 from storage.file_watcher import FileWatcher
 from storage.conversation_manager import ConversationManager
+from storage.orphan_reconciler import OrphanReconciler
+from storage.async_storage import StorageExecutor, AsyncStorage
+from storage.upload_stream import MultipartUpload, MultipartUploadError, UploadTooLargeError, get_staging_dir, stream_multipart_upload
+from storage.upload_sessions import UploadSessionManager, UploadSessionError
+from storage.atomic_write import directory_syncer
+from storage.text_patch import ContentVersionConflict, TextPatchError
 from document_converter import document_converter
+from connection_manager import ConnectionManager
+from job_queue import JobQueue, JobContext
+from bulk_importer import BulkImporter, ImportCancelled
 
 app = FastAPI(title="WhatNote V2 API", version="2.0.0")
 
@@ -34,14 +44,27 @@ app.mount("/static/files", StaticFiles(directory=str(DATA_DIR)), name="static_fi
 @app.on_event("startup")
 async def startup_event():
     """应用启动时启动文件监控服务"""
+    board_count = file_manager.board_index.rebuild()
+    info(f"展板索引已重建，共 {board_count} 个展板")
     info("启动文件监控服务...")
     file_watcher.start_watching()
+    orphan_reconciler.start()
+    job_queue.start()
+    await async_upload_sessions.cleanup_expired()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时停止文件监控服务"""
     info("停止文件监控服务...")
     file_watcher.stop_watching()
+    await orphan_reconciler.stop()
+    await job_queue.stop()
+    content_manager.flush_autosave()
+    storage_executor.shutdown()
+    content_manager.pdf_extractor.shutdown()
+    document_converter.shutdown()
+    content_manager.window_index.save()
+    directory_syncer.flush()
 
 # 配置CORS
 app.add_middleware(
@@ -52,51 +75,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# WebSocket连接管理
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        info(f"WebSocket连接已建立，当前连接数: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            info(f"WebSocket连接已断开，当前连接数: {len(self.active_connections)}")
-
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except Exception as e:
-            error(f"发送消息失败: {e}")
-
-    async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                error(f"广播消息失败: {e}")
-                disconnected.append(connection)
-        
-        # 移除断开的连接
-        for connection in disconnected:
-            self.disconnect(connection)
-
 # 初始化存储管理器
 file_manager = FileSystemManager(DATA_DIR)
 content_manager = ContentManager(file_manager)
 conversation_manager = ConversationManager(file_manager)
 
-# 初始化WebSocket连接管理器
-manager = ConnectionManager()
+# 异步存储门面：阻塞的文件操作在有界线程池中执行，不阻塞事件循环
+storage_executor = StorageExecutor(STORAGE_IO_WORKERS)
+async_file_manager = AsyncStorage(file_manager, storage_executor)
+async_content_manager = AsyncStorage(content_manager, storage_executor)
+async_trash_manager = AsyncStorage(content_manager.trash_manager, storage_executor)
+async_conversation_manager = AsyncStorage(conversation_manager, storage_executor)
+
+# 分块上传会话
+upload_session_manager = UploadSessionManager(file_manager, blob_store=content_manager.blob_store)
+async_upload_sessions = AsyncStorage(upload_session_manager, storage_executor)
+
+# 初始化WebSocket连接管理器（展板事件按展板/课程订阅投递）
+manager = ConnectionManager(course_resolver=file_manager.board_index.course_of)
 
 # 初始化文件监控服务
 file_watcher = FileWatcher(DATA_DIR, manager)
-file_watcher.set_managers(file_manager, content_manager)
+orphan_reconciler = OrphanReconciler(file_manager, content_manager, manager, async_content_manager)
+file_watcher.set_managers(file_manager, content_manager, orphan_reconciler, async_content_manager)
+
+# 后台任务队列：文档转换和PDF文本提取不阻塞上传请求
+job_queue = JobQueue(DATA_DIR / "jobs", manager)
+bulk_importer = BulkImporter(content_manager)
 
 # 静态文件服务
 import os
@@ -122,12 +127,29 @@ async def health_check():
     """健康检查端点"""
     return {"status": "ok", "service": "WhatNote V2"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """运行指标（计数器、仪表值和耗时统计）"""
+    snapshot = metrics.snapshot()
+    snapshot["converter_backends"] = document_converter.backends.stats()
+    snapshot["websocket"] = manager.stats()
+    snapshot["write_intents"] = content_manager.write_intents.stats()
+    snapshot["locks"] = content_manager.locks.stats()
+    if content_manager.autosave:
+        snapshot["autosave"] = content_manager.autosave.stats()
+    if file_manager.metadata:
+        snapshot["metadata"] = file_manager.metadata.stats()
+    snapshot["office_pool"] = document_converter.office_pool.stats()
+    if document_converter.cache:
+        snapshot["conversion_cache"] = document_converter.cache.stats()
+    return snapshot
+
 # 课程相关API
 @app.get("/api/courses")
 async def get_courses():
     """获取所有课程"""
     try:
-        courses = file_manager.get_courses()
+        courses = await async_file_manager.get_courses()
         return {"courses": courses}
     except Exception as e:
         error(f"获取课程失败: {e}")
@@ -137,7 +159,8 @@ async def get_courses():
 async def create_course(name: str, description: str = ""):
     """创建新课程"""
     try:
-        course = file_manager.create_course(name, description)
+        course = await async_file_manager.create_course(name, description)
+        file_watcher.add_course_watch(course['id'])
         info(f"创建课程成功: {course['id']}")
         return course
     except Exception as e:
@@ -148,7 +171,7 @@ async def create_course(name: str, description: str = ""):
 async def get_boards(course_id: str):
     """获取课程的所有展板"""
     try:
-        boards = file_manager.get_boards(course_id)
+        boards = await async_file_manager.get_boards(course_id)
         return {"boards": boards}
     except Exception as e:
         error(f"获取展板失败: {e}")
@@ -158,7 +181,7 @@ async def get_boards(course_id: str):
 async def create_board(course_id: str, board_name: str):
     """创建新展板"""
     try:
-        board = file_manager.create_board(course_id, board_name)
+        board = await async_file_manager.create_board(course_id, board_name)
         info(f"创建展板成功: {board['id']}")
         return board
     except Exception as e:
@@ -169,7 +192,7 @@ async def create_board(course_id: str, board_name: str):
 async def get_board_info(board_id: str):
     """获取展板信息"""
     try:
-        board_info = file_manager.get_board_info(board_id)
+        board_info = await async_file_manager.get_board_info(board_id)
         if not board_info:
             raise HTTPException(status_code=404, detail="展板不存在")
         return board_info
@@ -183,9 +206,11 @@ async def get_board_info(board_id: str):
 async def delete_board(board_id: str):
     """删除展板"""
     try:
-        success = file_manager.delete_board(board_id)
+        # 持有展板写锁删除，等进行中的读写完成；释放后再移除展板的锁
+        success = await async_content_manager.delete_board(board_id)
         if not success:
             raise HTTPException(status_code=404, detail="展板不存在")
+        content_manager.locks.forget_board(board_id)
         info(f"删除展板成功: {board_id}")
         return {"message": "展板删除成功"}
     except HTTPException:
@@ -203,7 +228,7 @@ async def create_window(board_id: str, window_data: Dict):
         window_data["created_at"] = datetime.now().isoformat()
         window_data["updated_at"] = datetime.now().isoformat()
         
-        success = content_manager.save_window_content(board_id, window_data)
+        success = await async_content_manager.save_window_content(board_id, window_data)
         if not success:
             raise HTTPException(status_code=404, detail="展板不存在")
         
@@ -224,7 +249,7 @@ async def update_window(board_id: str, window_id: str, window_data: Dict):
         if "title" in window_data:
             # 获取旧的窗口数据以比较标题
             try:
-                windows = content_manager.get_board_windows(board_id)
+                windows = await async_content_manager.get_board_windows(board_id)
                 old_window = next((w for w in windows if w["id"] == window_id), None)
                 if old_window and old_window.get("title") != window_data["title"]:
                     old_title = old_window.get("title")
@@ -240,14 +265,16 @@ async def update_window(board_id: str, window_id: str, window_data: Dict):
         if content_only_update:
             # 纯内容更新：只更新.md文件
             content = window_data["content"]
-            content_manager.update_window_content_only(board_id, window_id, content)
+            content_version = await async_content_manager.update_window_content_only(board_id, window_id, content)
+            if content_version is not None:
+                window_data["content_version"] = content_version
             info(f"更新窗口内容成功: {window_id}")
         else:
             # 窗口属性更新（可能包含位置、大小、隐藏状态等）
             if old_title:
-                content_manager.rename_window_file(board_id, window_id, old_title, window_data["title"])
+                await async_content_manager.rename_window_file(board_id, window_id, old_title, window_data["title"])
             
-            success = content_manager.save_window_content(board_id, window_data)
+            success = await async_content_manager.save_window_content(board_id, window_data)
             if not success:
                 raise HTTPException(status_code=404, detail="展板不存在")
         
@@ -259,17 +286,38 @@ async def update_window(board_id: str, window_id: str, window_data: Dict):
         error(f"更新窗口失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.patch("/api/boards/{board_id}/windows/{window_id}/content")
+async def patch_window_content(board_id: str, window_id: str, patch_data: Dict):
+    """增量修改文本窗口内容：{"base_version": 版本号, "ops": [{"start", "end", "text", "expect"}]}，版本不一致返回409"""
+    try:
+        base_version = patch_data.get("base_version")
+        if not isinstance(base_version, int):
+            raise HTTPException(status_code=400, detail="缺少base_version")
+        result = await async_content_manager.patch_window_content(board_id, window_id, base_version, patch_data.get("ops"))
+        if result is None:
+            raise HTTPException(status_code=404, detail="文本窗口不存在")
+        return {"window_id": window_id, **result}
+    except HTTPException:
+        raise
+    except ContentVersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "current_version": e.current_version})
+    except TextPatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        error(f"增量修改窗口内容失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.delete("/api/boards/{board_id}/windows/{window_id}")
 async def delete_window(board_id: str, window_id: str, permanent: bool = False):
     """删除窗口（移动到回收站或永久删除）"""
     try:
         if permanent:
             # 永久删除
-            success = content_manager.delete_window_content(board_id, window_id)
+            success = await async_content_manager.delete_window_content(board_id, window_id)
             message = "窗口永久删除成功"
         else:
             # 移动到回收站
-            success = content_manager.move_window_to_trash(board_id, window_id)
+            success = await async_content_manager.move_window_to_trash(board_id, window_id)
             message = "窗口已移动到回收站"
         
         if not success:
@@ -289,12 +337,12 @@ async def convert_window_to_text(window_id: str):
     """将通用窗口转换为文本窗口"""
     try:
         # 查找窗口所在的板块
-        board_id = content_manager.find_window_board(window_id)
+        board_id = await async_content_manager.find_window_board(window_id)
         if not board_id:
             raise HTTPException(status_code=404, detail="窗口不存在")
         
         # 执行转换
-        success = content_manager.convert_window_to_text(board_id, window_id)
+        success = await async_content_manager.convert_window_to_text(board_id, window_id)
         if not success:
             raise HTTPException(status_code=400, detail="转换失败，可能窗口不是通用类型")
         
@@ -311,13 +359,13 @@ async def update_window_content(window_id: str, content_data: Dict):
     """更新窗口内容"""
     try:
         # 查找窗口所在的板块
-        board_id = content_manager.find_window_board(window_id)
+        board_id = await async_content_manager.find_window_board(window_id)
         if not board_id:
             raise HTTPException(status_code=404, detail="窗口不存在")
         
         # 更新内容
         content = content_data.get("content", "")
-        success = content_manager.update_window_content(board_id, window_id, content)
+        success = await async_content_manager.update_window_content(board_id, window_id, content)
         if not success:
             raise HTTPException(status_code=400, detail="更新内容失败")
         
@@ -329,11 +377,21 @@ async def update_window_content(window_id: str, content_data: Dict):
         error(f"更新窗口内容失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/blobs/collect-garbage")
+async def collect_blob_garbage():
+    """维护操作：全量扫描内容存储，回收所有没有引用的对象"""
+    try:
+        removed = await async_content_manager.collect_blob_garbage()
+        return {"message": "内容存储回收完成", "removed": removed}
+    except Exception as e:
+        error(f"回收内容存储失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/boards/{board_id}/clean-storage")
 async def clean_board_storage(board_id: str):
     """清理展板存储结构，移除board_info.json中的冗余数据"""
     try:
-        content_manager.clean_board_info_redundancy(board_id)
+        await async_content_manager.clean_board_info_redundancy(board_id)
         info(f"展板存储结构清理完成: {board_id}")
         return {"message": "存储结构清理完成"}
     except Exception as e:
@@ -344,7 +402,7 @@ async def clean_board_storage(board_id: str):
 async def clean_all_storage():
     """清理所有展板的存储结构"""
     try:
-        content_manager.clean_board_info_redundancy()
+        await async_content_manager.clean_board_info_redundancy()
         info("所有展板存储结构清理完成")
         return {"message": "所有存储结构清理完成"}
     except Exception as e:
@@ -355,7 +413,7 @@ async def clean_all_storage():
 async def migrate_json_naming():
     """迁移到新的JSON命名规则（xxx.ext.json）"""
     try:
-        content_manager.migrate_to_new_json_naming()
+        await async_content_manager.migrate_to_new_json_naming()
         info("JSON命名规则迁移完成")
         return {"message": "JSON命名规则迁移完成"}
     except Exception as e:
@@ -366,7 +424,7 @@ async def migrate_json_naming():
 async def fix_duplicate_windows(board_id: str):
     """修复重复的窗口ID问题"""
     try:
-        result = content_manager.fix_duplicate_windows(board_id)
+        result = await async_content_manager.fix_duplicate_windows(board_id)
         info(f"重复窗口修复完成: {board_id}")
         return {"message": "重复窗口修复完成", "details": result}
     except Exception as e:
@@ -381,7 +439,7 @@ async def rename_window(board_id: str, window_id: str, data: Dict):
         if not new_name:
             raise HTTPException(status_code=400, detail="新名称不能为空")
         
-        result = content_manager.rename_window_and_file(board_id, window_id, new_name)
+        result = await async_content_manager.rename_window_and_file(board_id, window_id, new_name)
         if result["success"]:
             info(f"窗口重命名成功: {window_id} -> {new_name}")
             return {"message": "重命名成功", "new_filename": result["new_filename"]}
@@ -397,7 +455,7 @@ async def rename_window(board_id: str, window_id: str, data: Dict):
 async def get_board_windows(board_id: str):
     """获取展板的所有窗口"""
     try:
-        windows = content_manager.get_board_windows(board_id)
+        windows = await async_content_manager.get_board_windows(board_id)
         return {"windows": windows}
     except Exception as e:
         error(f"获取窗口失败: {e}")
@@ -408,7 +466,7 @@ async def get_board_windows(board_id: str):
 async def get_icon_positions(board_id: str):
     """获取展板的图标位置数据"""
     try:
-        positions = content_manager.get_icon_positions(board_id)
+        positions = await async_content_manager.get_icon_positions(board_id)
         return {"iconPositions": positions}
     except Exception as e:
         error(f"获取图标位置失败: {e}")
@@ -419,90 +477,262 @@ async def save_icon_positions(board_id: str, data: Dict):
     """保存展板的图标位置数据"""
     try:
         icon_positions = data.get("iconPositions", [])
-        content_manager.save_icon_positions(board_id, icon_positions)
+        await async_content_manager.save_icon_positions(board_id, icon_positions)
         info(f"保存图标位置成功: {board_id}")
         return {"message": "图标位置保存成功"}
     except Exception as e:
         error(f"保存图标位置失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# 展板上传支持的文件类型
+UPLOAD_FILE_TYPES = ["images", "videos", "pdfs", "audios", "texts"]
+
+def _remove_temp_files(*paths):
+    """删除上传过程中产生的临时文件和临时目录"""
+    import shutil
+    try:
+        for path in dict.fromkeys(paths):
+            if not path or not os.path.exists(path):
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+    except Exception as e:
+        print(f"删除临时文件失败: {e}")
+
+async def _stream_upload_to_board(board_id: str, request: Request, require_file: bool = True) -> MultipartUpload:
+    """边接收边解析 multipart 请求体，文件字段写入展板暂存目录，超过大小限制时在接收过程中返回413"""
+    board_dir = await async_file_manager.get_board_dir(board_id)
+    if not board_dir:
+        raise HTTPException(status_code=404, detail="展板不存在")
+    try:
+        upload = await stream_multipart_upload(request, board_dir, storage_executor)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MultipartUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if require_file and upload.file is None:
+        raise HTTPException(status_code=400, detail="缺少上传文件")
+    return upload
+
+async def _commit_staged_upload(board_id: str, staged_path: Optional[Path], filename: str, file_type: str,
+                                window_id: Optional[str], sha256: Optional[str] = None, remove_staged: bool = True):
+    """把暂存文件移动到展板files目录并更新窗口内容，返回 (文件路径, 文件URL)
+
+    内容存储中已有相同sha256的内容时直接硬链接，staged_path 可以为None。
+    remove_staged 为False时（分块上传会话的数据文件）保存失败也保留暂存文件，由会话删除或过期清理负责删除，客户端可以重试完成上传
+    """
+    staged = str(staged_path) if staged_path else None
+    # 原子重命名到展板文件夹，使用window_id命名
+    try:
+        file_path = await async_content_manager.save_file_to_board(
+            board_id, file_type, staged, filename, window_id, move=True, sha256=sha256
+        )
+    finally:
+        # 流式上传的暂存文件：移动失败时删除
+        if remove_staged:
+            await storage_executor.run(_remove_temp_files, staged)
+    
+    info(f"文件上传成功: {filename} -> {file_path}")
+    # 构造绝对URL，避免前端在 3000 端口使用相对路径访问
+    base_url = f"http://{API_HOST}:{API_PORT}"
+    absolute_url = f"{base_url}/api/boards/{board_id}/files/serve?path={str(file_path)}"
+    
+    # 如果有window_id，更新窗口的content字段为文件URL
+    if window_id:
+        try:
+            info(f"开始更新窗口内容: window_id={window_id}")
+            # 获取当前窗口数据
+            windows = await async_content_manager.get_board_windows(board_id)
+            info(f"获取到窗口列表，共 {len(windows)} 个窗口")
+            
+            target_window = None
+            for window in windows:
+                if window.get('id') == window_id:
+                    target_window = window
+                    info(f"找到目标窗口: {window_id}")
+                    break
+            
+            if target_window:
+                info(f"更新前窗口内容: {target_window.get('content', 'None')}")
+                # 只更新窗口的content字段，不再调用save_window_content避免重复处理
+                # save_file_to_board已经正确更新了文件路径和标题
+                await async_content_manager.update_window_content_only(board_id, window_id, absolute_url)
+                info(f"窗口内容已更新: {window_id} -> {absolute_url}")
+            else:
+                error(f"未找到目标窗口: {window_id}")
+        except Exception as e:
+            error(f"更新窗口内容失败: {e}")
+            import traceback
+            error(f"详细错误信息: {traceback.format_exc()}")
+    
+    return file_path, absolute_url
+
 # 文件上传API
 @app.post("/api/boards/{board_id}/upload")
 async def upload_file(
     board_id: str,
     request: Request,
-    file: UploadFile = File(...),
-    file_type: Optional[str] = Form(None),
     q_file_type: Optional[str] = Query(None, alias="file_type"),
-    window_id: Optional[str] = Form(None),
     q_window_id: Optional[str] = Query(None, alias="window_id"),
 ):
-    """上传文件到展板"""
+    """上传文件到展板（multipart 字段: file、file_type、window_id，后两者也可以通过查询参数传入）"""
     try:
+        # 查询参数中的文件类型无效时不接收请求体
+        if q_file_type and q_file_type not in UPLOAD_FILE_TYPES:
+            raise HTTPException(status_code=400, detail="不支持的文件类型")
+        
+        # 边接收边分块写入展板暂存目录（不在files目录中，避免FileWatcher检测），同时计算哈希
+        upload = await _stream_upload_to_board(board_id, request)
+        staged = upload.file
+        
         # 兼容从查询参数传入 file_type 和 window_id
-        file_type_value = file_type or q_file_type
-        window_id_value = window_id or q_window_id
+        file_type_value = upload.fields.get("file_type") or q_file_type
+        window_id_value = upload.fields.get("window_id") or q_window_id
         # 验证文件类型
-        allowed_types = ["images", "videos", "pdfs", "audios", "texts"]
-        if not file_type_value or file_type_value not in allowed_types:
+        if not file_type_value or file_type_value not in UPLOAD_FILE_TYPES:
+            await storage_executor.run(_remove_temp_files, str(staged.path))
             raise HTTPException(status_code=400, detail="不支持的文件类型")
         
-        # 保存文件到临时位置（使用系统临时目录，避免FileWatcher检测）
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
-        # 移动到展板文件夹，使用window_id命名
-        file_path = content_manager.save_file_to_board(board_id, file_type_value, temp_path, file.filename, window_id_value)
+        # 原子重命名到展板文件夹，使用window_id命名
+        file_path, absolute_url = await _commit_staged_upload(
+            board_id, staged.path, staged.filename, file_type_value, window_id_value, sha256=staged.sha256
+        )
         
-        # 删除临时文件
-        os.remove(temp_path)
+        return {
+            "message": "文件上传成功",
+            "file_path": str(file_path),
+            "filename": staged.filename,
+            "file_url": absolute_url,
+            "size": staged.size,
+            "sha256": staged.sha256
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        error(f"文件上传失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 分块上传API：创建会话 -> 按偏移上传分块（可并行、可续传）-> 完成
+@app.post("/api/boards/{board_id}/uploads")
+async def create_upload_session(board_id: str, data: Dict):
+    """创建分块上传会话"""
+    try:
+        file_type = data.get("file_type")
+        if file_type not in UPLOAD_FILE_TYPES:
+            raise HTTPException(status_code=400, detail="不支持的文件类型")
+        if not data.get("filename") or not isinstance(data.get("size"), int):
+            raise HTTPException(status_code=400, detail="缺少文件名或文件大小")
         
-        info(f"文件上传成功: {file.filename} -> {file_path}")
-        # 构造绝对URL，避免前端在 3000 端口使用相对路径访问
-        base_url = f"http://{API_HOST}:{API_PORT}"
-        absolute_url = f"{base_url}/api/boards/{board_id}/files/serve?path={str(file_path)}"
+        session = await async_upload_sessions.create_session(
+            board_id, data["filename"], file_type, data["size"],
+            window_id=data.get("window_id"), sha256=data.get("sha256")
+        )
+        return session
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        error(f"创建上传会话失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/boards/{board_id}/uploads/{session_id}")
+async def get_upload_session(board_id: str, session_id: str):
+    """查询上传会话已接收的字节区间（用于断点续传）"""
+    try:
+        session = await async_upload_sessions.get_session(board_id, session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="上传会话不存在")
+        return session
+    except HTTPException:
+        raise
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        error(f"查询上传会话失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put("/api/boards/{board_id}/uploads/{session_id}")
+async def upload_chunk(board_id: str, session_id: str, request: Request, offset: int = Query(...)):
+    """在指定偏移写入一个分块（请求体为原始字节），返回会话状态"""
+    try:
+        chunk_file, size = await async_upload_sessions.open_chunk(board_id, session_id, offset)
+        written = 0
+        try:
+            async for chunk in request.stream():
+                if offset + written + len(chunk) > size:
+                    raise HTTPException(status_code=400, detail="分块超出文件大小")
+                await storage_executor.run(chunk_file.write, chunk)
+                written += len(chunk)
+        finally:
+            chunk_file.close()
         
-        # 如果有window_id，更新窗口的content字段为文件URL
-        if window_id_value:
-            try:
-                info(f"开始更新窗口内容: window_id={window_id_value}")
-                # 获取当前窗口数据
-                windows = content_manager.get_board_windows(board_id)
-                info(f"获取到窗口列表，共 {len(windows)} 个窗口")
-                
-                target_window = None
-                for window in windows:
-                    if window.get('id') == window_id_value:
-                        target_window = window
-                        info(f"找到目标窗口: {window_id_value}")
-                        break
-                
-                if target_window:
-                    info(f"更新前窗口内容: {target_window.get('content', 'None')}")
-                    # 只更新窗口的content字段，不再调用save_window_content避免重复处理
-                    # save_file_to_board已经正确更新了文件路径和标题
-                    content_manager.update_window_content_only(board_id, window_id_value, absolute_url)
-                    info(f"窗口内容已更新: {window_id_value} -> {absolute_url}")
-                else:
-                    error(f"未找到目标窗口: {window_id_value}")
-            except Exception as e:
-                error(f"更新窗口内容失败: {e}")
-                import traceback
-                error(f"详细错误信息: {traceback.format_exc()}")
+        return await async_upload_sessions.commit_chunk(board_id, session_id, offset, written)
+    except HTTPException:
+        raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        error(f"上传分块失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/boards/{board_id}/uploads/{session_id}/finalize")
+async def finalize_upload_session(board_id: str, session_id: str, data: Optional[Dict] = None):
+    """校验分块上传完整性（按哈希去重的会话需要在 proof 中提交 proof_range 区间内容的 base64），并把文件保存到展板"""
+    try:
+        result = await async_upload_sessions.complete_session(
+            board_id, session_id, sha256=(data or {}).get("sha256"), proof=(data or {}).get("proof")
+        )
+        session = result["session"]
+        file_path, absolute_url = await _commit_staged_upload(
+            board_id, result["path"], session["filename"], session["file_type"], session["window_id"],
+            sha256=result["sha256"], remove_staged=False
+        )
+        await async_upload_sessions.delete_session(board_id, session_id)
         
         return {
             "message": "文件上传成功",
             "file_path": str(file_path),
-            "filename": file.filename,
-            "file_url": absolute_url
+            "filename": session["filename"],
+            "file_url": absolute_url,
+            "size": result["size"],
+            "sha256": result["sha256"]
         }
     except HTTPException:
         raise
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        error(f"文件上传失败: {e}")
+        error(f"完成分块上传失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/boards/{board_id}/uploads/{session_id}")
+async def cancel_upload_session(board_id: str, session_id: str):
+    """取消上传会话并删除已接收的数据"""
+    try:
+        if not await async_upload_sessions.delete_session(board_id, session_id):
+            raise HTTPException(status_code=404, detail="上传会话不存在")
+        return {"message": "上传会话已取消"}
+    except HTTPException:
+        raise
+    except UploadSessionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        error(f"取消上传会话失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # 窗口文件上传API - 专门用于将文本窗口转换为文件窗口
@@ -510,14 +740,14 @@ async def upload_file(
 async def upload_file_to_window(
     board_id: str,
     window_id: str,
-    file: UploadFile = File(...)
+    request: Request
 ):
-    """上传文件到指定窗口，将文本窗口转换为文件窗口"""
+    """上传文件到指定窗口，将文本窗口转换为文件窗口（multipart 字段: file）"""
     try:
-        info(f"开始上传文件到窗口: {window_id}, 文件名: {file.filename}")
+        info(f"开始上传文件到窗口: {window_id}")
         
         # 获取窗口信息
-        windows = content_manager.get_board_windows(board_id)
+        windows = await async_content_manager.get_board_windows(board_id)
         target_window = None
         for window in windows:
             if window.get('id') == window_id:
@@ -530,8 +760,13 @@ async def upload_file_to_window(
         if target_window.get('type') != 'text':
             raise HTTPException(status_code=400, detail="只能向文本窗口上传文件")
         
+        # 保存文件：边接收边分块写入展板暂存目录，与files目录在同一文件系统
+        staged = (await _stream_upload_to_board(board_id, request)).file
+        temp_path = str(staged.path)
+        filename = staged.filename
+        
         # 确定文件类型
-        file_extension = Path(file.filename).suffix.lower()
+        file_extension = Path(filename).suffix.lower()
         file_type_map = {
             '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image', '.bmp': 'image', '.webp': 'image',
             '.mp4': 'video', '.avi': 'video', '.mov': 'video', '.wmv': 'video', '.flv': 'video', '.webm': 'video',
@@ -541,86 +776,21 @@ async def upload_file_to_window(
             '.txt': 'text', '.md': 'text'
         }
         
-        original_window_type = file_type_map.get(file_extension, 'generic')
-        window_type = original_window_type
-        
-        # 如果是Word文档，需要转换为PDF
-        if original_window_type == 'document' and file_extension in ['.doc', '.docx']:
-            info(f"检测到Word文档，准备转换为PDF: {file.filename}")
-            # 暂时保持document类型，在转换成功后再改为pdf
-        
-        # 保存文件
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f"_{file.filename}") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
-        # 如果是Word文档，先转换为PDF
-        final_file_path = temp_path
-        final_filename = file.filename
-        final_window_type = window_type
-        
-        if original_window_type == 'document' and file_extension in ['.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx']:
-            try:
-                # 创建临时输出目录
-                temp_output_dir = tempfile.mkdtemp()
-                
-                # 转换Office文档为PDF
-                pdf_path = document_converter.convert_office_to_pdf(temp_path, temp_output_dir)
-                
-                if pdf_path and Path(pdf_path).exists():
-                    if pdf_path.endswith('.pdf'):
-                        # 转换为PDF成功
-                        final_file_path = pdf_path
-                        final_filename = Path(file.filename).stem + ".pdf"
-                        final_window_type = 'pdf'
-                        info(f"Office文档转换为PDF成功: {file.filename} -> {final_filename}")
-                    elif pdf_path.endswith('.html'):
-                        # 转换为HTML成功
-                        final_file_path = pdf_path
-                        final_filename = Path(file.filename).stem + ".html"
-                        final_window_type = 'document'  # HTML文件也作为document类型处理
-                        info(f"Office文档转换为HTML成功: {file.filename} -> {final_filename}")
-                    elif pdf_path.endswith('.txt'):
-                        # 转换为文本成功
-                        final_file_path = pdf_path
-                        final_filename = Path(file.filename).stem + ".txt"
-                        final_window_type = 'text'
-                        info(f"Office文档转换为文本成功: {file.filename} -> {final_filename}")
-                    else:
-                        # 其他格式，保持原文件
-                        info(f"Office文档转换失败，保持原格式: {file.filename}")
-                        final_window_type = 'document'
-                else:
-                    # 转换失败，保持原文件
-                    info(f"Office文档转换失败，保持原格式: {file.filename}")
-                    final_window_type = 'document'
-                
-            except Exception as e:
-                error(f"Office文档转换异常: {e}")
-                # 转换失败，保持原文件
-                final_window_type = 'document'
+        window_type = file_type_map.get(file_extension, 'generic')
         
-        # 使用content_manager保存文件并转换窗口，传递原文件路径
-        success = content_manager.convert_text_window_to_file_window(
-            board_id, window_id, final_file_path, final_filename, final_window_type, temp_path
+        # 先按原格式保存文件并转换窗口（可按内容去重），Office文档的转换在后台任务中进行
+        success = await async_content_manager.convert_text_window_to_file_window(
+            board_id, window_id, temp_path, filename, window_type, sha256=staged.sha256
         )
         
         # 删除临时文件
-        try:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            if final_file_path != temp_path and os.path.exists(final_file_path):
-                os.remove(final_file_path)
-        except Exception as e:
-            print(f"删除临时文件失败: {e}")
+        await storage_executor.run(_remove_temp_files, temp_path)
         
         if not success:
             raise HTTPException(status_code=500, detail="文件上传和窗口转换失败")
         
         # 获取更新后的窗口信息
-        updated_windows = content_manager.get_board_windows(board_id)
+        updated_windows = await async_content_manager.get_board_windows(board_id)
         updated_window = None
         for window in updated_windows:
             if window.get('id') == window_id:
@@ -630,29 +800,26 @@ async def upload_file_to_window(
         if not updated_window:
             raise HTTPException(status_code=500, detail="无法获取更新后的窗口信息")
         
-        info(f"文件上传和窗口转换成功: {file.filename} -> {window_type}")
+        info(f"文件上传和窗口转换成功: {filename} -> {window_type}")
         
-        # 如果是PDF文件，自动提取文本
-        if final_window_type == 'pdf':
-            try:
-                info(f"开始自动提取PDF文本: {window_id}")
-                text_extraction_success = content_manager.extract_pdf_text_to_pages(
-                    board_id, window_id, updated_window
-                )
-                if text_extraction_success:
-                    info(f"PDF文本自动提取成功: {window_id}")
-                else:
-                    info(f"PDF文本自动提取失败: {window_id}")
-            except Exception as e:
-                info(f"PDF文本自动提取异常: {e}")
+        # PDF文本提取和Office文档转换提交到后台任务队列，立即返回任务ID
+        job = None
+        if window_type == 'pdf':
+            job = job_queue.submit("pdf_extraction", {"window_id": window_id}, board_id=board_id)
+            info(f"已提交PDF文本提取任务: {job['id']}")
+        elif window_type == 'document' and file_extension in OFFICE_EXTENSIONS:
+            job = job_queue.submit("office_conversion", {"window_id": window_id}, board_id=board_id)
+            info(f"已提交Office文档转换任务: {job['id']}")
         
         return {
             "message": "文件上传成功",
-            "filename": file.filename,
-            "window_type": final_window_type,  # 使用最终确定的窗口类型
+            "filename": filename,
+            "window_type": window_type,
             "file_path": updated_window.get('file_path', ''),
             "content": updated_window.get('content', ''),
-            "text_extracted": final_window_type == 'pdf'  # 标记是否进行了文本提取
+            "job_id": job["id"] if job else None,
+            "size": staged.size,
+            "sha256": staged.sha256
         }
         
     except HTTPException:
@@ -671,7 +838,7 @@ async def extract_pdf_text(board_id: str, window_id: str):
         info(f"开始提取PDF文本: {window_id}")
         
         # 获取窗口信息
-        windows = content_manager.get_board_windows(board_id)
+        windows = await async_content_manager.get_board_windows(board_id)
         target_window = None
         for window in windows:
             if window.get('id') == window_id:
@@ -684,14 +851,10 @@ async def extract_pdf_text(board_id: str, window_id: str):
         if target_window.get('type') != 'pdf':
             raise HTTPException(status_code=400, detail="只能提取PDF窗口的文本")
         
-        # 提取PDF文本
-        success = content_manager.extract_pdf_text_to_pages(board_id, window_id, target_window)
-        
-        if not success:
-            raise HTTPException(status_code=500, detail="PDF文本提取失败")
-        
-        info(f"PDF文本提取成功: {window_id}")
-        return {"message": "PDF文本提取成功", "window_id": window_id}
+        # 提交到后台任务队列，进度通过WebSocket推送；手动重新提取时重试之前提取失败的页
+        job = job_queue.submit("pdf_extraction", {"window_id": window_id, "retry_failed": True}, board_id=board_id)
+        info(f"已提交PDF文本提取任务: {job['id']}")
+        return {"message": "PDF文本提取任务已提交", "window_id": window_id, "job_id": job["id"]}
         
     except HTTPException:
         raise
@@ -701,6 +864,177 @@ async def extract_pdf_text(board_id: str, window_id: str):
         error(f"详细错误信息: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# 后台任务
+# Office文档转换支持的扩展名
+OFFICE_EXTENSIONS = ['.doc', '.docx', '.ppt', '.pptx', '.xls', '.xlsx']
+
+def _find_board_window(board_id: str, window_id: str) -> Optional[Dict]:
+    for window in content_manager.get_board_windows(board_id):
+        if window.get('id') == window_id:
+            return window
+    return None
+
+def _run_pdf_extraction_job(context: JobContext) -> Dict:
+    """后台任务：提取PDF窗口的文本到pages文件夹"""
+    window_id = context.params["window_id"]
+    window = _find_board_window(context.board_id, window_id)
+    if not window or window.get('type') != 'pdf':
+        raise ValueError(f"PDF窗口不存在: {window_id}")
+    
+    success = content_manager.extract_pdf_text_to_pages(
+        context.board_id, window_id, window,
+        progress=context.progress, should_cancel=context.is_cancelled,
+        retry_failed=context.params.get("retry_failed", False)
+    )
+    context.check_cancelled()
+    if not success:
+        raise RuntimeError("PDF文本提取失败")
+    return {"window_id": window_id}
+
+def _run_office_conversion_job(context: JobContext) -> Dict:
+    """后台任务：把文档窗口中的Office文件转换为PDF，成功后提交PDF文本提取任务"""
+    import shutil
+    import tempfile
+    board_id = context.board_id
+    window_id = context.params["window_id"]
+    window = _find_board_window(board_id, window_id)
+    board_dir = file_manager.get_board_dir(board_id)
+    if not window or not board_dir or not window.get('file_path'):
+        raise ValueError(f"文档窗口不存在: {window_id}")
+    
+    source_path = board_dir / window['file_path']
+    if source_path.suffix.lower() not in OFFICE_EXTENSIONS:
+        # 重启后重新执行的任务：窗口已经转换过
+        return {"window_id": window_id, "window_type": window.get('type'), "converted": False}
+    if not source_path.exists():
+        raise FileNotFoundError(f"文档文件不存在: {source_path}")
+    
+    context.progress(0, 1, f"正在转换: {source_path.name}")
+    work_dir = Path(tempfile.mkdtemp(dir=get_staging_dir(board_dir)))
+    try:
+        # 转换成功后原文件会移动到originals文件夹，这里先链接（或复制）一份
+        original_copy = work_dir / source_path.name
+        try:
+            os.link(source_path, original_copy)
+        except OSError:
+            shutil.copy2(source_path, original_copy)
+        output_dir = work_dir / "output"
+        output_dir.mkdir()
+        
+        converted_path = document_converter.convert_office_to_pdf(str(original_copy), str(output_dir))
+        context.check_cancelled()
+        
+        converted_types = {'.pdf': 'pdf', '.html': 'document', '.txt': 'text'}
+        if not converted_path or not Path(converted_path).exists() or Path(converted_path).suffix not in converted_types:
+            info(f"Office文档转换失败，保持原格式: {source_path.name}")
+            return {"window_id": window_id, "window_type": "document", "converted": False}
+        
+        converted_path = Path(converted_path)
+        window_type = converted_types[converted_path.suffix]
+        filename = source_path.stem + converted_path.suffix
+        if not content_manager.convert_text_window_to_file_window(
+            board_id, window_id, str(converted_path), filename, window_type, str(original_copy)
+        ):
+            raise RuntimeError(f"更新转换后的窗口失败: {window_id}")
+        info(f"Office文档转换成功: {source_path.name} -> {filename}")
+        context.progress(1, 1, f"转换完成: {filename}")
+        
+        result = {"window_id": window_id, "window_type": window_type, "converted": True, "filename": filename}
+        if window_type == 'pdf':
+            result["extraction_job_id"] = context.submit("pdf_extraction", {"window_id": window_id}, board_id=board_id)["id"]
+        return result
+    finally:
+        _remove_temp_files(str(work_dir))
+
+def _run_bulk_import_job(context: JobContext) -> Dict:
+    """后台任务：把目录或zip中的文件批量导入展板，之后为PDF和Office文档提交后续任务"""
+    params = context.params
+    try:
+        # 服务重启后任务重新执行时按保存的导入计划继续，已导入的文件不会重复导入
+        result = bulk_importer.run(
+            context.board_id, params["source"],
+            progress=context.progress, should_cancel=context.is_cancelled,
+            resume_plan=(context.checkpoint or {}).get("plan"),
+            on_plan=lambda plan: context.save_checkpoint({"plan": plan})
+        )
+    except ImportCancelled:
+        context.check_cancelled()
+        raise
+    finally:
+        if params.get("remove_source"):
+            _remove_temp_files(params["source"])
+    
+    # 后续任务由任务队列按并发上限并行执行
+    followup_jobs = []
+    for window in result.pop("windows"):
+        extension = Path(window["file_path"]).suffix.lower()
+        if window["type"] == "pdf":
+            followup_jobs.append(context.submit("pdf_extraction", {"window_id": window["id"]}, board_id=context.board_id)["id"])
+        elif window["type"] == "document" and extension in OFFICE_EXTENSIONS:
+            followup_jobs.append(context.submit("office_conversion", {"window_id": window["id"]}, board_id=context.board_id)["id"])
+    result["followup_job_ids"] = followup_jobs
+    return result
+
+job_queue.register_handler("pdf_extraction", _run_pdf_extraction_job)
+job_queue.register_handler("office_conversion", _run_office_conversion_job)
+job_queue.register_handler("bulk_import", _run_bulk_import_job)
+
+# 批量导入API：上传zip，或指定服务器本地的目录/zip路径
+@app.post("/api/boards/{board_id}/import")
+async def import_to_board(
+    board_id: str,
+    request: Request,
+    q_path: Optional[str] = Query(None, alias="path"),
+):
+    """批量导入文件到展板（multipart 字段: file 或 path，path 也可以通过查询参数传入），返回任务ID，
+    进度（含每秒文件数）通过WebSocket的 job_progress 推送；path 必须位于 IMPORT_ALLOWED_ROOTS 配置的目录下"""
+    board_dir = await async_file_manager.get_board_dir(board_id)
+    if not board_dir:
+        raise HTTPException(status_code=404, detail="展板不存在")
+    
+    staged, source_path = None, q_path
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/"):
+        upload = await _stream_upload_to_board(board_id, request, require_file=False)
+        staged = upload.file
+        source_path = upload.fields.get("path") or q_path
+    if staged is not None:
+        params = {"source": str(staged.path), "remove_source": True, "name": staged.filename}
+    elif source_path:
+        source = Path(source_path).expanduser().resolve()
+        if not any(source.is_relative_to(Path(root).expanduser().resolve()) for root in IMPORT_ALLOWED_ROOTS):
+            raise HTTPException(status_code=403, detail="导入路径不在允许导入的目录（IMPORT_ALLOWED_ROOTS）下")
+        if not source.exists():
+            raise HTTPException(status_code=400, detail=f"导入路径不存在: {source_path}")
+        params = {"source": str(source), "name": source.name}
+    else:
+        raise HTTPException(status_code=400, detail="需要上传zip文件或提供导入路径")
+    
+    job = job_queue.submit("bulk_import", params, board_id=board_id)
+    info(f"已提交批量导入任务: {job['id']} ({params['name']})")
+    return {"message": "批量导入任务已提交", "job_id": job["id"]}
+
+@app.get("/api/jobs")
+async def list_jobs(status: Optional[str] = None, board_id: Optional[str] = None, limit: int = 100):
+    """列出后台任务（含排队和执行耗时）以及队列状态"""
+    return {"stats": job_queue.stats(), "jobs": job_queue.list_jobs(status, board_id, limit)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询后台任务状态和进度"""
+    job = job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """取消后台任务"""
+    job = job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
 @app.get("/api/media/serve")
 async def serve_media_file(path: str):
     """全新的媒体文件服务API - 避免路由冲突"""
@@ -739,19 +1073,69 @@ async def serve_media_file(path: str):
         print(f"媒体服务失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _list_board_files(files_dir: Path) -> List[Dict]:
+    """扫描展板files目录，返回文件信息列表（按修改时间倒序）"""
+    files_list = []
+    file_types = ["images", "videos", "pdfs", "audios", "texts"]
+    
+    # 扫描标准文件类型目录
+    for file_type in file_types:
+        type_dir = files_dir / file_type
+        if type_dir.exists():
+            for file_path in type_dir.iterdir():
+                if file_path.is_file() and not file_path.name.startswith('.'):
+                    # 获取文件信息
+                    file_stat = file_path.stat()
+                    file_info = {
+                        "name": file_path.name,
+                        "type": file_type,
+                        "size": file_stat.st_size,
+                        "modified": file_stat.st_mtime,
+                        "path": str(file_path),
+                        "url": f"http://{API_HOST}:{API_PORT}/api/media/serve?path={str(file_path)}"
+                    }
+                    files_list.append(file_info)
+    
+    # 也扫描files目录下的直接文件（兼容旧格式）
+    for file_path in files_dir.iterdir():
+        if file_path.is_file() and not file_path.name.startswith('.') and not file_path.name.endswith('.json'):
+            # 根据文件扩展名判断类型
+            file_ext = file_path.suffix.lower()
+            file_type = "texts"  # 默认类型
+            if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
+                file_type = "images"
+            elif file_ext in ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']:
+                file_type = "videos"
+            elif file_ext in ['.mp3', '.wav', '.flac', '.aac', '.ogg']:
+                file_type = "audios"
+            elif file_ext in ['.pdf']:
+                file_type = "pdfs"
+            elif file_ext in ['.txt', '.md', '.doc', '.docx']:
+                file_type = "texts"
+            
+            file_stat = file_path.stat()
+            file_info = {
+                "name": file_path.name,
+                "type": file_type,
+                "size": file_stat.st_size,
+                "modified": file_stat.st_mtime,
+                "path": str(file_path),
+                "url": f"http://{API_HOST}:{API_PORT}/api/media/serve?path={str(file_path)}"
+            }
+            files_list.append(file_info)
+    
+    # 按修改时间倒序排列
+    files_list.sort(key=lambda x: x["modified"], reverse=True)
+    
+    return files_list
+
 # 获取展板文件列表API
 @app.get("/api/boards/{board_id}/files")
 async def get_board_files(board_id: str):
     """获取展板的所有文件列表（用于聊天发送）"""
     try:
         # 获取展板目录
-        board_dir = None
-        for course_dir in file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = await async_file_manager.get_board_dir(board_id)
         
         if not board_dir:
             raise HTTPException(status_code=404, detail="展板不存在")
@@ -760,58 +1144,7 @@ async def get_board_files(board_id: str):
         if not files_dir.exists():
             return {"files": []}
         
-        files_list = []
-        file_types = ["images", "videos", "pdfs", "audios", "texts"]
-        
-        # 扫描标准文件类型目录
-        for file_type in file_types:
-            type_dir = files_dir / file_type
-            if type_dir.exists():
-                for file_path in type_dir.iterdir():
-                    if file_path.is_file() and not file_path.name.startswith('.'):
-                        # 获取文件信息
-                        file_stat = file_path.stat()
-                        file_info = {
-                            "name": file_path.name,
-                            "type": file_type,
-                            "size": file_stat.st_size,
-                            "modified": file_stat.st_mtime,
-                            "path": str(file_path),
-                            "url": f"http://{API_HOST}:{API_PORT}/api/media/serve?path={str(file_path)}"
-                        }
-                        files_list.append(file_info)
-        
-        # 也扫描files目录下的直接文件（兼容旧格式）
-        for file_path in files_dir.iterdir():
-            if file_path.is_file() and not file_path.name.startswith('.') and not file_path.name.endswith('.json'):
-                # 根据文件扩展名判断类型
-                file_ext = file_path.suffix.lower()
-                file_type = "texts"  # 默认类型
-                if file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']:
-                    file_type = "images"
-                elif file_ext in ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm']:
-                    file_type = "videos"
-                elif file_ext in ['.mp3', '.wav', '.flac', '.aac', '.ogg']:
-                    file_type = "audios"
-                elif file_ext in ['.pdf']:
-                    file_type = "pdfs"
-                elif file_ext in ['.txt', '.md', '.doc', '.docx']:
-                    file_type = "texts"
-                
-                file_stat = file_path.stat()
-                file_info = {
-                    "name": file_path.name,
-                    "type": file_type,
-                    "size": file_stat.st_size,
-                    "modified": file_stat.st_mtime,
-                    "path": str(file_path),
-                    "url": f"http://{API_HOST}:{API_PORT}/api/media/serve?path={str(file_path)}"
-                }
-                files_list.append(file_info)
-        
-        # 按修改时间倒序排列
-        files_list.sort(key=lambda x: x["modified"], reverse=True)
-        
+        files_list = await storage_executor.run(_list_board_files, files_dir)
         return {"files": files_list}
     except Exception as e:
         error(f"获取展板文件列表失败: {e}")
@@ -819,14 +1152,37 @@ async def get_board_files(board_id: str):
 
 @app.websocket("/ws/logs")
 async def websocket_logs(websocket: WebSocket):
-    """WebSocket日志端点"""
+    """WebSocket日志端点
+
+    展板事件只发送给订阅者：连接时可用查询参数 ?boards=a,b&courses=c&all=1 订阅，
+    之后发送 {"action": "subscribe"|"unsubscribe", "boards": [...], "courses": [...], "all": bool} 修改订阅
+    """
     await manager.connect(websocket)
+    params = websocket.query_params
+    manager.subscribe(websocket, ConnectionManager.topics_from_request({
+        "boards": [b for b in params.get("boards", "").split(",") if b],
+        "courses": [c for c in params.get("courses", "").split(",") if c],
+        "all": params.get("all") in ("1", "true"),
+    }))
     try:
         while True:
             # 接收客户端消息并回显
             data = await websocket.receive_text()
             try:
                 message_data = json.loads(data)
+                action = message_data.get("action") if isinstance(message_data, dict) else None
+                if action in ("subscribe", "unsubscribe"):
+                    topics = ConnectionManager.topics_from_request(message_data)
+                    if action == "subscribe":
+                        manager.subscribe(websocket, topics)
+                    else:
+                        manager.unsubscribe(websocket, topics)
+                    await manager.send_personal_message(json.dumps({
+                        "type": "subscriptions",
+                        **manager.subscriptions(websocket)
+                    }, ensure_ascii=False), websocket)
+                    continue
+                
                 log_message = f"收到日志消息: {message_data.get('message', '')}"
                 info(log_message)
                 
@@ -938,7 +1294,7 @@ async def websocket_logs(websocket: WebSocket):
 async def get_trash_items():
     """获取回收站中的所有项目"""
     try:
-        items = content_manager.trash_manager.get_trash_items()
+        items = await async_trash_manager.get_trash_items()
         return {"items": items}
     except Exception as e:
         error(f"获取回收站项目失败: {e}")
@@ -948,7 +1304,7 @@ async def get_trash_items():
 async def restore_from_trash(trash_id: str):
     """从回收站恢复文件"""
     try:
-        success = content_manager.trash_manager.restore_from_trash(trash_id)
+        success = await async_trash_manager.restore_from_trash(trash_id)
         if not success:
             raise HTTPException(status_code=404, detail="回收站项目不存在")
         
@@ -964,7 +1320,7 @@ async def restore_from_trash(trash_id: str):
 async def permanently_delete_trash(trash_id: str):
     """永久删除回收站中的文件"""
     try:
-        success = content_manager.trash_manager.permanently_delete(trash_id)
+        success = await async_trash_manager.permanently_delete(trash_id)
         if not success:
             raise HTTPException(status_code=404, detail="回收站项目不存在")
         
@@ -980,7 +1336,7 @@ async def permanently_delete_trash(trash_id: str):
 async def empty_trash():
     """清空回收站"""
     try:
-        success = content_manager.trash_manager.empty_trash()
+        success = await async_trash_manager.empty_trash()
         if not success:
             raise HTTPException(status_code=500, detail="清空回收站失败")
         
@@ -994,7 +1350,7 @@ async def empty_trash():
 async def get_trash_size():
     """获取回收站大小"""
     try:
-        size = content_manager.trash_manager.get_trash_size()
+        size = await async_trash_manager.get_trash_size()
         return {"size": size}
     except Exception as e:
         error(f"获取回收站大小失败: {e}")
@@ -1006,7 +1362,7 @@ async def get_trash_size():
 async def get_board_conversations(board_id: str):
     """获取展板的所有对话记录"""
     try:
-        conversations = conversation_manager.get_board_conversations(board_id)
+        conversations = await async_conversation_manager.get_board_conversations(board_id)
         return {"conversations": conversations}
     except Exception as e:
         error(f"获取展板对话记录失败: {e}")
@@ -1016,7 +1372,7 @@ async def get_board_conversations(board_id: str):
 async def create_conversation(board_id: str, title: str = ""):
     """创建新的对话记录"""
     try:
-        conversation = conversation_manager.create_conversation(board_id, title)
+        conversation = await async_conversation_manager.create_conversation(board_id, title)
         info(f"创建对话成功: {conversation['id']}")
         return conversation
     except Exception as e:
@@ -1027,7 +1383,7 @@ async def create_conversation(board_id: str, title: str = ""):
 async def get_conversation(board_id: str, conversation_id: str):
     """获取指定对话记录"""
     try:
-        conversation = conversation_manager.get_conversation(board_id, conversation_id)
+        conversation = await async_conversation_manager.get_conversation(board_id, conversation_id)
         if not conversation:
             raise HTTPException(status_code=404, detail="对话不存在")
         return conversation
@@ -1041,7 +1397,7 @@ async def get_conversation(board_id: str, conversation_id: str):
 async def add_message(board_id: str, conversation_id: str, message: Dict):
     """向对话中添加消息"""
     try:
-        success = conversation_manager.add_message(board_id, conversation_id, message)
+        success = await async_conversation_manager.add_message(board_id, conversation_id, message)
         if not success:
             raise HTTPException(status_code=404, detail="对话不存在")
         info(f"添加消息成功: {conversation_id}")
@@ -1056,7 +1412,7 @@ async def add_message(board_id: str, conversation_id: str, message: Dict):
 async def update_conversation_title(board_id: str, conversation_id: str, title: str):
     """更新对话标题"""
     try:
-        success = conversation_manager.update_conversation_title(board_id, conversation_id, title)
+        success = await async_conversation_manager.update_conversation_title(board_id, conversation_id, title)
         if not success:
             raise HTTPException(status_code=404, detail="对话不存在")
         info(f"更新对话标题成功: {conversation_id}")
@@ -1071,7 +1427,7 @@ async def update_conversation_title(board_id: str, conversation_id: str, title:
 async def delete_conversation(board_id: str, conversation_id: str):
     """删除对话记录"""
     try:
-        success = conversation_manager.delete_conversation(board_id, conversation_id)
+        success = await async_conversation_manager.delete_conversation(board_id, conversation_id)
         if not success:
             raise HTTPException(status_code=404, detail="对话不存在")
         info(f"删除对话成功: {conversation_id}")
@@ -1086,7 +1442,7 @@ async def delete_conversation(board_id: str, conversation_id: str):
 async def get_conversation_context(board_id: str, conversation_id: str, limit: int = 50):
     """获取对话上下文（用于LLM调用）"""
     try:
-        context = conversation_manager.get_conversation_context(board_id, conversation_id, limit)
+        context = await async_conversation_manager.get_conversation_context(board_id, conversation_id, limit)
         return {"context": context}
     except Exception as e:
         error(f"获取对话上下文失败: {e}")
@@ -0,0 +1,50 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# 进程内运行指标：计数器、仪表值和耗时统计，通过 /api/metrics 查看
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+
+def increment(name, amount=1):
+    """累加计数器"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def set_gauge(name, value):
+    """设置仪表值（当前状态，如队列长度）"""
+    with _lock:
+        _gauges[name] = value
+
+def observe(name, seconds):
+    """记录一次耗时"""
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+@contextmanager
+def timer(name):
+    """统计代码块耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def snapshot():
+    """返回所有指标的快照"""
+    with _lock:
+        timings = {
+            name: {
+                "count": t["count"],
+                "total": round(t["total"], 6),
+                "avg": round(t["total"] / t["count"], 6) if t["count"] else 0.0,
+                "max": round(t["max"], 6),
+            }
+            for name, t in _timings.items()
+        }
+        return {"counters": dict(_counters), "gauges": dict(_gauges), "timings": timings}
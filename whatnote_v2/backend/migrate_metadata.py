@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+元数据迁移命令行工具
+
+在 JSON 配置文件和 SQLite 元数据存储（config.METADATA_DB_FILE）之间转换，运行前请先停止后端。
+METADATA_BACKEND 设为 "sqlite" 后第一次启动时会自动导入；之后数据目录被外部修改过，可以用 migrate 重新导入。
+关闭 METADATA_SIDECAR_EXPORT 时，用 export 按需写出 JSON 文件，使数据目录保持可直接阅读。
+
+用法:
+    python migrate_metadata.py migrate          # JSON 文件 -> SQLite
+    python migrate_metadata.py export           # SQLite -> JSON 文件
+    python migrate_metadata.py stats            # 查看数据库中的记录数
+"""
+
+import argparse
+import json
+import sys
+
+from config import METADATA_DB_FILE
+from storage.file_manager import FileSystemManager
+from storage.metadata_migrator import export_json_files, migrate_to_sqlite
+from storage.metadata_store import SqliteMetadataStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在JSON配置文件和SQLite元数据存储之间迁移")
+    parser.add_argument("command", choices=["migrate", "export", "stats"], help="要执行的操作")
+    args = parser.parse_args()
+
+    file_manager = FileSystemManager()
+    store = file_manager.metadata or SqliteMetadataStore(METADATA_DB_FILE)
+
+    if args.command == "migrate":
+        counts = migrate_to_sqlite(store, file_manager)
+        print(f"已导入SQLite: {json.dumps(counts, ensure_ascii=False)}")
+    elif args.command == "export":
+        counts = export_json_files(store, file_manager)
+        print(f"已导出JSON文件: {json.dumps(counts, ensure_ascii=False)}")
+    else:
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+"""
+LibreOffice 常驻转换进程池
+每个工作进程是一个长期运行的 headless soffice，使用独立的用户配置目录并在本地端口上接受 UNO 连接，
+转换时复用已启动的进程，省去每个文件数秒的冷启动。
+工作进程在交付前做健康检查，单次转换超时会被结束并重启，处理 N 个文件后自动回收。
+没有安装 python-uno 时退化为命令行转换，但每个工作进程仍使用自己的配置目录，多个转换可以并行
+"""
+
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import metrics
+from config import (
+    OFFICE_BINARY,
+    OFFICE_JOB_TIMEOUT,
+    OFFICE_POOL_SIZE,
+    OFFICE_WORKER_MAX_JOBS,
+    OFFICE_WORKER_START_TIMEOUT,
+)
+
+# 不同文档类型使用的PDF导出过滤器
+PDF_EXPORT_FILTERS = {
+    '.doc': 'writer_pdf_Export', '.docx': 'writer_pdf_Export',
+    '.ppt': 'impress_pdf_Export', '.pptx': 'impress_pdf_Export',
+    '.xls': 'calc_pdf_Export', '.xlsx': 'calc_pdf_Export',
+}
+
+
+def find_office_binary() -> Optional[str]:
+    """查找 LibreOffice 可执行文件"""
+    if OFFICE_BINARY:
+        return OFFICE_BINARY
+    for name in ('soffice', 'libreoffice'):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _uno_available() -> bool:
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _uno_properties(**values):
+    from com.sun.star.beans import PropertyValue
+
+    properties = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+
+class OfficeWorker:
+    """一个常驻的 LibreOffice 进程（或命令行模式下的一个独立配置目录）"""
+
+    def __init__(self, index: int, binary: str, profile_root: Path, use_uno: bool):
+        self.index = index
+        self.binary = binary
+        self.profile_dir = profile_root / f"worker_{index}"
+        self.use_uno = use_uno
+        self.jobs_done = 0
+        self.restarts = 0
+        self.started = False
+        self._process: Optional[subprocess.Popen] = None
+        self._desktop = None
+        self._timed_out = False
+
+    @property
+    def profile_url(self) -> str:
+        return self.profile_dir.absolute().as_uri()
+
+    def _base_args(self) -> List[str]:
+        return [
+            self.binary,
+            '--headless', '--invisible', '--nologo', '--norestore', '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={self.profile_url}',
+        ]
+
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def is_healthy(self) -> bool:
+        """健康检查：进程存活且 UNO 连接可用（命令行模式只检查配置目录和可执行文件）"""
+        if not self.use_uno:
+            return self.profile_dir.exists() and os.path.exists(self.binary)
+        if not self.is_running() or self._desktop is None:
+            return False
+        try:
+            self._desktop.getFrames()
+            return True
+        except Exception:
+            return False
+
+    def start(self):
+        """启动 soffice 并等待 UNO 连接就绪"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.started = True
+        if not self.use_uno:
+            return
+
+        import uno
+
+        port = _free_port()
+        accept = f"socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+        self._process = subprocess.Popen(
+            self._base_args() + [f'--accept={accept}'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + OFFICE_WORKER_START_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{accept}")
+                break
+            except Exception:
+                if not self.is_running() or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice工作进程 {self.index} 启动失败")
+                time.sleep(0.25)
+        self._desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+        self.jobs_done = 0
+        print(f"LibreOffice工作进程 {self.index} 已启动 (pid={self._process.pid}, port={port})")
+
+    def stop(self):
+        """结束进程（先尝试正常退出）"""
+        desktop, self._desktop = self._desktop, None
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if desktop is not None and process.poll() is None:
+            try:
+                desktop.terminate()
+            except Exception:
+                pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def restart(self):
+        self.stop()
+        self.restarts += 1
+        metrics.increment("office_pool.restarts")
+        self.start()
+
+    def _kill(self):
+        self._timed_out = True
+        if self._process is not None:
+            self._process.kill()
+
+    def convert(self, source_path: Path, pdf_path: Path, timeout: float) -> str:
+        """把文档转换为 pdf_path，超时抛出 TimeoutError"""
+        if self.use_uno:
+            self._convert_uno(source_path, pdf_path, timeout)
+        else:
+            self._convert_cli(source_path, pdf_path, timeout)
+        self.jobs_done += 1
+        if not pdf_path.exists():
+            raise RuntimeError("PDF文件未生成")
+        return str(pdf_path)
+
+    def _convert_uno(self, source_path: Path, pdf_path: Path, timeout: float):
+        import uno
+
+        export_filter = PDF_EXPORT_FILTERS.get(source_path.suffix.lower(), 'writer_pdf_Export')
+        # 超时后结束进程，阻塞中的UNO调用随之返回异常
+        self._timed_out = False
+        watchdog = threading.Timer(timeout, self._kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            document = self._desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(str(source_path.absolute())), "_blank", 0,
+                _uno_properties(Hidden=True, ReadOnly=True)
+            )
+            try:
+                document.storeToURL(
+                    uno.systemPathToFileUrl(str(pdf_path.absolute())),
+                    _uno_properties(FilterName=export_filter)
+                )
+            finally:
+                document.close(True)
+        except Exception:
+            if self._timed_out:
+                raise TimeoutError(f"LibreOffice转换超时 ({timeout} 秒)")
+            raise
+        finally:
+            watchdog.cancel()
+
+    def _convert_cli(self, source_path: Path, pdf_path: Path, timeout: float):
+        # 命令行转换的输出文件名由 LibreOffice 决定（原文件名 + .pdf），输出到 pdf_path 所在目录
+        cmd = self._base_args() + ['--convert-to', 'pdf', '--outdir', str(pdf_path.parent), str(source_path)]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"LibreOffice转换超时 ({timeout} 秒)")
+        if result.returncode != 0:
+            raise RuntimeError(f"LibreOffice转换失败: {result.stderr}")
+
+
+class OfficeWorkerPool:
+    """LibreOffice 工作进程池（首次转换时才启动进程）"""
+
+    def __init__(self, size: int = OFFICE_POOL_SIZE, job_timeout: float = OFFICE_JOB_TIMEOUT,
+                 max_jobs_per_worker: int = OFFICE_WORKER_MAX_JOBS):
+        self.size = size
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._workers: List[OfficeWorker] = []
+        self._idle: "queue.Queue[OfficeWorker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._binary: Optional[str] = None
+        self._profile_root: Optional[Path] = None
+        self._busy = 0
+
+    def _ensure_workers(self) -> bool:
+        with self._lock:
+            if self._workers:
+                return True
+            self._binary = find_office_binary()
+            if not self._binary:
+                return False
+            use_uno = _uno_available()
+            self._profile_root = Path(tempfile.mkdtemp(prefix="whatnote_office_"))
+            for index in range(self.size):
+                worker = OfficeWorker(index, self._binary, self._profile_root, use_uno)
+                self._workers.append(worker)
+                self._idle.put(worker)
+            mode = "UNO常驻进程" if use_uno else "命令行（独立配置目录）"
+            print(f"LibreOffice进程池已创建: {self.size} 个工作进程，模式: {mode}")
+            return True
+
+    def available(self) -> bool:
+        return self._ensure_workers()
+
+    def convert(self, source_path: Path, pdf_path: Path) -> str:
+        """用池中空闲的工作进程转换文档，返回PDF路径"""
+        if not self._ensure_workers():
+            raise RuntimeError("LibreOffice未安装")
+
+        try:
+            worker = self._idle.get(timeout=self.job_timeout)
+        except queue.Empty:
+            metrics.increment("office_pool.acquire_timeouts")
+            raise TimeoutError("没有空闲的LibreOffice工作进程")
+
+        with self._lock:
+            self._busy += 1
+            metrics.set_gauge("office_pool.busy", self._busy)
+        try:
+            # 交付前健康检查，不健康（未启动、崩溃、上次超时被结束）则重启
+            if not worker.is_healthy():
+                if worker.started:
+                    worker.restart()
+                else:
+                    worker.start()
+
+            with metrics.timer("office_pool.convert"):
+                result = worker.convert(Path(source_path), Path(pdf_path), self.job_timeout)
+            metrics.increment("office_pool.conversions")
+
+            if worker.use_uno and worker.jobs_done >= self.max_jobs_per_worker:
+                # 长时间运行的 soffice 会累积内存，定期回收
+                print(f"LibreOffice工作进程 {worker.index} 已处理 {worker.jobs_done} 个文件，回收重启")
+                metrics.increment("office_pool.recycled")
+                worker.restart()
+            return result
+        except TimeoutError:
+            metrics.increment("office_pool.timeouts")
+            worker.stop()
+            raise
+        except Exception:
+            metrics.increment("office_pool.failures")
+            raise
+        finally:
+            with self._lock:
+                self._busy -= 1
+                metrics.set_gauge("office_pool.busy", self._busy)
+            self._idle.put(worker)
+
+    def stats(self) -> Dict:
+        """进程池状态"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "busy": self._busy,
+                "binary": self._binary,
+                "workers": [
+                    {
+                        "index": worker.index,
+                        "mode": "uno" if worker.use_uno else "cli",
+                        "running": worker.is_running(),
+                        "jobs_done": worker.jobs_done,
+                        "restarts": worker.restarts,
+                    }
+                    for worker in self._workers
+                ],
+            }
+
+    def shutdown(self):
+        """结束所有工作进程并删除临时配置目录"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._idle = queue.Queue()
+            profile_root, self._profile_root = self._profile_root, None
+        for worker in workers:
+            worker.stop()
+        if profile_root:
+            shutil.rmtree(profile_root, ignore_errors=True)
@@ -0,0 +1,101 @@
+"""
+异步存储门面
+存储管理器的方法都是同步的文件 I/O，在 async 接口中直接调用会阻塞事件循环。
+这里把调用派发到有界线程池执行，并记录排队深度和耗时指标。
+持有展板锁的方法（board_reader/board_writer/window_writer）先在事件循环上的展板闸门排队，再占用线程
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from config import STORAGE_IO_WORKERS
+
+
+class StorageExecutor:
+    """执行阻塞存储操作的有界线程池"""
+
+    def __init__(self, max_workers: int = STORAGE_IO_WORKERS, name: str = "storage_io"):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+
+    def _update_gauges(self):
+        metrics.set_gauge(f"{self.name}.queue_depth", self._queued)
+        metrics.set_gauge(f"{self.name}.active", self._active)
+
+    async def run(self, func, *args, **kwargs):
+        """在线程池中执行 func(*args, **kwargs) 并等待结果"""
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            if self._queued + self._active > self.max_workers:
+                # 所有线程都在忙，新任务需要排队
+                metrics.increment(f"{self.name}.saturated")
+            self._update_gauges()
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._update_gauges()
+            metrics.observe(f"{self.name}.wait", started_at - submitted_at)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._update_gauges()
+                metrics.observe(f"{self.name}.run", time.perf_counter() - started_at)
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, task)
+
+    def shutdown(self):
+        """关闭线程池（等待正在执行的任务完成）"""
+        self._executor.shutdown(wait=True)
+
+
+class AsyncStorage:
+    """
+    存储管理器的异步代理：方法调用在 StorageExecutor 中执行并返回协程，
+    非方法属性原样返回，例如 await async_content_manager.get_board_windows(board_id)
+
+    管理器有展板锁（manager.locks）时，带锁的方法先获取同一展板的事件循环侧闸门，
+    线程池中的线程因此不会在等待展板锁时被占住
+    """
+
+    def __init__(self, manager, executor: StorageExecutor):
+        self._manager = manager
+        self._executor = executor
+        self._gates = getattr(getattr(manager, "locks", None), "async_gates", None)
+
+    def __getattr__(self, name):
+        attr = getattr(self._manager, name)
+        if not callable(attr):
+            return attr
+        mode = getattr(attr, "board_lock", None)
+        if mode is None or self._gates is None:
+            @functools.wraps(attr)
+            async def call(*args, **kwargs):
+                return await self._executor.run(attr, *args, **kwargs)
+
+            return call
+
+        @functools.wraps(attr)
+        async def gated_call(*args, **kwargs):
+            board_id = args[0] if args else kwargs["board_id"]
+            window_id = None
+            if mode == "window":
+                window_id = args[1] if len(args) > 1 else kwargs["window_id"]
+            async with self._gates.hold(mode, board_id, window_id):
+                return await self._executor.run(attr, *args, **kwargs)
+
+        return gated_call
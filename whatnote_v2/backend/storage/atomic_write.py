@@ -0,0 +1,137 @@
+"""
+原子写入
+先写同目录下的临时文件，再 rename 覆盖目标文件，读取方（和崩溃后的重启）只会看到旧内容或完整的新内容，不会看到写了一半的文件。
+持久性按调用位置配置（config.ATOMIC_WRITE_DURABILITY）：
+  strict  - 临时文件 fsync 后 rename，并立即 fsync 所在目录
+  normal  - 临时文件 fsync 后 rename，目录的 fsync 合并后批量执行（ATOMIC_DIR_SYNC_INTERVAL 秒内同一目录只 fsync 一次）
+  relaxed - 只保证原子替换，不 fsync
+"""
+
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional, Set
+
+import metrics
+from config import ATOMIC_DIR_SYNC_INTERVAL, ATOMIC_WRITE_DURABILITY
+
+DURABILITY_STRICT = "strict"
+DURABILITY_NORMAL = "normal"
+DURABILITY_RELAXED = "relaxed"
+
+# 临时文件后缀；文件监控和孤立文件补建据此跳过写入过程中的临时文件
+TEMP_SUFFIX = ".wn-tmp"
+
+
+def is_temp_path(path) -> bool:
+    """是否是原子写入的临时文件"""
+    return str(path).endswith(TEMP_SUFFIX)
+
+
+def _fsync_directory(directory: str):
+    """fsync 目录，使其中的 rename 落盘（Windows 不支持打开目录，跳过）"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+        metrics.increment("atomic_write.dir_fsyncs")
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class DirectorySyncer:
+    """合并目录 fsync：登记的目录在 interval 秒后由后台定时器统一 fsync"""
+
+    def __init__(self, interval: float = ATOMIC_DIR_SYNC_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+
+    def schedule(self, directory: str):
+        with self._lock:
+            if directory in self._pending:
+                metrics.increment("atomic_write.dir_fsyncs_coalesced")
+                return
+            self._pending.add(directory)
+            if self._timer is None:
+                self._timer = threading.Timer(self.interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def discard(self, directory: str):
+        """目录刚被立即 fsync 过，不再需要批量 fsync"""
+        with self._lock:
+            self._pending.discard(directory)
+
+    def flush(self):
+        """立即 fsync 所有待同步的目录（定时器到期或停止服务时调用）"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for directory in pending:
+            _fsync_directory(directory)
+
+
+directory_syncer = DirectorySyncer()
+
+
+def _durability_for(kind: Optional[str], durability: Optional[str]) -> str:
+    if durability:
+        return durability
+    return ATOMIC_WRITE_DURABILITY.get(kind, DURABILITY_NORMAL)
+
+
+def _atomic_write(path, payload, kind: Optional[str], durability: Optional[str], mode: str, **open_kwargs):
+    path = Path(path)
+    durability = _durability_for(kind, durability)
+    directory = str(path.parent)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}{TEMP_SUFFIX}")
+    try:
+        with open(temp_path, mode, **open_kwargs) as f:
+            f.write(payload)
+            if durability != DURABILITY_RELAXED:
+                f.flush()
+                os.fsync(f.fileno())
+                metrics.increment("atomic_write.file_fsyncs")
+        os.replace(temp_path, path)
+    except BaseException:
+        # 写入失败（包括编码错误）时目标文件保持原样
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    metrics.increment("atomic_write.writes")
+
+    if durability == DURABILITY_STRICT:
+        directory_syncer.discard(directory)
+        _fsync_directory(directory)
+    elif durability == DURABILITY_NORMAL:
+        directory_syncer.schedule(directory)
+
+
+def atomic_write_bytes(path, data: bytes, kind: str = None, durability: str = None):
+    """原子写入字节；kind 是 ATOMIC_WRITE_DURABILITY 中的调用位置名，durability 可直接指定持久性"""
+    _atomic_write(path, data, kind, durability, "wb")
+
+
+def atomic_write_text(path, text: str, kind: str = None, durability: str = None,
+                      encoding: str = "utf-8", errors: str = "strict"):
+    """原子写入文本（文本模式，换行符与直接 open(path, "w") 写入一致）"""
+    _atomic_write(path, text, kind, durability, "w", encoding=encoding, errors=errors)
+
+
+def atomic_write_json(path, data, kind: str = None, durability: str = None, indent: int = 2):
+    """原子写入 JSON（格式与 json.dump(..., ensure_ascii=False, indent=2) 一致）"""
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False, indent=indent), kind=kind, durability=durability)
@@ -0,0 +1,189 @@
+"""
+文本窗口内容的延迟写入缓冲
+编辑器几乎每次按键都会提交整段内容；缓冲区在内存中只保留每个窗口的最新内容，满足以下任一条件时才写盘：
+  空闲 - 最后一次修改后 idle 秒内没有新的修改
+  间隔 - 持续修改时，距第一次未写盘的修改已经过了 max_delay 秒
+  大小 - 缓冲的内容总量超过 max_pending_bytes
+读取窗口时优先返回缓冲中的内容；展板的结构性修改开始前和停止服务时写出所有待写内容。
+写盘失败的内容留在缓冲中，retry 秒后重试
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from config import AUTOSAVE_IDLE_SECONDS, AUTOSAVE_MAX_DELAY_SECONDS, AUTOSAVE_MAX_PENDING_BYTES, AUTOSAVE_RETRY_SECONDS
+
+
+class _PendingContent:
+    __slots__ = ("content", "size", "first_dirty", "last_update", "retry_at")
+
+    def __init__(self, content: str, now: float):
+        self.content = content
+        self.size = len(content.encode("utf-8", "ignore"))
+        self.first_dirty = now
+        self.last_update = now
+        self.retry_at = 0.0
+
+
+class AutosaveBuffer:
+    """
+    按 (board_id, window_id) 缓冲最新的窗口内容，由后台线程按期写盘
+
+    flush_window(board_id, window_id) 负责写出单个窗口：它应在持有窗口锁的情况下调用 take() 取出内容再写盘，
+    这样与同一窗口的其他修改之间不会出现旧内容覆盖新内容；写盘失败时调用 restore() 放回取出的内容并抛出异常
+    """
+
+    def __init__(self, flush_window: Callable[[str, str], None],
+                 idle: float = AUTOSAVE_IDLE_SECONDS,
+                 max_delay: float = AUTOSAVE_MAX_DELAY_SECONDS,
+                 max_pending_bytes: int = AUTOSAVE_MAX_PENDING_BYTES,
+                 retry: float = AUTOSAVE_RETRY_SECONDS):
+        self.flush_window = flush_window
+        self.idle = idle
+        self.max_delay = max_delay
+        self.max_pending_bytes = max_pending_bytes
+        self.retry = retry
+        self._cond = threading.Condition(threading.Lock())
+        self._entries: Dict[Tuple[str, str], _PendingContent] = {}
+        self._pending_bytes = 0
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def put(self, board_id: str, window_id: str, content: str) -> bool:
+        """缓冲窗口的最新内容；缓冲区已关闭时返回False，调用方应直接写盘"""
+        key = (board_id, window_id)
+        now = time.monotonic()
+        with self._cond:
+            if self._closed:
+                return False
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _PendingContent(content, now)
+            else:
+                metrics.increment("autosave.coalesced")
+                self._pending_bytes -= entry.size
+                entry.content = content
+                entry.size = len(content.encode("utf-8", "ignore"))
+                entry.last_update = now
+            self._pending_bytes += entry.size
+            self._update_gauges()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="autosave-flusher", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        metrics.increment("autosave.buffered")
+        return True
+
+    def contains(self, board_id: str, window_id: str) -> bool:
+        with self._cond:
+            return (board_id, window_id) in self._entries
+
+    def get(self, board_id: str, window_id: str) -> Optional[str]:
+        """返回尚未写盘的内容，没有则返回None"""
+        with self._cond:
+            entry = self._entries.get((board_id, window_id))
+            return entry.content if entry else None
+
+    def take(self, board_id: str, window_id: str) -> Optional[str]:
+        """取出待写盘的内容（由 flush_window 调用），没有则返回None"""
+        content = self._pop(board_id, window_id)
+        if content is not None:
+            metrics.increment("autosave.flushed")
+        return content
+
+    def restore(self, board_id: str, window_id: str, content: str):
+        """写盘失败后放回 take() 取出的内容；期间已经缓冲了更新的内容时保留更新的内容"""
+        key = (board_id, window_id)
+        now = time.monotonic()
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _PendingContent(content, now)
+                self._pending_bytes += entry.size
+                self._update_gauges()
+            entry.retry_at = now + self.retry
+            self._cond.notify()
+        metrics.increment("autosave.restored")
+
+    def discard(self, board_id: str, window_id: str):
+        """丢弃待写盘的内容（窗口内容被其他操作整体覆盖时调用）"""
+        if self._pop(board_id, window_id) is not None:
+            metrics.increment("autosave.discarded")
+
+    def _pop(self, board_id: str, window_id: str) -> Optional[str]:
+        with self._cond:
+            entry = self._entries.pop((board_id, window_id), None)
+            if entry is None:
+                return None
+            self._pending_bytes -= entry.size
+            self._update_gauges()
+            return entry.content
+
+    def flush(self, board_id: str = None):
+        """立即写出待写盘的内容；指定 board_id 时只写出该展板的窗口"""
+        with self._cond:
+            keys = [key for key in self._entries if board_id is None or key[0] == board_id]
+        self._flush_keys(keys)
+
+    def close(self):
+        """停止后台线程并写出所有内容；之后的 put 返回False"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=10)
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {"windows": len(self._entries), "bytes": self._pending_bytes}
+
+    def _update_gauges(self):
+        metrics.set_gauge("autosave.pending", len(self._entries))
+        metrics.set_gauge("autosave.pending_bytes", self._pending_bytes)
+
+    def _flush_keys(self, keys: List[Tuple[str, str]]):
+        for board_id, window_id in keys:
+            try:
+                self.flush_window(board_id, window_id)
+            except Exception as e:
+                # 内容保留在缓冲中（flush_window 已放回取出的内容），retry 秒后再试
+                metrics.increment("autosave.flush_failed")
+                with self._cond:
+                    entry = self._entries.get((board_id, window_id))
+                    if entry is not None:
+                        entry.retry_at = max(entry.retry_at, time.monotonic() + self.retry)
+                print(f"写出缓冲的窗口内容失败，稍后重试: {window_id}, 错误: {e}")
+
+    def _due_keys(self, now: float) -> Tuple[List[Tuple[str, str]], Optional[float]]:
+        """返回 (到期需要写盘的窗口, 距下一个到期时间的秒数)；写盘失败的窗口在重试时间之前不到期"""
+        oversized = self._pending_bytes > self.max_pending_bytes
+        due = []
+        next_deadline = None
+        for key, entry in self._entries.items():
+            if oversized:
+                deadline = entry.retry_at
+            else:
+                deadline = max(min(entry.last_update + self.idle, entry.first_dirty + self.max_delay), entry.retry_at)
+            if deadline <= now:
+                due.append(key)
+            elif next_deadline is None or deadline < next_deadline:
+                next_deadline = deadline
+        if oversized and due:
+            metrics.increment("autosave.size_flushes")
+        return due, (next_deadline - now if next_deadline is not None else None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    due, wait = self._due_keys(time.monotonic())
+                    if due:
+                        break
+                    self._cond.wait(wait)
+            self._flush_keys(due)
@@ -0,0 +1,219 @@
+"""
+内容寻址的文件存储
+上传的文件按 SHA-256 保存到 blobs/<前两位>/<sha256>，展板 files 目录中的文件是指向它的硬链接。
+引用计数就是硬链接数减一：移到回收站、从回收站恢复都是同一文件系统内的重命名，引用数不变；
+删除文件前用 referenced_blobs 找出它们引用的 blob（按 inode 查索引），删除后由 release 只检查这些 blob 的引用数并回收；
+collect_garbage 全量扫描所有 blob，作为手动执行的维护操作。
+文本文件会被原地编辑，不进入存储（否则会同时修改所有引用）
+"""
+
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import metrics
+from config import BLOB_STORE_EXCLUDE_EXTENSIONS
+
+
+class BlobStore:
+    """按内容哈希去重的文件存储"""
+
+    def __init__(self, blobs_dir: Path):
+        self.blobs_dir = Path(blobs_dir)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # (st_dev, st_ino) -> sha256，第一次使用时扫描一次存储目录建立，之后随链接和回收更新
+        self._by_inode: Optional[Dict[Tuple[int, int], str]] = None
+
+    @staticmethod
+    def _valid_hash(sha256: str) -> bool:
+        return bool(sha256) and len(sha256) == 64 and all(c in "0123456789abcdef" for c in sha256)
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self.blobs_dir / sha256[:2] / sha256
+
+    def accepts(self, filename: str) -> bool:
+        """该文件是否适合放入存储（文本文件会被原地修改，不适合共享）"""
+        return Path(filename).suffix.lower() not in BLOB_STORE_EXCLUDE_EXTENSIONS
+
+    def exists(self, sha256: str, size: int = None) -> bool:
+        """存储中是否已有该内容（可同时校验大小）"""
+        sha256 = (sha256 or "").lower()
+        if not self._valid_hash(sha256):
+            return False
+        try:
+            stat = self._blob_path(sha256).stat()
+        except OSError:
+            return False
+        return size is None or stat.st_size == size
+
+    def read_range(self, sha256: str, offset: int, length: int) -> bytes:
+        """读取 blob 中 [offset, offset + length) 的内容"""
+        with open(self._blob_path(sha256.lower()), "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def refcount(self, sha256: str) -> int:
+        """引用该 blob 的文件数量（展板文件和回收站中的文件）"""
+        try:
+            return self._blob_path(sha256.lower()).stat().st_nlink - 1
+        except OSError:
+            return 0
+
+    def link_into(self, sha256: str, target: Path, source: Optional[Path] = None, move: bool = False) -> bool:
+        """
+        把内容为 sha256 的文件放到 target
+
+        blob 已存在时直接创建硬链接，不读写文件内容（常数时间）；否则把 source 收入存储后再链接。
+        move=True 时 source 在完成后被删除。无法放入存储时返回False，由调用方按原方式保存
+        """
+        sha256 = (sha256 or "").lower()
+        if not self._valid_hash(sha256):
+            return False
+        blob_path = self._blob_path(sha256)
+        target = Path(target)
+
+        with self._lock:
+            if blob_path.exists():
+                metrics.increment("blob_store.dedup_hits")
+                metrics.increment("blob_store.bytes_saved", blob_path.stat().st_size)
+            else:
+                if source is None or not Path(source).exists():
+                    return False
+                blob_path.parent.mkdir(exist_ok=True)
+                temp_path = blob_path.with_name(blob_path.name + ".tmp")
+                if move:
+                    # 暂存目录与存储在同一文件系统时是一次重命名
+                    shutil.move(str(source), str(temp_path))
+                else:
+                    shutil.copy2(source, temp_path)
+                os.replace(temp_path, blob_path)
+                metrics.increment("blob_store.blobs_added")
+
+            if self._by_inode is not None:
+                blob_stat = blob_path.stat()
+                self._by_inode[(blob_stat.st_dev, blob_stat.st_ino)] = sha256
+
+            try:
+                os.link(blob_path, target)
+            except OSError as e:
+                # 文件系统不支持硬链接时退化为复制
+                print(f"创建硬链接失败，改为复制: {target}, 错误: {e}")
+                shutil.copy2(blob_path, target)
+                metrics.increment("blob_store.link_fallbacks")
+
+        if move and source is not None and os.path.exists(source):
+            os.remove(source)
+        return True
+
+    def _inode_index(self) -> Dict[Tuple[int, int], str]:
+        """调用方持有 self._lock"""
+        if self._by_inode is None:
+            index = {}
+            for prefix_dir in self.blobs_dir.iterdir():
+                if not prefix_dir.is_dir():
+                    continue
+                for blob_path in prefix_dir.iterdir():
+                    if self._valid_hash(blob_path.name):
+                        try:
+                            stat = blob_path.stat()
+                        except OSError:
+                            continue
+                        index[(stat.st_dev, stat.st_ino)] = blob_path.name
+            self._by_inode = index
+        return self._by_inode
+
+    def referenced_blobs(self, paths: Iterable[Path]) -> Set[str]:
+        """返回这些文件（目录则包括其中所有文件）引用的 blob，在删除文件之前调用"""
+        file_stats = []
+        for path in paths:
+            path = Path(path)
+            if path.is_dir():
+                for root, _, files in os.walk(path):
+                    file_stats.extend(self._link_stat(Path(root) / name) for name in files)
+            else:
+                file_stats.append(self._link_stat(path))
+        keys = [key for key in file_stats if key is not None]
+        if not keys:
+            return set()
+        with self._lock:
+            index = self._inode_index()
+            return {index[key] for key in keys if key in index}
+
+    @staticmethod
+    def _link_stat(path: Path) -> Optional[Tuple[int, int]]:
+        """有多个硬链接的文件返回 (st_dev, st_ino)，否则返回None（不可能指向 blob）"""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_dev, stat.st_ino) if stat.st_nlink > 1 else None
+
+    def release(self, hashes: Iterable[str]) -> int:
+        """文件删除后检查这些 blob 的引用数，没有引用的删除，返回删除数量"""
+        removed = 0
+        with self._lock:
+            for sha256 in hashes:
+                blob_path = self._blob_path(sha256)
+                try:
+                    stat = blob_path.stat()
+                    if stat.st_nlink > 1:
+                        continue
+                    blob_path.unlink()
+                except OSError:
+                    continue
+                if self._by_inode is not None:
+                    self._by_inode.pop((stat.st_dev, stat.st_ino), None)
+                removed += 1
+        if removed:
+            metrics.increment("blob_store.blobs_collected", removed)
+        return removed
+
+    def collect_garbage(self) -> int:
+        """全量扫描，删除没有任何引用的 blob，返回删除数量（维护操作，日常删除使用 release）"""
+        removed = 0
+        with self._lock:
+            for prefix_dir in self.blobs_dir.iterdir():
+                if not prefix_dir.is_dir():
+                    continue
+                for blob_path in prefix_dir.iterdir():
+                    try:
+                        stat = blob_path.stat()
+                        if stat.st_nlink <= 1:
+                            blob_path.unlink()
+                            removed += 1
+                            if self._by_inode is not None:
+                                self._by_inode.pop((stat.st_dev, stat.st_ino), None)
+                    except OSError:
+                        continue
+        if removed:
+            metrics.increment("blob_store.blobs_collected", removed)
+            print(f"回收无引用的文件存储对象: {removed} 个")
+        return removed
+
+    def stats(self) -> Dict:
+        """存储统计：blob 数量、实际占用字节数、引用数和去重节省的字节数"""
+        blobs = 0
+        stored_bytes = 0
+        references = 0
+        logical_bytes = 0
+        for prefix_dir in self.blobs_dir.iterdir():
+            if not prefix_dir.is_dir():
+                continue
+            for blob_path in prefix_dir.iterdir():
+                try:
+                    stat = blob_path.stat()
+                except OSError:
+                    continue
+                blobs += 1
+                stored_bytes += stat.st_size
+                references += stat.st_nlink - 1
+                logical_bytes += stat.st_size * (stat.st_nlink - 1)
+        return {
+            "blobs": blobs,
+            "stored_bytes": stored_bytes,
+            "references": references,
+            "saved_bytes": max(logical_bytes - stored_bytes, 0),
+        }
@@ -0,0 +1,88 @@
+"""
+展板目录索引
+维护 board_id -> 展板目录 的内存映射，避免每次请求都遍历所有课程目录
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class BoardIndex:
+    """board_id -> 展板目录 的索引，由 FileWatcher 保持同步，可随时从磁盘重建"""
+
+    def __init__(self, courses_dir: Path):
+        self.courses_dir = Path(courses_dir)
+        self._boards: Dict[str, Path] = {}
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self) -> int:
+        """扫描磁盘重建索引，返回索引的展板数量"""
+        boards = {}
+        if self.courses_dir.exists():
+            for course_dir in self.courses_dir.iterdir():
+                if not course_dir.is_dir():
+                    continue
+                for board_dir in course_dir.iterdir():
+                    if board_dir.is_dir() and board_dir.name.startswith("board-"):
+                        boards[board_dir.name] = board_dir
+        with self._lock:
+            self._boards = boards
+        return len(boards)
+
+    def resolve(self, board_id: str) -> Optional[Path]:
+        """查找展板目录（O(1)），未命中或索引中的目录已不存在时回退到一次磁盘扫描"""
+        with self._lock:
+            board_dir = self._boards.get(board_id)
+        if board_dir is not None:
+            if board_dir.is_dir():
+                return board_dir
+            # 索引已过期：监控服务未启动期间展板被外部删除或移动
+            with self._lock:
+                if self._boards.get(board_id) == board_dir:
+                    del self._boards[board_id]
+
+        # 未命中：可能是监控服务未启动期间外部创建或移动的展板
+        if not self.courses_dir.exists():
+            return None
+        for course_dir in self.courses_dir.iterdir():
+            if course_dir.is_dir():
+                potential_board_dir = course_dir / board_id
+                if potential_board_dir.is_dir():
+                    self.add(board_id, potential_board_dir)
+                    return potential_board_dir
+        return None
+
+    def add(self, board_id: str, board_dir: Path):
+        """登记展板目录（创建或移动后调用）"""
+        with self._lock:
+            self._boards[board_id] = Path(board_dir)
+
+    def remove(self, board_id: str):
+        """移除展板（删除后调用）"""
+        with self._lock:
+            self._boards.pop(board_id, None)
+
+    def move(self, old_board_dir: Path, new_board_dir: Path):
+        """展板目录被移动或重命名"""
+        old_board_dir, new_board_dir = Path(old_board_dir), Path(new_board_dir)
+        with self._lock:
+            if self._boards.get(old_board_dir.name) == old_board_dir:
+                del self._boards[old_board_dir.name]
+            if new_board_dir.name.startswith("board-"):
+                self._boards[new_board_dir.name] = new_board_dir
+
+    def items(self) -> List[Tuple[str, Path]]:
+        """返回所有 (board_id, 展板目录) 的快照"""
+        with self._lock:
+            return list(self._boards.items())
+
+    def course_of(self, board_id: str) -> Optional[str]:
+        """返回展板所属的课程ID"""
+        board_dir = self.resolve(board_id)
+        return board_dir.parent.name if board_dir else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._boards)
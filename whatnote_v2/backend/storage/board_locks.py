@@ -0,0 +1,349 @@
+"""
+展板读写锁
+每个展板一把读写锁：读取（列出窗口、读取图标位置）共享，结构性修改（创建/重命名/删除窗口和文件、保存图标位置、批量导入）独占；
+只修改单个窗口内容的操作持有展板读锁和该窗口的互斥锁，同一展板上不同窗口的修改可以并行。不同展板之间互不影响。
+ContentManager 的方法在存储线程中执行（AsyncStorage、任务队列、文件监控都把调用派发到线程池），所以锁是线程锁。
+经 AsyncStorage 派发的调用先在事件循环上按同样的规则排队（AsyncBoardGates），轮到后才占用存储线程，
+共享的存储线程不会因为等待展板锁而被占住；线程锁仍然保护任务队列、自动保存等直接调用
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+import metrics
+
+
+class RWLock:
+    """写者优先的读写锁，同一线程可重入（持有写锁时可以再获取读锁，但持有读锁时不能升级为写锁）"""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> bool:
+        """获取读锁，返回是否发生了等待"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return False
+            contended = False
+            while self._writer is not None or self._waiting_writers:
+                contended = True
+                self._cond.wait()
+            self._readers[me] = 1
+            return contended
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            count = self._readers[me] - 1
+            if count:
+                self._readers[me] = count
+            else:
+                del self._readers[me]
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self) -> bool:
+        """获取写锁，返回是否发生了等待"""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return False
+            if me in self._readers:
+                raise RuntimeError("持有展板读锁时不能再获取写锁")
+            contended = False
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    contended = True
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+            return contended
+
+    def has_waiting_writers(self) -> bool:
+        with self._cond:
+            return self._waiting_writers > 0
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class _AsyncRWGate:
+    """事件循环侧的读写闸门：按到达顺序放行（排队的写者之后到达的读者也要等待），释放是同步的，取消等待不会遗留占用"""
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._waiters: Deque[Tuple[bool, asyncio.Future]] = deque()
+        self.users = 0
+
+    def _free(self, write: bool) -> bool:
+        return not self._writer and not (write and self._readers)
+
+    def _take(self, write: bool):
+        if write:
+            self._writer = True
+        else:
+            self._readers += 1
+
+    def _wake(self):
+        while self._waiters:
+            write, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._free(write):
+                break
+            self._waiters.popleft()
+            self._take(write)
+            future.set_result(None)
+
+    async def acquire(self, write: bool) -> bool:
+        """获取读（write=False）或写闸门，返回是否发生了等待"""
+        if not self._waiters and self._free(write):
+            self._take(write)
+            return False
+        waiter = (write, asyncio.get_event_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            if waiter[1].done() and not waiter[1].cancelled():
+                # 已经放行后才被取消
+                self.release(write)
+            else:
+                self._waiters.remove(waiter)
+                self._wake()
+            raise
+        return True
+
+    def release(self, write: bool):
+        if write:
+            self._writer = False
+        else:
+            self._readers -= 1
+        self._wake()
+
+
+class AsyncBoardGates:
+    """
+    展板读写锁在事件循环上的对应物：AsyncStorage 在把带锁的方法派发到线程池之前先在这里排队，
+    同一展板的写操作之间、写操作与读操作之间在事件循环上等待，不占用存储线程
+    """
+
+    def __init__(self):
+        self._boards: Dict[str, _AsyncRWGate] = {}
+        self._windows: Dict[Tuple[str, str], list] = {}
+
+    async def _acquire(self, kind: str, acquire) -> None:
+        started = time.perf_counter()
+        contended = await acquire()
+        if contended:
+            metrics.increment(f"locks.gate.{kind}.contended")
+            metrics.observe(f"locks.gate.{kind}.wait", time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def hold(self, mode: str, board_id: str, window_id: str = None):
+        """mode 为 read、write 或 window（展板读 + 窗口互斥），与方法装饰器一致"""
+        gate = self._boards.get(board_id)
+        if gate is None:
+            gate = self._boards[board_id] = _AsyncRWGate()
+        gate.users += 1
+        window_entry = None
+        try:
+            write = mode == "write"
+            await self._acquire("board_write" if write else "board_read", functools.partial(gate.acquire, write))
+            try:
+                if mode == "window":
+                    # [锁, 使用者数]，没有使用者时移除
+                    window_entry = self._windows.get((board_id, window_id))
+                    if window_entry is None:
+                        window_entry = self._windows[(board_id, window_id)] = [asyncio.Lock(), 0]
+                    window_entry[1] += 1
+                    lock = window_entry[0]
+
+                    async def acquire_window():
+                        contended = lock.locked()
+                        await lock.acquire()
+                        return contended
+
+                    await self._acquire("window", acquire_window)
+                    try:
+                        yield
+                    finally:
+                        lock.release()
+                else:
+                    yield
+            finally:
+                if window_entry is not None:
+                    window_entry[1] -= 1
+                    if not window_entry[1]:
+                        self._windows.pop((board_id, window_id), None)
+                gate.release(write)
+        finally:
+            gate.users -= 1
+            if not gate.users:
+                self._boards.pop(board_id, None)
+
+    def stats(self) -> Dict:
+        return {"boards": len(self._boards), "windows": len(self._windows)}
+
+
+class _WindowLock:
+    __slots__ = ("lock", "__weakref__")
+
+    def __init__(self):
+        self.lock = threading.RLock()
+
+
+class BoardLockManager:
+    """
+    展板读写锁和窗口锁的注册表；窗口锁不再被持有后自动回收
+
+    before_write(board_id) 在每次获得展板写锁后调用，用于在结构性修改开始前写出该展板缓冲中的内容
+    """
+
+    def __init__(self, before_write: Optional[Callable[[str], None]] = None):
+        self.before_write = before_write
+        # AsyncStorage 派发带锁的方法前使用的事件循环侧闸门，同一 ContentManager 的所有异步代理共享
+        self.async_gates = AsyncBoardGates()
+        self._lock = threading.Lock()
+        self._boards: Dict[str, RWLock] = {}
+        self._windows: "weakref.WeakValueDictionary[tuple, _WindowLock]" = weakref.WeakValueDictionary()
+        self._waiting = 0
+
+    def _board_lock(self, board_id: str) -> RWLock:
+        with self._lock:
+            lock = self._boards.get(board_id)
+            if lock is None:
+                lock = self._boards[board_id] = RWLock()
+            return lock
+
+    def _window_lock(self, board_id: str, window_id: str) -> _WindowLock:
+        with self._lock:
+            lock = self._windows.get((board_id, window_id))
+            if lock is None:
+                lock = _WindowLock()
+                self._windows[(board_id, window_id)] = lock
+            return lock
+
+    def _acquire(self, kind: str, acquire) -> None:
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            metrics.set_gauge("locks.waiting", self._waiting)
+        try:
+            contended = acquire()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                metrics.set_gauge("locks.waiting", self._waiting)
+        metrics.increment(f"locks.{kind}.acquired")
+        if contended:
+            metrics.increment(f"locks.{kind}.contended")
+            metrics.observe(f"locks.{kind}.wait", time.perf_counter() - started)
+
+    @contextmanager
+    def read(self, board_id: str):
+        """展板读锁（共享）"""
+        lock = self._board_lock(board_id)
+        self._acquire("board_read", lock.acquire_read)
+        try:
+            yield
+        finally:
+            lock.release_read()
+
+    @contextmanager
+    def write(self, board_id: str):
+        """展板写锁（独占）"""
+        lock = self._board_lock(board_id)
+        self._acquire("board_write", lock.acquire_write)
+        try:
+            if self.before_write is not None:
+                self.before_write(board_id)
+            yield
+        finally:
+            lock.release_write()
+
+    @contextmanager
+    def window(self, board_id: str, window_id: str):
+        """展板读锁 + 窗口互斥锁：修改单个窗口"""
+        with self.read(board_id):
+            window_lock = self._window_lock(board_id, window_id)
+
+            def acquire():
+                if window_lock.lock.acquire(blocking=False):
+                    return False
+                window_lock.lock.acquire()
+                return True
+
+            self._acquire("window", acquire)
+            try:
+                yield
+            finally:
+                window_lock.lock.release()
+
+    def write_pending(self, board_id: str) -> bool:
+        """是否有线程在等待该展板的写锁（长时间持有读锁的操作据此让出锁）"""
+        with self._lock:
+            lock = self._boards.get(board_id)
+        return lock is not None and lock.has_waiting_writers()
+
+    def forget_board(self, board_id: str):
+        """展板被删除后移除它的锁（在删除操作释放写锁之后调用）"""
+        with self._lock:
+            self._boards.pop(board_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"boards": len(self._boards), "windows": len(self._windows), "waiting": self._waiting,
+                    "gates": self.async_gates.stats()}
+
+
+def board_reader(method):
+    """ContentManager 方法装饰器：第一个参数是 board_id，持有展板读锁执行"""
+    @functools.wraps(method)
+    def wrapper(self, board_id, *args, **kwargs):
+        with self.locks.read(board_id):
+            return method(self, board_id, *args, **kwargs)
+    wrapper.board_lock = "read"
+    return wrapper
+
+
+def board_writer(method):
+    """ContentManager 方法装饰器：第一个参数是 board_id，持有展板写锁执行"""
+    @functools.wraps(method)
+    def wrapper(self, board_id, *args, **kwargs):
+        with self.locks.write(board_id):
+            return method(self, board_id, *args, **kwargs)
+    wrapper.board_lock = "write"
+    return wrapper
+
+
+def window_writer(method):
+    """ContentManager 方法装饰器：前两个参数是 board_id、window_id，持有展板读锁和窗口锁执行"""
+    @functools.wraps(method)
+    def wrapper(self, board_id, window_id, *args, **kwargs):
+        with self.locks.window(board_id, window_id):
+            return method(self, board_id, window_id, *args, **kwargs)
+    wrapper.board_lock = "window"
+    return wrapper
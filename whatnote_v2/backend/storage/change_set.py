@@ -0,0 +1,91 @@
+"""
+文件事件合并
+一次保存或重命名会在磁盘上产生一串创建/修改/移动/删除事件，ChangeSet 把同一展板在一个时间窗口内的
+原始事件合并成净变化：创建后又删除的文件不产生变化，创建后修改仍是创建，A→B→C 的移动合并为 A→C
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# 净变化的类型
+CHANGE_DELETED = "deleted"
+CHANGE_MOVED = "moved"
+CHANGE_CREATED = "created"
+CHANGE_MODIFIED = "modified"
+
+
+class _Entry:
+    """窗口内某个当前文件名的状态：origin 是它在窗口开始时的文件名（窗口内新建的为None）"""
+
+    __slots__ = ("origin", "modified")
+
+    def __init__(self, origin: Optional[str], modified: bool = False):
+        self.origin = origin
+        self.modified = modified
+
+
+class ChangeSet:
+    """一个展板 files 目录在一个时间窗口内的事件集合"""
+
+    def __init__(self, files_dir: Optional[Path] = None):
+        self.files_dir = files_dir
+        self.raw_events = 0
+        self._entries: Dict[str, _Entry] = {}
+        self._deleted: Set[str] = set()
+
+    def created(self, name: str):
+        self.raw_events += 1
+        if name in self._deleted:
+            # 删除后又创建同名文件（如原子替换）：相当于修改
+            self._deleted.discard(name)
+            self._entries[name] = _Entry(name, modified=True)
+        elif name not in self._entries:
+            self._entries[name] = _Entry(None)
+
+    def modified(self, name: str):
+        self.raw_events += 1
+        entry = self._entries.get(name)
+        if entry is None:
+            self._entries[name] = _Entry(name, modified=True)
+        else:
+            entry.modified = True
+
+    def deleted(self, name: str):
+        self.raw_events += 1
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            self._deleted.add(name)
+        elif entry.origin is not None:
+            self._deleted.add(entry.origin)
+        # 窗口内新建又删除的文件：没有净变化
+
+    def moved(self, src: str, dest: str):
+        self.raw_events += 1
+        entry = self._entries.pop(src, None) or _Entry(src)
+        replaced = self._entries.pop(dest, None)
+        if replaced is not None and replaced.origin is not None and replaced.origin != entry.origin:
+            # 目标位置原有的文件被覆盖
+            self._deleted.add(replaced.origin)
+        if entry.origin == dest:
+            # 移走后又移回原名
+            self._deleted.discard(dest)
+        self._entries[dest] = entry
+
+    def changes(self) -> List[Tuple]:
+        """
+        净变化列表，按 删除、移动、创建、修改 的顺序：
+        (CHANGE_DELETED, name) / (CHANGE_MOVED, src, dest) / (CHANGE_CREATED, name) / (CHANGE_MODIFIED, name)
+        """
+        deleted = [(CHANGE_DELETED, name) for name in sorted(self._deleted)]
+        moved, created, modified = [], [], []
+        for name, entry in self._entries.items():
+            if entry.origin is None:
+                created.append((CHANGE_CREATED, name))
+                continue
+            if entry.origin != name:
+                moved.append((CHANGE_MOVED, entry.origin, name))
+            if entry.modified:
+                modified.append((CHANGE_MODIFIED, name))
+        # 新建的 JSON 配置文件排在内容文件之前，处理内容文件时它已被登记到窗口索引
+        created.sort(key=lambda change: not change[1].endswith(".json"))
+        return deleted + moved + created + modified
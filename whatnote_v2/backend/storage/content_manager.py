@@ -1,19 +1,159 @@
 import os
 import json
 import shutil
+import threading
 import time
 from pathlib import Path
-from config import DATA_DIR
+import metrics
+from config import DATA_DIR, BLOB_STORE_ENABLED, AUTOSAVE_ENABLED
 from typing import Dict, List, Optional
 from datetime import datetime
 from .trash_manager import TrashManager
-import pypdf
+from .window_index import WindowIndex
+from .window_cache import BoardWindowCache
+from .blob_store import BlobStore
+from .pdf_extractor import PdfExtractor
+from .write_intents import WriteIntentRegistry
+from .atomic_write import atomic_write_json, atomic_write_text, is_temp_path
+from .board_locks import BoardLockManager, board_reader, board_writer, window_writer
+from .autosave_buffer import AutosaveBuffer
+from .text_patch import ContentVersionConflict, apply_text_patch
 
 class ContentManager:
     def __init__(self, file_manager):
         self.file_manager = file_manager
-        self.trash_manager = TrashManager()
+        # 内容寻址存储（可选）：相同内容的上传文件在各展板间共享同一份数据
+        self.blob_store = BlobStore(self.file_manager.data_dir / "blobs") if BLOB_STORE_ENABLED else None
+        # SQLite 元数据存储（可选）：窗口配置保存在数据库中，JSON配置文件只是可选的导出
+        self.metadata = self.file_manager.metadata
+        self.trash_manager = TrashManager(
+            blob_store=self.blob_store,
+            metadata=self.metadata,
+            write_json_files=self.file_manager.write_json_files,
+            on_sidecar_restored=self.sync_window_sidecar if self.metadata else None,
+        )
+        self.window_index = WindowIndex(self.file_manager.data_dir / "window_index.json")
+        self.window_cache = BoardWindowCache()
+        self.pdf_extractor = PdfExtractor()
+        # 服务端自己的文件写入，文件监控据此忽略对应事件
+        self.write_intents = WriteIntentRegistry()
+        # 展板读写锁和窗口锁：同一展板上的修改互斥，不同展板、同一展板的读取和不同窗口的内容修改并行
+        self.locks = BoardLockManager(before_write=self._flush_board_autosave)
+        # 文本窗口内容的延迟写入缓冲（可选）：按键级别的保存合并后再写盘
+        self.autosave = AutosaveBuffer(self._flush_autosaved_content) if AUTOSAVE_ENABLED else None
+        # 文本窗口的内容版本号（写盘时保存到窗口配置的 content_version），增量修改据此检测冲突
+        self._content_versions: Dict[tuple, int] = {}
+        self._content_versions_lock = threading.Lock()
+        # 批量导入已分配、尚未写入窗口配置的文件名：分配新文件名和补建孤立文件的窗口时跳过
+        self._reserved_files: Dict[str, set] = {}
+        self._reserved_files_lock = threading.Lock()
+        if not self.window_index.load():
+            if self.metadata:
+                window_count = self.window_index.rebuild_from(self.metadata.iter_all_windows())
+            else:
+                window_count = self.window_index.rebuild(self.file_manager.board_index)
+            print(f"窗口索引已重建，共 {window_count} 个窗口")
+    
+    def _read_window_json(self, json_file: Path) -> Optional[Dict]:
+        """读取窗口配置（sqlite 后端从数据库读取），失败返回None"""
+        if self.metadata:
+            return self.metadata.get_window(json_file.parent.parent.name, json_file.name)
+        try:
+            with open(json_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else None
+        except Exception as e:
+            print(f"读取JSON文件失败: {json_file}, 错误: {e}")
+            return None
+    
+    def _sidecar_exists(self, json_file: Path) -> bool:
+        """窗口配置是否存在（sqlite 后端查数据库，不依赖导出的JSON文件）"""
+        if self.metadata:
+            return self.metadata.get_window(json_file.parent.parent.name, json_file.name) is not None
+        return json_file.exists()
+    
+    def _iter_board_sidecars(self, board_id: str, files_dir: Path):
+        """遍历展板的所有窗口配置，产生 (json_file, window_data)"""
+        if self.metadata:
+            for sidecar, data in self.metadata.list_windows(board_id):
+                yield files_dir / sidecar, data
+            return
+        for json_file in files_dir.glob("*.json"):
+            data = self._read_window_json(json_file)
+            if data:
+                yield json_file, data
     
+    def _find_window_json(self, files_dir: Path, window_id: str):
+        """通过窗口索引定位窗口的JSON配置文件，返回 (json_file, window_data)，找不到返回 (None, None)"""
+        board_id = files_dir.parent.name
+        if self.metadata:
+            found = self.metadata.find_window(window_id, board_id)
+            if not found:
+                return None, None
+            _, sidecar, data = found
+            self.window_index.register(board_id, sidecar, data)
+            return files_dir / sidecar, data
+        
+        entry = self.window_index.lookup(window_id)
+        if entry and entry["board_id"] == board_id:
+            json_file = files_dir / entry["sidecar"]
+            if json_file.exists():
+                data = self._read_window_json(json_file)
+                if data and data.get("id") == window_id:
+                    return json_file, data
+            # 索引已过期
+            self.window_index.unregister(window_id)
+        
+        # 索引未命中：回退到扫描展板下的JSON配置文件，并修复索引
+        for json_file, data in self._iter_board_sidecars(board_id, files_dir):
+            if data.get("id") == window_id:
+                self.window_index.register(board_id, json_file.name, data)
+                return json_file, data
+        return None, None
+    
+    def _write_window_json(self, json_file: Path, window_data: Dict):
+        """写入窗口配置（数据库和/或JSON配置文件）并同步窗口索引"""
+        board_id = json_file.parent.parent.name
+        if self.metadata:
+            self.metadata.put_window(board_id, json_file.name, window_data)
+        if self.file_manager.write_json_files:
+            with self.write_intents.writing(json_file):
+                atomic_write_json(json_file, window_data, kind="window_config")
+        self.window_index.register(board_id, json_file.name, window_data)
+        self.window_cache.invalidate(board_id, json_file.name)
+    
+    def _remove_window_json(self, json_file: Path):
+        """删除窗口配置（数据库和/或JSON配置文件）并同步窗口索引"""
+        board_id = json_file.parent.parent.name
+        if self.metadata:
+            self.metadata.delete_window(board_id, json_file.name)
+        if not self.metadata or json_file.exists():
+            with self.write_intents.writing(json_file):
+                json_file.unlink()
+        self.window_index.unregister_sidecar(board_id, json_file.name)
+        self.window_cache.invalidate(board_id, json_file.name)
+    
+    def sync_window_sidecar(self, board_id: str, json_file: Path, deleted: bool = False):
+        """JSON配置文件被外部修改、删除或从回收站恢复时，同步窗口索引（sqlite 后端同时同步数据库）"""
+        json_file = Path(json_file)
+        if deleted:
+            self.window_index.unregister_sidecar(board_id, json_file.name)
+            # 不导出JSON配置文件时，文件不是窗口配置的来源，删除导出的文件不影响数据库
+            if self.metadata and self.file_manager.write_json_files:
+                self.metadata.delete_window(board_id, json_file.name)
+            return
+        try:
+            with open(json_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return
+        if not isinstance(data, dict) or not data.get("id"):
+            return
+        if self.metadata:
+            self.metadata.put_window(board_id, json_file.name, data)
+        self.window_index.register(board_id, json_file.name, data)
+    
+    @board_writer
     def save_window_content(self, board_id: str, window_data: Dict) -> bool:
         """保存窗口内容到展板文件夹（新存储结构：内容存储到.md文件，配置存储到.json文件）"""
         board_info = self.file_manager.get_board_info(board_id)
@@ -21,13 +161,7 @@ class ContentManager:
             return False
         
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             return False
@@ -46,21 +180,28 @@ class ContentManager:
             md_file_name = f"{safe_name}.md"
             md_file_path = files_dir / md_file_name
             
-            # 获取内容并保存到.md文件
-            content = window_data.get("content", "")
-            with open(md_file_path, "w", encoding="utf-8") as f:
-                f.write(content)
-            
-            # 2. 保存配置到.json文件（不包含content）
             json_file_name = f"{safe_name}.md.json"
             json_file_path = files_dir / json_file_name
             
+            # 获取内容并保存到.md文件（写入前记下原内容，用于判断内容是否变化）
+            content = window_data.get("content", "")
+            previous_content = self._stored_text_content(board_id, window_data.get("id"), json_file_path, md_file_path)
+            with self.write_intents.writing(md_file_path):
+                atomic_write_text(md_file_path, content, kind="window_content")
+            
+            # 2. 保存配置到.json文件（不包含content）
             # 准备存储的窗口数据（移除content，设置file_path指向.md文件）
             storage_data = {k: v for k, v in window_data.items() if k != 'content'}
             storage_data['file_path'] = f"files/{md_file_name}"
+            if window_data.get("id"):
+                if previous_content is None or previous_content != content:
+                    # 整体保存改变了内容，基于旧版本的增量修改需要返回冲突
+                    storage_data['content_version'] = self._bump_content_version(board_id, window_data["id"], window_data)
+                else:
+                    # 只修改了位置、大小等属性，内容版本号不变
+                    storage_data['content_version'] = self._current_content_version(board_id, window_data["id"], window_data)
             
-            with open(json_file_path, "w", encoding="utf-8") as f:
-                json.dump(storage_data, f, ensure_ascii=False, indent=2)
+            self._write_window_json(json_file_path, storage_data)
             
             print(f"保存窗口内容: {window_title}")
             print(f"  内容文件: {md_file_name}")
@@ -72,6 +213,21 @@ class ContentManager:
         else:
             return self._handle_legacy_window_storage(board_dir, window_data)
     
+    def _stored_text_content(self, board_id: str, window_id: Optional[str], json_file_path: Path, md_file_path: Path) -> Optional[str]:
+        """文本窗口当前保存的内容（缓冲中尚未写盘的优先）；窗口不在这个文件中（新窗口或标题已改）时返回None"""
+        if not window_id:
+            return None
+        if self.autosave is not None:
+            content = self.autosave.get(board_id, window_id)
+            if content is not None:
+                return content
+        if not md_file_path.exists():
+            return None
+        data = self._read_window_json(json_file_path)
+        if not data or data.get("id") != window_id:
+            return None
+        return self._read_text_content(md_file_path)
+    
     def _handle_legacy_window_storage(self, board_dir: Path, window_data: Dict) -> bool:
         """处理非文本类型窗口的存储（兼容旧逻辑）"""
         files_dir = board_dir / "files"
@@ -110,13 +266,13 @@ class ContentManager:
                 else:
                     storage_data['file_path'] = self._get_file_path_for_window(window_data)
             
-            with open(json_file_path, "w", encoding="utf-8") as f:
-                json.dump(storage_data, f, ensure_ascii=False, indent=2)
+            self._write_window_json(json_file_path, storage_data)
             
             return True
         
         return False
 
+    @board_writer
     def delete_window_content(self, board_id: str, window_id: str) -> bool:
         """删除窗口内容，包括关联的文件"""
         board_info = self.file_manager.get_board_info(board_id)
@@ -124,13 +280,7 @@ class ContentManager:
             return False
 
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
 
         if not board_dir:
             return False
@@ -138,28 +288,19 @@ class ContentManager:
         files_dir = board_dir / "files"
         
         # 查找包含指定window_id的JSON文件
-        window_file = None
-        window_data = None
-        
-        for json_file in files_dir.glob("*.json"):
-            try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                if data.get("id") == window_id:
-                    window_file = json_file
-                    window_data = data
-                    break
-            except Exception as e:
-                print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                continue
+        window_file, window_data = self._find_window_json(files_dir, window_id)
         
         if window_file and window_data:
             try:
+                # 删除前记下关联文件引用的内容存储对象，删除后只检查这些对象的引用数
+                blobs = self.blob_store.referenced_blobs([files_dir / window_file.name[:-5]]) if self.blob_store else set()
+                
                 # 删除关联的实际文件（基于新的命名规则：xxx.ext.json）
                 self._delete_window_associated_files_new_naming(files_dir, window_file.name)
                 
                 # 删除窗口配置JSON文件
-                window_file.unlink()
+                self._remove_window_json(window_file)
+                self.release_blobs(blobs)
                 
                 # 清理图标位置信息
                 self._cleanup_icon_position(board_dir, window_id)
@@ -174,6 +315,10 @@ class ContentManager:
     
     def _cleanup_icon_position(self, board_dir: Path, window_id: str):
         """清理删除窗口的图标位置信息"""
+        if self.metadata:
+            self.metadata.delete_icon_position(board_dir.name, window_id)
+            if not self.file_manager.write_json_files:
+                return
         try:
             icon_positions_file = board_dir / "icon_positions.json"
             if icon_positions_file.exists():
@@ -186,24 +331,18 @@ class ContentManager:
                     print(f"从图标位置文件中移除: {window_id}")
                     
                     # 保存更新后的位置信息
-                    with open(icon_positions_file, "w", encoding="utf-8") as f:
-                        json.dump(positions, f, ensure_ascii=False, indent=2)
+                    atomic_write_json(icon_positions_file, positions, kind="icon_positions")
                     
                     print(f"图标位置清理完成")
         except Exception as e:
             print(f"清理图标位置失败: {e}")
     
+    @board_writer
     def move_window_to_trash(self, board_id: str, window_id: str) -> bool:
         """将窗口及其文件移动到回收站"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 print(f"展板目录不存在: {board_id}")
@@ -215,19 +354,7 @@ class ContentManager:
                 return False
             
             # 查找窗口对应的JSON文件
-            window_json_file = None
-            window_data = None
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        window_json_file = json_file
-                        window_data = data
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            window_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not window_json_file or not window_data:
                 print(f"未找到窗口配置: {window_id}")
@@ -241,16 +368,26 @@ class ContentManager:
             
             # 移动实际文件到回收站（如果存在）
             if actual_file_path.exists():
-                if not self.trash_manager.move_to_trash(actual_file_path, window_data, board_id):
+                with self.write_intents.writing(actual_file_path):
+                    moved = self.trash_manager.move_to_trash(actual_file_path, window_data, board_id)
+                if not moved:
                     print(f"移动文件到回收站失败: {actual_file_path}")
                     success = False
             
             # 移动JSON配置文件到回收站
+            if self.metadata and not window_json_file.exists():
+                # 没有导出JSON配置文件时先写出一份，回收站中保留可恢复的配置文件
+                with self.write_intents.writing(window_json_file):
+                    atomic_write_json(window_json_file, window_data, kind="window_config")
             if window_json_file.exists():
                 json_window_data = {**window_data, "is_json_config": True}
-                if not self.trash_manager.move_to_trash(window_json_file, json_window_data, board_id):
+                with self.write_intents.writing(window_json_file):
+                    moved = self.trash_manager.move_to_trash(window_json_file, json_window_data, board_id)
+                if not moved:
                     print(f"移动JSON配置文件到回收站失败: {window_json_file}")
                     success = False
+                elif self.metadata:
+                    self._remove_window_json(window_json_file)
             
             # 如果是PDF窗口，同时移动对应的pages文件夹到回收站
             if window_data.get('type') == 'pdf':
@@ -306,7 +443,7 @@ class ContentManager:
             # 删除文件
             if file_to_delete and file_to_delete.exists():
                 print(f"删除关联文件: {file_to_delete}")
-                file_to_delete.unlink()
+                self._unlink_board_file(file_to_delete)
             elif file_to_delete:
                 print(f"关联文件不存在，跳过删除: {file_to_delete}")
                 
@@ -325,7 +462,7 @@ class ContentManager:
             for file_path in files_dir.iterdir():
                 if file_path.is_file() and file_path.stem == window_id and file_path.suffix != '.json':
                     print(f"删除关联文件: {file_path}")
-                    file_path.unlink()
+                    self._unlink_board_file(file_path)
                     
         except Exception as e:
             print(f"删除关联文件失败: {e}")
@@ -337,7 +474,7 @@ class ContentManager:
             for file_path in files_dir.iterdir():
                 if file_path.is_file() and file_path.stem == base_name and file_path.suffix != '.json':
                     print(f"删除关联文件: {file_path}")
-                    file_path.unlink()
+                    self._unlink_board_file(file_path)
                     
         except Exception as e:
             print(f"删除关联文件失败: {e}")
@@ -353,7 +490,8 @@ class ContentManager:
                 
                 if actual_file_path.exists():
                     print(f"删除关联文件: {actual_file_path}")
-                    actual_file_path.unlink()
+                    with self.write_intents.writing(actual_file_path):
+                        actual_file_path.unlink()
                 else:
                     print(f"关联文件不存在: {actual_file_path}")
                     
@@ -371,8 +509,7 @@ class ContentManager:
             board_info["windows"] = [w for w in board_info["windows"] if w.get("id") != window_id]
             board_info["updated_at"] = datetime.now().isoformat()
             
-            with open(board_info_path, "w", encoding="utf-8") as f:
-                json.dump(board_info, f, ensure_ascii=False, indent=2)
+            atomic_write_json(board_info_path, board_info, kind="board_info")
 
     def _update_board_windows(self, board_dir: Path, window_data: Dict):
         """更新展板信息中的窗口列表"""
@@ -394,11 +531,15 @@ class ContentManager:
             
             board_info["updated_at"] = datetime.now().isoformat()
             
-            with open(board_info_path, "w", encoding="utf-8") as f:
-                json.dump(board_info, f, ensure_ascii=False, indent=2)
+            atomic_write_json(board_info_path, board_info, kind="board_info")
     
-    def save_file_to_board(self, board_id: str, file_type: str, file_path: str, filename: str, window_id: str = None) -> str:
-        """保存文件到展板文件夹，并重命名JSON配置文件以保持一致"""
+    @board_writer
+    def save_file_to_board(self, board_id: str, file_type: str, file_path: Optional[str], filename: str, window_id: str = None, move: bool = False, sha256: str = None) -> str:
+        """保存文件到展板文件夹，并重命名JSON配置文件以保持一致
+
+        move=True 时源文件被移动而不是复制（源文件位于展板暂存目录时是一次原子重命名）；
+        提供 sha256 且内容存储中已有该内容时直接硬链接，file_path 可以为None
+        """
         print("\n" + "="*80)
         print("UPLOAD_DEBUG: 开始文件上传流程")
         print(f"输入参数: board_id={board_id}")
@@ -412,13 +553,7 @@ class ContentManager:
             raise ValueError(f"展板不存在: {board_id}")
         
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             raise ValueError(f"展板目录不存在: {board_id}")
@@ -459,7 +594,7 @@ class ContentManager:
                 # 然后删除现有的占位文件（如果存在）
                 existing_file_path = target_dir / existing_filename
                 if existing_file_path.exists():
-                    existing_file_path.unlink()
+                    self._unlink_board_file(existing_file_path)
                     print(f"删除占位文件: {existing_filename}")
                 else:
                     print(f"占位文件不存在: {existing_filename}")
@@ -480,32 +615,75 @@ class ContentManager:
             print(f"更新JSON文件（没有现有文件的情况）: window_id={window_id}, new_filename='{new_filename}'")
             self._update_window_json_file(target_dir, window_id, new_filename)
         
-        # 如果有window_id，使用两步法避免文件监控器干扰
-        print("开始两步法上传")
+        # 写入登记为服务端写入，文件监控不会为新文件再创建一个窗口
+        target_path = target_dir / new_filename
         if window_id:
-            # 步骤1：先创建临时文件
-            temp_filename = f"_temp_{int(time.time() * 1000)}_{new_filename}"
-            temp_path = target_dir / temp_filename
-            print(f"步骤1: 创建临时文件 '{temp_filename}'")
-            shutil.copy2(file_path, temp_path)
-            print(f"临时文件创建成功: {temp_path}")
-            
-            # 步骤2：更新JSON文件
-            print(f"步骤2: 确保JSON文件存在")
             self._ensure_json_file_exists(target_dir, window_id, new_filename)
-            
-            # 步骤3：重命名为最终文件名
-            target_path = target_dir / new_filename
-            print(f"步骤3: 重命名 '{temp_filename}' -> '{new_filename}'")
-            temp_path.rename(target_path)
-            print(f"文件重命名完成: {new_filename}")
-        else:
-            # 没有window_id的情况，直接复制
-            target_path = target_dir / new_filename
-            shutil.copy2(file_path, target_path)
+        with self.write_intents.writing(target_path):
+            self._place_file(file_path, target_path, move=move, sha256=sha256)
+        print(f"文件保存完成: {new_filename}")
         
         return str(target_path)
     
+    def _place_file(self, source: Optional[str], target: Path, move: bool = False, sha256: str = None):
+        """把上传的文件放到目标位置：能去重时链接到内容存储，否则复制或移动"""
+        if self.blob_store and sha256 and self.blob_store.accepts(target.name):
+            if self.blob_store.link_into(sha256, target, source=source, move=move):
+                return
+        if not source:
+            raise ValueError(f"源文件不存在: {target.name}")
+        # 暂存文件与files目录在同一文件系统，移动即重命名，不再复制一遍内容
+        if move:
+            shutil.move(source, target)
+        else:
+            shutil.copy2(source, target)
+    
+    @board_writer
+    def delete_board(self, board_id: str) -> bool:
+        """删除展板（持有展板写锁，等进行中的读写完成），删除后回收展板文件引用的内容；展板不存在时返回False"""
+        blobs = self.board_blobs(board_id)
+        if not self.file_manager.delete_board(board_id):
+            return False
+        self.window_index.unregister_board(board_id)
+        self.window_cache.invalidate(board_id)
+        self.release_blobs(blobs)
+        return True
+    
+    def board_blobs(self, board_id: str) -> set:
+        """展板目录中的文件引用的内容存储对象（删除展板前调用）"""
+        board_dir = self.file_manager.get_board_dir(board_id)
+        if not self.blob_store or not board_dir:
+            return set()
+        return self.blob_store.referenced_blobs([board_dir])
+    
+    def _unlink_board_file(self, path: Path):
+        """删除展板中的单个文件（登记写入意图）；文件是内容存储的硬链接时，删除后回收不再被引用的内容"""
+        blobs = self.blob_store.referenced_blobs([path]) if self.blob_store else set()
+        with self.write_intents.writing(path):
+            path.unlink()
+        self.release_blobs(blobs)
+    
+    def release_blobs(self, hashes) -> int:
+        """文件删除后回收这些内容存储对象中已没有引用的"""
+        if not self.blob_store or not hashes:
+            return 0
+        try:
+            return self.blob_store.release(hashes)
+        except Exception as e:
+            print(f"回收内容存储失败: {e}")
+            return 0
+    
+    def collect_blob_garbage(self) -> int:
+        """全量扫描，回收内容存储中已没有引用的文件（维护操作）"""
+        if not self.blob_store:
+            return 0
+        try:
+            return self.blob_store.collect_garbage()
+        except Exception as e:
+            print(f"回收内容存储失败: {e}")
+            return 0
+    
+    @board_reader
     def get_board_files(self, board_id: str, file_type: str) -> List[str]:
         """获取展板中的文件列表"""
         board_info = self.file_manager.get_board_info(board_id)
@@ -513,13 +691,7 @@ class ContentManager:
             return []
         
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             return []
@@ -530,6 +702,7 @@ class ContentManager:
         
         return [f.name for f in target_dir.iterdir() if f.is_file()]
     
+    @board_reader
     def get_board_windows(self, board_id: str) -> List[Dict]:
         """获取展板的所有窗口"""
         board_info = self.file_manager.get_board_info(board_id)
@@ -537,13 +710,7 @@ class ContentManager:
             return []
         
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             return []
@@ -555,88 +722,121 @@ class ContentManager:
         windows = []
         seen_window_ids = set()  # 用于去重
         
-        # 扫描files目录，查找所有JSON配置文件（新命名规则：xxx.ext.json）
-        for file_path in files_dir.iterdir():
-            if file_path.is_file() and file_path.suffix == ".json":
+        if self.metadata:
+            # sqlite 后端：一次查询取出展板的所有窗口配置
+            cached_windows = [
+                (sidecar, self._attach_window_content(board_dir, window_data))
+                for sidecar, window_data in self.metadata.list_windows(board_id)
+            ]
+        else:
+            # 扫描files目录中的JSON配置文件（新命名规则：xxx.ext.json），只重新解析发生变化的条目
+            cached_windows = self.window_cache.get_windows(
+                board_id, files_dir, lambda json_file: self._load_window_from_sidecar(board_id, json_file)
+            )
+        for sidecar_name, window_data in cached_windows:
+            # 检查窗口ID是否重复
+            window_id = window_data.get('id')
+            if window_id in seen_window_ids:
+                print(f"警告: 发现重复的窗口ID，跳过文件: {sidecar_name} (ID: {window_id})")
+                continue
+            
+            seen_window_ids.add(window_id)
+            if window_data.get('type', 'text') == 'text':
+                window_data['content_version'] = self._current_content_version(board_id, window_id, window_data)
+                # 尚未写盘的编辑以缓冲中的内容为准
+                pending = self.autosave.get(board_id, window_id) if self.autosave is not None else None
+                if pending is not None:
+                    window_data['content'] = pending
+            windows.append(window_data)
+        
+        # 孤立文件（没有JSON配置的文件）由后台的 OrphanReconciler 负责补建窗口，读取路径不写磁盘
+        return windows
+    
+    def _load_window_from_sidecar(self, board_id: str, json_file: Path) -> Optional[Dict]:
+        """解析单个JSON配置文件并加载对应的内容，失败返回None"""
+        try:
+            with open(json_file, "r", encoding="utf-8") as f:
+                window_data = json.load(f)
+            
+            self.window_index.register(board_id, json_file.name, window_data)
+            return self._attach_window_content(json_file.parent.parent, window_data)
+        except Exception as e:
+            print(f"读取窗口配置文件失败: {json_file}, 错误: {e}")
+            return None
+    
+    def _attach_window_content(self, board_dir: Path, window_data: Dict) -> Dict:
+        """从对应的文件中加载窗口内容"""
+        window_type = window_data.get('type', 'text')
+        
+        if window_type == 'generic':
+            # 通用窗口没有内容文件，content为空
+            window_data['content'] = ''
+        elif 'file_path' in window_data and window_data['file_path'] is not None:
+            content_file_path = board_dir / window_data['file_path']
+            if content_file_path.exists():
                 try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        window_data = json.load(f)
-                    
-                    # 检查窗口ID是否重复
-                    window_id = window_data.get('id')
-                    if window_id in seen_window_ids:
-                        print(f"警告: 发现重复的窗口ID，跳过文件: {file_path.name} (ID: {window_id})")
-                        continue
-                    
-                    seen_window_ids.add(window_id)
-                    
-                    # 从对应的文件中加载内容
-                    window_type = window_data.get('type', 'text')
-                    
-                    if window_type == 'generic':
-                        # 通用窗口没有内容文件，content为空
-                        window_data['content'] = ''
-                    elif 'file_path' in window_data and window_data['file_path'] is not None:
-                        content_file_path = board_dir / window_data['file_path']
-                        if content_file_path.exists():
-                            try:
-                                # 根据文件类型决定如何加载内容
-                                if window_type == 'text':
-                                    # 文本类型：从文件读取内容，尝试多种编码
-                                    try:
-                                        with open(content_file_path, "r", encoding="utf-8") as f:
-                                            window_data['content'] = f.read()
-                                    except UnicodeDecodeError:
-                                        try:
-                                            with open(content_file_path, "r", encoding="gbk") as f:
-                                                window_data['content'] = f.read()
-                                        except UnicodeDecodeError:
-                                            try:
-                                                with open(content_file_path, "r", encoding="gb2312") as f:
-                                                    window_data['content'] = f.read()
-                                            except UnicodeDecodeError:
-                                                # 如果所有编码都失败，使用二进制模式读取并忽略错误
-                                                with open(content_file_path, "r", encoding="utf-8", errors="ignore") as f:
-                                                    window_data['content'] = f.read()
-                                else:
-                                    # 对于媒体文件，content存储文件路径或URL
-                                    window_data['content'] = str(content_file_path)
-                            except Exception as e:
-                                print(f"读取内容文件失败: {content_file_path}, 错误: {e}")
-                                window_data['content'] = ""
-                        else:
-                            window_data['content'] = ""
+                    # 根据文件类型决定如何加载内容
+                    if window_type == 'text':
+                        # 文本类型：从文件读取内容，尝试多种编码
+                        window_data['content'] = self._read_text_content(content_file_path)
                     else:
-                        # 兼容旧数据或没有file_path的情况
-                        window_data['content'] = window_data.get('content', '')
-                    
-                    windows.append(window_data)
+                        # 对于媒体文件，content存储文件路径或URL
+                        window_data['content'] = str(content_file_path)
                 except Exception as e:
-                    print(f"读取窗口配置文件失败: {file_path}, 错误: {e}")
-                    continue
-        
-        # 扫描files目录，为没有JSON配置的文件创建窗口配置
-        self._auto_create_windows_for_orphaned_files(board_id, files_dir, windows)
+                    print(f"读取内容文件失败: {content_file_path}, 错误: {e}")
+                    window_data['content'] = ""
+            else:
+                window_data['content'] = ""
+        else:
+            # 兼容旧数据或没有file_path的情况
+            window_data['content'] = window_data.get('content', '')
         
-        return windows
+        return window_data
+    
+    def _read_text_content(self, content_file_path: Path) -> str:
+        """读取文本内容文件，依次尝试多种编码"""
+        for encoding in ("utf-8", "gbk", "gb2312"):
+            try:
+                with open(content_file_path, "r", encoding=encoding) as f:
+                    return f.read()
+            except UnicodeDecodeError:
+                continue
+        # 如果所有编码都失败，忽略错误
+        with open(content_file_path, "r", encoding="utf-8", errors="ignore") as f:
+            return f.read()
     
-    def _auto_create_windows_for_orphaned_files(self, board_id: str, files_dir: Path, existing_windows: List[Dict]):
-        """为没有JSON配置的文件自动创建窗口配置"""
+    @board_writer
+    def reconcile_orphaned_files(self, board_id: str) -> List[Dict]:
+        """为没有JSON配置的文件自动创建窗口配置，返回新创建的窗口（由后台 OrphanReconciler 调用）"""
+        created_windows = []
         try:
+            board_dir = self.file_manager.get_board_dir(board_id)
+            if not board_dir:
+                return created_windows
+            files_dir = board_dir / "files"
             if not files_dir.exists():
-                return
+                return created_windows
             
             # 获取所有现有JSON文件对应的实际文件名（新命名规则：xxx.ext.json）
             existing_json_files = set()
-            for json_file in files_dir.glob("*.json"):
+            sidecars = self.metadata.list_sidecars(board_id) if self.metadata else [
+                json_file.name for json_file in files_dir.glob("*.json")
+            ]
+            for sidecar in sidecars:
                 # 从 xxx.ext.json 推导出 xxx.ext
-                if json_file.name.endswith('.json'):
-                    actual_filename = json_file.name[:-5]  # 移除 .json 后缀
+                if sidecar.endswith('.json'):
+                    actual_filename = sidecar[:-5]  # 移除 .json 后缀
                     existing_json_files.add(actual_filename)
             
             # 扫描所有非JSON文件
             for file_path in files_dir.iterdir():
                 if file_path.is_file() and file_path.suffix != '.json':
+                    # 旧版本上传流程遗留的临时文件不是孤立文件
+                    if file_path.name.startswith('_temp_') or is_temp_path(file_path.name):
+                        continue
+                    # 批量导入中的文件，窗口配置随后写入
+                    if self.is_filename_reserved(board_id, file_path.name):
+                        continue
                     # 检查是否已有对应的JSON配置文件
                     if file_path.name not in existing_json_files:
                         print(f"发现孤立文件，自动创建窗口配置: {file_path}")
@@ -644,8 +844,12 @@ class ContentManager:
                         # 根据文件扩展名确定窗口类型
                         window_type = self._get_window_type_from_extension(file_path.suffix)
                         
-                        # 生成唯一的window_id
+                        # 生成唯一的window_id（同一毫秒内补建多个窗口时追加序号）
                         window_id = f"window_{int(time.time() * 1000)}"
+                        suffix = 1
+                        while self.window_index.lookup(window_id):
+                            window_id = f"window_{int(time.time() * 1000)}_{suffix}"
+                            suffix += 1
                         
                         # 创建窗口配置
                         window_data = {
@@ -662,14 +866,13 @@ class ContentManager:
                         
                         # 保存JSON配置文件（新命名规则：xxx.ext.json）
                         json_path = files_dir / f"{file_path.name}.json"
-                        with open(json_path, "w", encoding="utf-8") as f:
-                            json.dump(window_data, f, ensure_ascii=False, indent=2)
+                        self._write_window_json(json_path, window_data)
                         
-                        # 添加到现有窗口列表中
-                        existing_windows.append(window_data)
+                        created_windows.append(window_data)
                         
         except Exception as e:
             print(f"自动创建窗口配置失败: {e}")
+        return created_windows
     
     def _get_window_type_from_extension(self, extension: str) -> str:
         """根据文件扩展名确定窗口类型"""
@@ -702,51 +905,42 @@ class ContentManager:
         """重命名窗口的JSON配置文件以匹配上传的文件名（新命名规则）"""
         try:
             # 查找包含指定window_id的JSON文件
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        # 获取文件路径以确定新的JSON文件名
-                        file_path = data.get("file_path", "")
-                        if file_path.startswith("files/"):
-                            actual_filename = file_path[6:]  # 移除 "files/" 前缀
-                            # 使用新命名规则：xxx.ext.json
-                            new_json_filename = f"{actual_filename}.json"
-                        else:
-                            # 兜底方案
-                            window_type = data.get("type", "text")
-                            file_extension = self._get_file_extension(window_type)
-                            new_json_filename = f"{new_basename}{file_extension}.json"
-                        
-                        new_json_path = files_dir / new_json_filename
-                        
-                        # 更新JSON数据中的标题 - 使用完整的文件名（包含扩展名）
-                        if file_path.startswith("files/"):
-                            actual_filename = file_path[6:]  # 移除 "files/" 前缀
-                            data["title"] = actual_filename  # 使用完整的文件名
-                        else:
-                            # 兜底方案：使用basename + extension
-                            window_type = data.get("type", "text")
-                            file_extension = self._get_file_extension(window_type)
-                            data["title"] = f"{new_basename}{file_extension}"
-                        data["updated_at"] = datetime.now().isoformat()
-                        
-                        # 保存到新位置
-                        with open(new_json_path, "w", encoding="utf-8") as f:
-                            json.dump(data, f, ensure_ascii=False, indent=2)
-                        
-                        # 删除旧文件（如果不是同一个文件）
-                        if new_json_path != json_file:
-                            json_file.unlink()
-                        
-                        print(f"重命名JSON配置文件: {json_file.name} -> {new_json_path.name}")
-                        break
-                        
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
-                    
+            json_file, data = self._find_window_json(files_dir, window_id)
+            if json_file and data:
+                # 获取文件路径以确定新的JSON文件名
+                file_path = data.get("file_path", "")
+                if file_path.startswith("files/"):
+                    actual_filename = file_path[6:]  # 移除 "files/" 前缀
+                    # 使用新命名规则：xxx.ext.json
+                    new_json_filename = f"{actual_filename}.json"
+                else:
+                    # 兜底方案
+                    window_type = data.get("type", "text")
+                    file_extension = self._get_file_extension(window_type)
+                    new_json_filename = f"{new_basename}{file_extension}.json"
+                
+                new_json_path = files_dir / new_json_filename
+                
+                # 更新JSON数据中的标题 - 使用完整的文件名（包含扩展名）
+                if file_path.startswith("files/"):
+                    actual_filename = file_path[6:]  # 移除 "files/" 前缀
+                    data["title"] = actual_filename  # 使用完整的文件名
+                else:
+                    # 兜底方案：使用basename + extension
+                    window_type = data.get("type", "text")
+                    file_extension = self._get_file_extension(window_type)
+                    data["title"] = f"{new_basename}{file_extension}"
+                data["updated_at"] = datetime.now().isoformat()
+                
+                # 保存到新位置
+                self._write_window_json(new_json_path, data)
+                
+                # 删除旧文件（如果不是同一个文件）
+                if new_json_path != json_file:
+                    self._remove_window_json(json_file)
+                
+                print(f"重命名JSON配置文件: {json_file.name} -> {new_json_path.name}")
+
         except Exception as e:
             print(f"重命名JSON文件失败: {e}")
     
@@ -754,20 +948,7 @@ class ContentManager:
         """更新窗口的JSON配置文件，用于文件上传后的更新"""
         try:
             # 查找包含指定window_id的JSON文件
-            old_json_file = None
-            window_data = None
-            
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        old_json_file = json_file
-                        window_data = data
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            old_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not old_json_file or not window_data:
                 print(f"未找到窗口 {window_id} 对应的JSON文件")
@@ -783,12 +964,11 @@ class ContentManager:
             new_json_path = files_dir / new_json_filename
             
             # 保存更新的JSON文件
-            with open(new_json_path, "w", encoding="utf-8") as f:
-                json.dump(window_data, f, ensure_ascii=False, indent=2)
+            self._write_window_json(new_json_path, window_data)
             
             # 删除旧的JSON文件（如果不是同一个文件）
             if new_json_path != old_json_file:
-                old_json_file.unlink()
+                self._remove_window_json(old_json_file)
                 print(f"更新JSON文件: {old_json_file.name} -> {new_json_filename}")
             else:
                 print(f"更新JSON文件: {new_json_filename}")
@@ -796,17 +976,100 @@ class ContentManager:
         except Exception as e:
             print(f"更新JSON配置文件失败: {e}")
     
-    def update_window_content_only(self, board_id: str, window_id: str, content: str):
-        """更新窗口的文字内容（新存储结构：更新.md文件）"""
+    @window_writer
+    def update_window_content_only(self, board_id: str, window_id: str, content: str) -> Optional[int]:
+        """更新窗口的文字内容，返回文本窗口的新内容版本号；文本窗口的内容先进入延迟写入缓冲，其他窗口直接写盘"""
+        if self.autosave is not None and self.autosave.contains(board_id, window_id):
+            return self._store_text_content(board_id, window_id, content)
+        if self._text_window_data(board_id, window_id) is not None:
+            return self._store_text_content(board_id, window_id, content)
+        self._write_window_content_only(board_id, window_id, content)
+        return None
+    
+    @window_writer
+    def patch_window_content(self, board_id: str, window_id: str, base_version: int, ops: List[Dict]) -> Optional[Dict]:
+        """
+        在文本窗口的当前内容上应用位置拼接操作（格式见 text_patch），返回 {"version", "length"}，窗口不存在返回None
+        base_version 与当前内容版本号不一致时抛出 ContentVersionConflict，操作无效时抛出 TextPatchError
+        """
+        data = self._text_window_data(board_id, window_id)
+        if data is None:
+            return None
+        current_version = self._current_content_version(board_id, window_id, data)
+        if base_version != current_version:
+            metrics.increment("content_patch.conflicts")
+            raise ContentVersionConflict(current_version)
+        
+        content = self.autosave.get(board_id, window_id) if self.autosave is not None else None
+        if content is None:
+            content = self._read_text_content(self.file_manager.get_board_dir(board_id) / data["file_path"])
+        new_content = apply_text_patch(content, ops)
+        version = self._store_text_content(board_id, window_id, new_content, data)
+        metrics.increment("content_patch.applied")
+        return {"version": version, "length": len(new_content)}
+    
+    def _text_window_data(self, board_id: str, window_id: str) -> Optional[Dict]:
+        """返回有.md内容文件的文本窗口的配置，其他窗口返回None（只有这类窗口的内容可以延迟写入和增量修改）"""
+        board_dir = self.file_manager.get_board_dir(board_id)
+        if not board_dir or not (board_dir / "files").exists():
+            return None
+        json_file, data = self._find_window_json(board_dir / "files", window_id)
+        if not data or data.get("type", "text") != "text" or not data.get("file_path"):
+            return None
+        return data if (board_dir / data["file_path"]).exists() else None
+    
+    def _store_text_content(self, board_id: str, window_id: str, content: str, data: Optional[Dict] = None) -> int:
+        """保存文本窗口的新内容并递增内容版本号：有延迟写入缓冲时放入缓冲，否则直接写盘"""
+        version = self._bump_content_version(board_id, window_id, data)
+        if self.autosave is None or not self.autosave.put(board_id, window_id, content):
+            self._write_window_content_only(board_id, window_id, content)
+        return version
+    
+    def _current_content_version(self, board_id: str, window_id: str, data: Optional[Dict] = None) -> int:
+        """当前内容版本号：内存中没有记录时取窗口配置中保存的值"""
+        with self._content_versions_lock:
+            version = self._content_versions.get((board_id, window_id))
+        if version is None:
+            version = (data or {}).get("content_version") or 0
+        return version
+    
+    def _bump_content_version(self, board_id: str, window_id: str, data: Optional[Dict] = None) -> int:
+        """递增并返回内容版本号"""
+        with self._content_versions_lock:
+            version = self._content_versions.get((board_id, window_id))
+            if version is None:
+                version = (data or {}).get("content_version") or 0
+            version += 1
+            self._content_versions[(board_id, window_id)] = version
+            return version
+    
+    @window_writer
+    def _flush_autosaved_content(self, board_id: str, window_id: str):
+        """写出缓冲中的窗口内容（持有窗口锁时取出，避免旧内容覆盖其他操作写入的新内容；写盘失败时放回缓冲等待重试）"""
+        content = self.autosave.take(board_id, window_id)
+        if content is not None:
+            try:
+                self._write_window_content_only(board_id, window_id, content, raise_errors=True)
+            except Exception:
+                self.autosave.restore(board_id, window_id, content)
+                raise
+    
+    def _flush_board_autosave(self, board_id: str):
+        """展板的结构性修改开始前写出该展板缓冲中的内容"""
+        if self.autosave is not None:
+            self.autosave.flush(board_id)
+    
+    def flush_autosave(self):
+        """写出所有缓冲中的窗口内容并停止后台写入线程（停止服务时调用）"""
+        if self.autosave is not None:
+            self.autosave.close()
+    
+    @window_writer
+    def _write_window_content_only(self, board_id: str, window_id: str, content: str, raise_errors: bool = False):
+        """更新窗口的文字内容（新存储结构：更新.md文件）；raise_errors 为True时写入失败抛出异常而不是只打印"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 print(f"展板目录不存在: {board_id}")
@@ -818,63 +1081,53 @@ class ContentManager:
                 return
             
             # 查找窗口对应的JSON文件
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    
-                    if data.get("id") == window_id:
-                        window_type = data.get("type", "text")
-                        
-                        if window_type == "text":
-                            # 文本类型：更新对应的.md文件
-                            if 'file_path' in data and data['file_path']:
-                                content_file_path = board_dir / data['file_path']
-                                if content_file_path.exists():
-                                    # 更新文件内容，尝试检测编码
+            json_file, data = self._find_window_json(files_dir, window_id)
+            if json_file and data:
+                window_type = data.get("type", "text")
+                
+                if window_type == "text":
+                    # 文本类型：更新对应的.md文件
+                    if 'file_path' in data and data['file_path']:
+                        content_file_path = board_dir / data['file_path']
+                        if content_file_path.exists():
+                            # 更新文件内容，尝试检测编码
+                            with self.write_intents.writing(content_file_path):
+                                try:
+                                    atomic_write_text(content_file_path, content, kind="window_content")
+                                except UnicodeEncodeError:
+                                    # 如果UTF-8编码失败，尝试GBK编码
                                     try:
-                                        with open(content_file_path, "w", encoding="utf-8") as f:
-                                            f.write(content)
+                                        atomic_write_text(content_file_path, content, kind="window_content", encoding="gbk")
                                     except UnicodeEncodeError:
-                                        # 如果UTF-8编码失败，尝试GBK编码
-                                        try:
-                                            with open(content_file_path, "w", encoding="gbk") as f:
-                                                f.write(content)
-                                        except UnicodeEncodeError:
-                                            # 最后使用UTF-8并忽略错误
-                                            with open(content_file_path, "w", encoding="utf-8", errors="ignore") as f:
-                                                f.write(content)
-                                    
-                                    # 更新JSON文件的时间戳
-                                    data["updated_at"] = datetime.now().isoformat()
-                                    with open(json_file, "w", encoding="utf-8") as f:
-                                        json.dump(data, f, ensure_ascii=False, indent=2)
-                                    
-                                    print(f"更新窗口内容: {window_id} -> {content_file_path.name}")
-                                    return
-                                else:
-                                    print(f"内容文件不存在: {content_file_path}")
-                            else:
-                                print(f"窗口 {window_id} 没有关联的内容文件")
-                        else:
-                            # 非文本类型：保持原有逻辑
-                            data["content"] = content
+                                        # 最后使用UTF-8并忽略错误
+                                        atomic_write_text(content_file_path, content, kind="window_content", errors="ignore")
+                            
+                            # 更新JSON文件的时间戳和内容版本号
                             data["updated_at"] = datetime.now().isoformat()
+                            data["content_version"] = self._current_content_version(board_id, window_id, data)
+                            self._write_window_json(json_file, data)
                             
-                        with open(json_file, "w", encoding="utf-8") as f:
-                            json.dump(data, f, ensure_ascii=False, indent=2)
-                        
-                            print(f"更新窗口内容: {window_id} -> {content}")
-                        return
-                        
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+                            print(f"更新窗口内容: {window_id} -> {content_file_path.name}")
+                            return
+                        else:
+                            print(f"内容文件不存在: {content_file_path}")
+                    else:
+                        print(f"窗口 {window_id} 没有关联的内容文件")
+                else:
+                    # 非文本类型：保持原有逻辑
+                    data["content"] = content
+                    data["updated_at"] = datetime.now().isoformat()
+                    
+                self._write_window_json(json_file, data)
+                print(f"更新窗口内容: {window_id} -> {content}")
+                return
             
             print(f"未找到窗口 {window_id} 对应的JSON文件")
             
         except Exception as e:
             print(f"更新窗口内容失败: {e}")
+            if raise_errors:
+                raise
     
     def _ensure_json_file_exists(self, files_dir: Path, window_id: str, new_filename: str):
         """确保JSON文件存在并正确指向新文件"""
@@ -887,12 +1140,10 @@ class ContentManager:
             expected_json_path = files_dir / f"{new_filename}.json"
             print(f"期望的JSON文件路径: {expected_json_path}")
             
-            if expected_json_path.exists():
+            data = self._read_window_json(expected_json_path) if self._sidecar_exists(expected_json_path) else None
+            if data is not None:
                 print(f"JSON文件已存在，验证内容...")
                 # JSON文件已存在，验证内容是否正确
-                with open(expected_json_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
                 if data.get("id") == window_id and data.get("title") == new_filename:
                     print(f"JSON文件已正确存在: {expected_json_path.name}")
                     return
@@ -905,23 +1156,12 @@ class ContentManager:
             print(f"创建/更新JSON文件: {expected_json_path.name}")
             
             # 查找现有的窗口数据
-            existing_data = None
             print(f"搜索现有窗口数据...")
-            for json_file in files_dir.glob("*.json"):
-                print(f"   检查文件: {json_file.name}")
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        existing_data = data
-                        # 删除旧的JSON文件（如果不是目标文件）
-                        if json_file != expected_json_path:
-                            json_file.unlink()
-                            print(f"删除旧JSON文件: {json_file.name}")
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            json_file, existing_data = self._find_window_json(files_dir, window_id)
+            if json_file and json_file != expected_json_path:
+                # 删除旧的JSON文件（如果不是目标文件）
+                self._remove_window_json(json_file)
+                print(f"删除旧JSON文件: {json_file.name}")
             
             if existing_data:
                 # 更新现有数据
@@ -944,8 +1184,7 @@ class ContentManager:
                 }
             
             # 保存JSON文件
-            with open(expected_json_path, "w", encoding="utf-8") as f:
-                json.dump(existing_data, f, ensure_ascii=False, indent=2)
+            self._write_window_json(expected_json_path, existing_data)
             
             print(f"JSON文件已更新: {expected_json_path.name}")
             
@@ -957,33 +1196,19 @@ class ContentManager:
         print(f"    _get_existing_filename_for_window: 查找窗口 {window_id} 的现有文件")
         try:
             # 查找包含指定window_id的JSON文件
-            json_files = list(files_dir.glob("*.json"))
-            print(f"    找到 {len(json_files)} 个JSON文件: {[f.name for f in json_files]}")
-            
-            for json_file in json_files:
-                print(f"    检查JSON文件: {json_file.name}")
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    file_window_id = data.get("id")
-                    print(f"      文件中的window_id: {file_window_id}")
-                    if file_window_id == window_id:
-                        # 从窗口数据中的file_path获取实际文件名
-                        file_path = data.get("file_path", "")
-                        print(f"      JSON中的file_path: '{file_path}'")
-                        if file_path.startswith("files/"):
-                            actual_filename = file_path[6:]  # 移除 "files/" 前缀
-                            print(f"      返回文件名(从file_path): '{actual_filename}'")
-                            return actual_filename
-                        # 兜底：从JSON文件名推导（xxx.ext.json -> xxx.ext）
-                        elif json_file.name.endswith('.json'):
-                            actual_filename = json_file.name[:-5]  # 移除 .json 后缀
-                            print(f"      返回文件名(从JSON文件名): '{actual_filename}'")
-                            return actual_filename
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            json_file, data = self._find_window_json(files_dir, window_id)
+            if json_file and data:
+                # 从窗口数据中的file_path获取实际文件名
+                file_path = data.get("file_path") or ""
+                print(f"      JSON中的file_path: '{file_path}'")
+                if file_path.startswith("files/"):
+                    actual_filename = file_path[6:]  # 移除 "files/" 前缀
+                    print(f"      返回文件名(从file_path): '{actual_filename}'")
+                    return actual_filename
+                # 兜底：从JSON文件名推导（xxx.ext.json -> xxx.ext）
+                actual_filename = json_file.name[:-5]  # 移除 .json 后缀
+                print(f"      返回文件名(从JSON文件名): '{actual_filename}'")
+                return actual_filename
             return None
         except Exception as e:
             print(f"获取现有文件名失败: {e}")
@@ -997,26 +1222,17 @@ class ContentManager:
                 self._clean_single_board_info(board_id)
             else:
                 # 清理所有展板
-                for course_dir in self.file_manager.courses_dir.iterdir():
-                    if course_dir.is_dir():
-                        for board_dir in course_dir.iterdir():
-                            if board_dir.is_dir() and board_dir.name.startswith("board-"):
-                                board_id = board_dir.name
-                                self._clean_single_board_info(board_id)
+                for board_id, _ in self.file_manager.board_index.items():
+                    self._clean_single_board_info(board_id)
         except Exception as e:
             print(f"清理board_info冗余数据失败: {e}")
     
+    @board_writer
     def _clean_single_board_info(self, board_id: str):
         """清理单个展板的board_info.json"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 return
@@ -1035,8 +1251,7 @@ class ContentManager:
                 board_info["updated_at"] = datetime.now().isoformat()
                 
                 # 保存清理后的数据
-                with open(board_info_path, "w", encoding="utf-8") as f:
-                    json.dump(board_info, f, ensure_ascii=False, indent=2)
+                atomic_write_json(board_info_path, board_info, kind="board_info")
                     
         except Exception as e:
             print(f"清理单个board_info失败: {board_id}, 错误: {e}")
@@ -1049,26 +1264,17 @@ class ContentManager:
                 self._migrate_single_board_json_naming(board_id)
             else:
                 # 迁移所有展板
-                for course_dir in self.file_manager.courses_dir.iterdir():
-                    if course_dir.is_dir():
-                        for board_dir in course_dir.iterdir():
-                            if board_dir.is_dir() and board_dir.name.startswith("board-"):
-                                board_id = board_dir.name
-                                self._migrate_single_board_json_naming(board_id)
+                for board_id, _ in self.file_manager.board_index.items():
+                    self._migrate_single_board_json_naming(board_id)
         except Exception as e:
             print(f"迁移JSON命名规则失败: {e}")
     
+    @board_writer
     def _migrate_single_board_json_naming(self, board_id: str):
         """迁移单个展板的JSON命名规则"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 return
@@ -1078,7 +1284,7 @@ class ContentManager:
                 return
             
             # 查找所有旧格式的JSON文件（xxx.json）
-            for json_file in files_dir.glob("*.json"):
+            for json_file, data in list(self._iter_board_sidecars(board_id, files_dir)):
                 try:
                     # 检查是否是旧格式（不包含扩展名的JSON文件）
                     json_basename = json_file.stem
@@ -1091,10 +1297,6 @@ class ContentManager:
                             break
                     
                     if actual_file:
-                        # 读取JSON数据
-                        with open(json_file, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-                        
                         # 创建新的JSON文件名（xxx.ext.json）
                         new_json_filename = f"{actual_file.name}.json"
                         new_json_path = files_dir / new_json_filename
@@ -1106,11 +1308,10 @@ class ContentManager:
                             data["updated_at"] = datetime.now().isoformat()
                             
                             # 保存到新位置
-                            with open(new_json_path, "w", encoding="utf-8") as f:
-                                json.dump(data, f, ensure_ascii=False, indent=2)
+                            self._write_window_json(new_json_path, data)
                             
                             # 删除旧文件
-                            json_file.unlink()
+                            self._remove_window_json(json_file)
                             
                             print(f"迁移JSON文件: {json_file.name} -> {new_json_filename}")
                         
@@ -1121,17 +1322,12 @@ class ContentManager:
         except Exception as e:
             print(f"迁移单个展板JSON命名规则失败: {board_id}, 错误: {e}")
     
+    @board_writer
     def fix_duplicate_windows(self, board_id: str) -> Dict:
         """修复重复的窗口ID问题"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 return {"error": "展板目录不存在"}
@@ -1143,11 +1339,8 @@ class ContentManager:
             # 收集所有窗口数据
             windows_by_id = {}
             
-            for json_file in files_dir.glob("*.json"):
+            for json_file, window_data in self._iter_board_sidecars(board_id, files_dir):
                 try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        window_data = json.load(f)
-                    
                     window_id = window_data.get("id")
                     if window_id:
                         if window_id not in windows_by_id:
@@ -1189,7 +1382,7 @@ class ContentManager:
                 # 保留第一个（优先级最高的），删除其他的
                 for i, window in enumerate(windows[1:], 1):
                     try:
-                        window["file"].unlink()  # 删除JSON文件
+                        self._remove_window_json(window["file"])  # 删除JSON文件
                         print(f"删除重复窗口文件: {window['file'].name}")
                         fixed_count += 1
                     except Exception as e:
@@ -1205,17 +1398,12 @@ class ContentManager:
             print(f"修复重复窗口失败: {e}")
             return {"error": str(e)}
 
+    @board_writer
     def rename_window_and_file(self, board_id: str, window_id: str, new_name: str) -> Dict:
         """重命名窗口及其关联的文件"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 return {"success": False, "error": "展板目录不存在"}
@@ -1225,19 +1413,7 @@ class ContentManager:
                 return {"success": False, "error": "文件目录不存在"}
             
             # 查找窗口对应的JSON文件
-            window_json_file = None
-            window_data = None
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        window_json_file = json_file
-                        window_data = data
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            window_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not window_json_file or not window_data:
                 return {"success": False, "error": "未找到窗口配置"}
@@ -1273,7 +1449,8 @@ class ContentManager:
             
             # 重命名实际文件（如果存在）
             if current_file_path.exists():
-                current_file_path.rename(final_file_path)
+                with self.write_intents.writing(current_file_path, final_file_path):
+                    current_file_path.rename(final_file_path)
                 print(f"重命名文件: {current_filename} -> {final_filename}")
             
             # 更新窗口数据 - title使用完整的最终文件名（包含扩展名和冲突后缀）
@@ -1282,12 +1459,11 @@ class ContentManager:
             window_data["updated_at"] = datetime.now().isoformat()
             
             # 保存更新的JSON文件
-            with open(final_json_path, "w", encoding="utf-8") as f:
-                json.dump(window_data, f, ensure_ascii=False, indent=2)
+            self._write_window_json(final_json_path, window_data)
             
             # 删除旧的JSON文件
             if final_json_path != window_json_file:
-                window_json_file.unlink()
+                self._remove_window_json(window_json_file)
                 print(f"删除旧JSON文件: {window_json_file.name}")
             
             return {
@@ -1300,20 +1476,18 @@ class ContentManager:
             print(f"重命名窗口和文件失败: {e}")
             return {"success": False, "error": str(e)}
 
+    @board_reader
     def get_icon_positions(self, board_id: str) -> Dict:
         """获取展板的图标位置数据"""
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             return {}
         
+        if self.metadata:
+            return self.metadata.get_icon_positions(board_id)
+        
         icon_positions_file = board_dir / "icon_positions.json"
         if not icon_positions_file.exists():
             return {}
@@ -1324,16 +1498,11 @@ class ContentManager:
         except Exception:
             return {}
     
+    @board_writer
     def save_icon_positions(self, board_id: str, icon_positions: List[Dict]) -> bool:
         """保存展板的图标位置数据"""
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             return False
@@ -1351,8 +1520,10 @@ class ContentManager:
         icon_positions_file = board_dir / "icon_positions.json"
         
         try:
-            with open(icon_positions_file, "w", encoding="utf-8") as f:
-                json.dump(positions_dict, f, ensure_ascii=False, indent=2)
+            if self.metadata:
+                self.metadata.set_icon_positions(board_id, positions_dict)
+            if self.file_manager.write_json_files:
+                atomic_write_json(icon_positions_file, positions_dict, kind="icon_positions")
             return True
         except Exception:
             return False
@@ -1384,23 +1555,42 @@ class ContentManager:
         return extensions.get(window_type, ".txt")
     
     def _generate_unique_filename(self, files_dir: Path, base_name: str, extension: str) -> str:
-        """生成唯一的文件名"""
+        """生成唯一的文件名（同时避开批量导入保留的文件名）"""
         # 清理文件名中的非法字符
         safe_name = self._sanitize_filename(base_name)
+        board_id = files_dir.parent.name
         
         # 检查文件是否存在，如果存在则添加编号
         file_name = f"{safe_name}{extension}"
-        if not (files_dir / file_name).exists():
+        if not (files_dir / file_name).exists() and not self.is_filename_reserved(board_id, file_name):
             return file_name
         
         # 添加编号直到找到唯一名称
         counter = 1
         while True:
             file_name = f"{safe_name}({counter}){extension}"
-            if not (files_dir / file_name).exists():
+            if not (files_dir / file_name).exists() and not self.is_filename_reserved(board_id, file_name):
                 return file_name
             counter += 1
     
+    def reserve_filenames(self, board_id: str, filenames: List[str]):
+        """保留批量导入分配的文件名（持有展板写锁时调用），文件复制期间不需要持有展板锁"""
+        with self._reserved_files_lock:
+            self._reserved_files.setdefault(board_id, set()).update(filenames)
+    
+    def release_filenames(self, board_id: str, filenames: List[str]):
+        """窗口配置写入后（或导入失败时）释放保留的文件名"""
+        with self._reserved_files_lock:
+            reserved = self._reserved_files.get(board_id)
+            if reserved is not None:
+                reserved.difference_update(filenames)
+                if not reserved:
+                    del self._reserved_files[board_id]
+    
+    def is_filename_reserved(self, board_id: str, filename: str) -> bool:
+        with self._reserved_files_lock:
+            return filename in self._reserved_files.get(board_id, ())
+    
     def _sanitize_filename(self, filename: str) -> str:
         """清理文件名中的非法字符"""
         import re
@@ -1420,16 +1610,11 @@ class ContentManager:
         safe_name = self._sanitize_filename(window_title)
         return f"files/{safe_name}{extension}"
     
+    @board_writer
     def rename_window_file(self, board_id: str, window_id: str, old_title: str, new_title: str) -> bool:
         """重命名窗口对应的文件（新存储结构：.md文件 + .md.json配置）"""
         # 找到展板目录
-        board_dir = None
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                potential_board_dir = course_dir / board_id
-                if potential_board_dir.exists():
-                    board_dir = potential_board_dir
-                    break
+        board_dir = self.file_manager.get_board_dir(board_id)
         
         if not board_dir:
             print(f"展板目录不存在: {board_id}")
@@ -1442,20 +1627,7 @@ class ContentManager:
         
         try:
             # 查找窗口的JSON配置文件
-            window_json_file = None
-            window_data = None
-            
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        window_json_file = json_file
-                        window_data = data
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            window_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not window_json_file or not window_data:
                 print(f"未找到窗口配置: {window_id}")
@@ -1479,9 +1651,10 @@ class ContentManager:
                 
                 # 重命名内容文件
                 if old_md_file.exists():
-                    if new_md_file.exists():
-                        new_md_file.unlink()  # 删除冲突文件
-                    old_md_file.rename(new_md_file)
+                    with self.write_intents.writing(old_md_file, new_md_file):
+                        if new_md_file.exists():
+                            self._unlink_board_file(new_md_file)  # 删除冲突文件
+                        old_md_file.rename(new_md_file)
                     print(f"  重命名内容文件: {old_md_file.name} -> {new_md_file.name}")
                 
                 # 更新配置数据
@@ -1490,16 +1663,15 @@ class ContentManager:
                 window_data["updated_at"] = datetime.now().isoformat()
                 
                 # 重命名配置文件
-                if old_json_file.exists():
-                    if new_json_file.exists():
-                        new_json_file.unlink()  # 删除冲突文件
+                if self._sidecar_exists(old_json_file):
+                    if self._sidecar_exists(new_json_file):
+                        self._remove_window_json(new_json_file)  # 删除冲突文件
                     
                     # 写入更新后的配置到新文件
-                    with open(new_json_file, "w", encoding="utf-8") as f:
-                        json.dump(window_data, f, ensure_ascii=False, indent=2)
+                    self._write_window_json(new_json_file, window_data)
                 
                     # 删除旧配置文件
-                    old_json_file.unlink()
+                    self._remove_window_json(old_json_file)
                     print(f"  重命名配置文件: {old_json_file.name} -> {new_json_file.name}")
                 
             else:
@@ -1516,27 +1688,27 @@ class ContentManager:
                     
                     # 重命名实际文件
                     if old_file.exists():
-                        if new_file.exists():
-                            new_file.unlink()  # 删除冲突文件
-                        old_file.rename(new_file)
+                        with self.write_intents.writing(old_file, new_file):
+                            if new_file.exists():
+                                self._unlink_board_file(new_file)  # 删除冲突文件
+                            old_file.rename(new_file)
                         print(f"  重命名实际文件: {old_filename} -> {new_filename}")
                     
                     # 重命名JSON配置文件
                     old_json_file = files_dir / f"{old_filename}.json"
                     new_json_file = files_dir / f"{new_filename}.json"
                     
-                    if old_json_file.exists():
+                    if self._sidecar_exists(old_json_file):
                         # 更新配置数据
                         window_data["title"] = new_title
                         window_data["file_path"] = f"files/{new_filename}"
                         window_data["updated_at"] = datetime.now().isoformat()
                         
                         # 写入更新后的配置到新文件
-                        with open(new_json_file, "w", encoding="utf-8") as f:
-                            json.dump(window_data, f, ensure_ascii=False, indent=2)
+                        self._write_window_json(new_json_file, window_data)
                         
                         # 删除旧配置文件
-                        old_json_file.unlink()
+                        self._remove_window_json(old_json_file)
                         print(f"  重命名配置文件: {old_json_file.name} -> {new_json_file.name}")
             
             print(f"窗口文件重命名完成: {old_title} -> {new_title}")
@@ -1549,17 +1721,12 @@ class ContentManager:
         
         return False
     
-    def convert_text_window_to_file_window(self, board_id: str, window_id: str, temp_file_path: str, filename: str, window_type: str, original_file_path: str = None) -> bool:
+    @board_writer
+    def convert_text_window_to_file_window(self, board_id: str, window_id: str, temp_file_path: str, filename: str, window_type: str, original_file_path: str = None, sha256: str = None) -> bool:
         """将文本窗口转换为文件窗口"""
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 print(f"展板目录不存在: {board_id}")
@@ -1571,19 +1738,7 @@ class ContentManager:
                 return False
             
             # 查找窗口对应的JSON文件
-            window_json_file = None
-            window_data = None
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        window_json_file = json_file
-                        window_data = data
-                        break
-                except Exception as e:
-                    print(f"读取JSON文件失败: {json_file}, 错误: {e}")
-                    continue
+            window_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not window_json_file or not window_data:
                 print(f"未找到窗口配置: {window_id}")
@@ -1593,16 +1748,16 @@ class ContentManager:
             if window_data.get('file_path'):
                 old_content_file = board_dir / window_data['file_path']
                 if old_content_file.exists():
-                    old_content_file.unlink()
+                    self._unlink_board_file(old_content_file)
                     print(f"删除原有内容文件: {old_content_file}")
             
             # 生成新的文件名
             safe_filename = self._sanitize_filename(filename)
             new_file_path = files_dir / safe_filename
             
-            # 移动临时文件到目标位置
-            import shutil
-            shutil.move(temp_file_path, new_file_path)
+            # 移动临时文件到目标位置（提供sha256时链接到内容存储）
+            with self.write_intents.writing(new_file_path):
+                self._place_file(temp_file_path, new_file_path, move=True, sha256=sha256)
             print(f"文件保存到: {new_file_path}")
             
             # 如果有原文件，保存到originals文件夹
@@ -1614,8 +1769,8 @@ class ContentManager:
                 original_filename = Path(original_file_path).name
                 original_dest_path = originals_dir / original_filename
                 
-                # 复制原文件到originals文件夹
-                shutil.copy2(original_file_path, original_dest_path)
+                # 移动原文件到originals文件夹（原文件是上传暂存文件，调用方之后不再使用）
+                shutil.move(original_file_path, original_dest_path)
                 print(f"原文件保存到: {original_dest_path}")
                 
                 # 在窗口数据中记录原文件路径
@@ -1633,12 +1788,11 @@ class ContentManager:
             new_json_path = files_dir / new_json_filename
             
             # 保存更新的JSON文件
-            with open(new_json_path, "w", encoding="utf-8") as f:
-                json.dump(window_data, f, ensure_ascii=False, indent=2)
+            self._write_window_json(new_json_path, window_data)
             
             # 删除旧的JSON文件
             if new_json_path != window_json_file:
-                window_json_file.unlink()
+                self._remove_window_json(window_json_file)
                 print(f"删除旧JSON文件: {window_json_file}")
             
             print(f"窗口转换成功: {window_id} -> {window_type}")
@@ -1656,43 +1810,42 @@ class ContentManager:
     def find_window_board(self, window_id: str) -> Optional[str]:
         """查找窗口所在的板块ID"""
         try:
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if not course_dir.is_dir():
+            if self.metadata:
+                found = self.metadata.find_window(window_id)
+                return found[0] if found else None
+            
+            # 优先使用窗口索引（O(1)），并校验JSON配置文件仍然存在
+            entry = self.window_index.lookup(window_id)
+            if entry:
+                board_dir = self.file_manager.get_board_dir(entry["board_id"])
+                if board_dir:
+                    json_file, _ = self._find_window_json(board_dir / "files", window_id)
+                    if json_file:
+                        return entry["board_id"]
+                self.window_index.unregister(window_id)
+            
+            # 索引未命中：回退到扫描所有展板
+            for board_id, board_dir in self.file_manager.board_index.items():
+                # 检查files目录中的JSON文件
+                files_dir = board_dir / "files"
+                if not files_dir.exists():
                     continue
-                    
-                for board_dir in course_dir.iterdir():
-                    if not board_dir.is_dir() or not board_dir.name.startswith("board-"):
-                        continue
-                    
-                    # 检查files目录中的JSON文件
-                    files_dir = board_dir / "files"
-                    if not files_dir.exists():
-                        continue
-                    
-                    for json_file in files_dir.glob("*.json"):
-                        try:
-                            with open(json_file, "r", encoding="utf-8") as f:
-                                window_data = json.load(f)
-                            if window_data.get("id") == window_id:
-                                return board_dir.name
-                        except Exception:
-                            continue
+                
+                for json_file, window_data in self._iter_board_sidecars(board_id, files_dir):
+                    if window_data.get("id") == window_id:
+                        self.window_index.register(board_id, json_file.name, window_data)
+                        return board_id
             return None
         except Exception as e:
             print(f"查找窗口板块失败: {e}")
             return None
     
+    @board_writer
     def convert_window_to_text(self, board_id: str, window_id: str) -> bool:
         """将通用窗口转换为文本窗口"""
         try:
             # 找到板块目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 print(f"找不到板块目录: {board_id}")
@@ -1704,19 +1857,7 @@ class ContentManager:
                 return False
             
             # 查找窗口的JSON文件
-            window_json_file = None
-            window_data = None
-            
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        window_json_file = json_file
-                        window_data = data
-                        break
-                except Exception:
-                    continue
+            window_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not window_json_file or not window_data:
                 print(f"找不到窗口JSON文件: {window_id}")
@@ -1737,8 +1878,8 @@ class ContentManager:
             
             # 创建Markdown文件
             md_file_path = files_dir / md_file_name
-            with open(md_file_path, "w", encoding="utf-8") as f:
-                f.write("# " + window_title + "\n\n")  # 添加默认标题
+            with self.write_intents.writing(md_file_path):
+                atomic_write_text(md_file_path, "# " + window_title + "\n\n", kind="window_content")  # 添加默认标题
             
             # 更新窗口数据
             window_data["type"] = "text"
@@ -1751,15 +1892,13 @@ class ContentManager:
             # 如果新JSON文件名与旧的不同，需要重命名
             if window_json_file.name != json_file_name:
                 # 先保存更新后的数据到新文件
-                with open(new_json_file_path, "w", encoding="utf-8") as f:
-                    json.dump(window_data, f, ensure_ascii=False, indent=2)
+                self._write_window_json(new_json_file_path, window_data)
                 
                 # 删除旧的JSON文件
-                window_json_file.unlink()
+                self._remove_window_json(window_json_file)
             else:
                 # 文件名相同，直接更新内容
-                with open(window_json_file, "w", encoding="utf-8") as f:
-                    json.dump(window_data, f, ensure_ascii=False, indent=2)
+                self._write_window_json(window_json_file, window_data)
             
             print(f"成功将窗口转换为文本: {window_id} -> {md_file_name}")
             return True
@@ -1768,17 +1907,15 @@ class ContentManager:
             print(f"转换窗口失败: {e}")
             return False
     
+    @window_writer
     def update_window_content(self, board_id: str, window_id: str, content: str) -> bool:
         """更新窗口内容到文件"""
+        if self.autosave is not None:
+            # 整体写入的新内容取代缓冲中尚未写盘的内容
+            self.autosave.discard(board_id, window_id)
         try:
             # 找到板块目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 print(f"找不到板块目录: {board_id}")
@@ -1790,19 +1927,7 @@ class ContentManager:
                 return False
             
             # 查找窗口的JSON文件以获取文件路径
-            window_json_file = None
-            window_data = None
-            
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    if data.get("id") == window_id:
-                        window_json_file = json_file
-                        window_data = data
-                        break
-                except Exception:
-                    continue
+            window_json_file, window_data = self._find_window_json(files_dir, window_id)
             
             if not window_json_file or not window_data:
                 print(f"找不到窗口JSON文件: {window_id}")
@@ -1821,13 +1946,13 @@ class ContentManager:
                 content_file_path = files_dir / file_path
             
             # 写入内容到文件
-            with open(content_file_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            with self.write_intents.writing(content_file_path):
+                atomic_write_text(content_file_path, content, kind="window_content")
             
-            # 更新JSON文件的更新时间
+            # 更新JSON文件的更新时间和内容版本号
             window_data["updated_at"] = datetime.now().isoformat()
-            with open(window_json_file, "w", encoding="utf-8") as f:
-                json.dump(window_data, f, ensure_ascii=False, indent=2)
+            window_data["content_version"] = self._bump_content_version(board_id, window_id, window_data)
+            self._write_window_json(window_json_file, window_data)
             
             print(f"成功更新窗口内容: {window_id}")
             return True
@@ -1836,21 +1961,42 @@ class ContentManager:
             print(f"更新窗口内容失败: {e}")
             return False
     
-    def extract_pdf_text_to_pages(self, board_id: str, window_id: str, window_data: Dict) -> bool:
-        """提取PDF文本并保存到pages文件夹"""
+    def extract_pdf_text_to_pages(self, board_id: str, window_id: str, window_data: Dict,
+                                  progress=None, should_cancel=None, retry_failed: bool = False) -> bool:
+        """
+        提取PDF文本并保存到pages文件夹（progress/should_cancel/retry_failed 透传给 PdfExtractor.extract）
+
+        提取期间持有窗口锁；有操作在等待展板写锁时，完成当前批次后让出锁，之后重新读取窗口配置，从中断处继续
+        """
+        while True:
+            result = self._extract_pdf_text_step(board_id, window_id, window_data, progress, should_cancel, retry_failed)
+            if result is None:
+                return False
+            if not result["cancelled"] or (should_cancel and should_cancel()):
+                return result["page_count"] == 0 or result["failed"] < result["page_count"]
+            # 让出锁期间窗口可能被重命名或删除
+            window_data = None
+    
+    @window_writer
+    def _extract_pdf_text_step(self, board_id: str, window_id: str, window_data: Optional[Dict],
+                               progress, should_cancel, retry_failed: bool) -> Optional[Dict]:
+        """持有窗口锁提取一段，返回 PdfExtractor.extract 的结果；窗口或PDF不存在、提取出错时返回None"""
+        def should_stop():
+            return bool(should_cancel and should_cancel()) or self.locks.write_pending(board_id)
+        
         try:
             # 找到展板目录
-            board_dir = None
-            for course_dir in self.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
+            board_dir = self.file_manager.get_board_dir(board_id)
             
             if not board_dir:
                 print(f"展板目录不存在: {board_id}")
-                return False
+                return None
+            
+            if window_data is None:
+                _, window_data = self._find_window_json(board_dir / "files", window_id)
+                if not window_data:
+                    print(f"PDF窗口不存在: {window_id}")
+                    return None
             
             # 获取PDF文件路径
             pdf_file_path = None
@@ -1859,62 +2005,22 @@ class ContentManager:
             
             if not pdf_file_path or not pdf_file_path.exists():
                 print(f"PDF文件不存在: {pdf_file_path}")
-                return False
+                return None
             
             # 创建pages文件夹结构
             pages_dir = board_dir / "files" / "pages"
             pages_dir.mkdir(exist_ok=True)
             
             # 获取PDF文件名（不含扩展名）
-            pdf_name = pdf_file_path.stem
-            pdf_pages_dir = pages_dir / pdf_name
-            pdf_pages_dir.mkdir(exist_ok=True)
+            pdf_pages_dir = pages_dir / pdf_file_path.stem
             
-            print(f"开始提取PDF文本: {pdf_file_path}")
+            # 增量提取：PDF未变化时不做任何事，中断的提取从第一个缺失的页继续
+            return self.pdf_extractor.extract(pdf_file_path, pdf_pages_dir, window_data.get('title', 'unknown.pdf'),
+                                              progress=progress, should_cancel=should_stop,
+                                              retry_failed=retry_failed)
             
-            # 使用pypdf提取文本
-            with open(pdf_file_path, 'rb') as file:
-                pdf_reader = pypdf.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                
-                print(f"PDF总页数: {total_pages}")
-                
-                for page_num in range(total_pages):
-                    try:
-                        page = pdf_reader.pages[page_num]
-                        text = page.extract_text()
-                        
-                        # 保存到MD文件
-                        page_filename = f"{pdf_name}_page_{page_num + 1:03d}.md"
-                        page_file_path = pdf_pages_dir / page_filename
-                        
-                        # 创建MD文件内容
-                        md_content = f"# {pdf_name} - 第 {page_num + 1} 页\n\n"
-                        md_content += f"来源: {window_data.get('title', 'unknown.pdf')}\n"
-                        md_content += f"提取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-                        md_content += f"页码: {page_num + 1}/{total_pages}\n\n"
-                        md_content += "---\n\n"
-                        
-                        if text.strip():
-                            md_content += text.strip()
-                        else:
-                            md_content += "*此页面没有可提取的文本内容*"
-                        
-                        # 写入文件
-                        with open(page_file_path, 'w', encoding='utf-8') as f:
-                            f.write(md_content)
-                        
-                        print(f"已保存第 {page_num + 1} 页文本: {page_filename}")
-                        
-                    except Exception as e:
-                        print(f"提取第 {page_num + 1} 页文本失败: {e}")
-                        continue
-                
-                print(f"PDF文本提取完成: {total_pages} 页 -> {pdf_pages_dir}")
-                return True
-                
         except Exception as e:
             print(f"PDF文本提取失败: {e}")
             import traceback
             print(f"详细错误信息: {traceback.format_exc()}")
-            return False 
\ No newline at end of file
+            return None 
\ No newline at end of file
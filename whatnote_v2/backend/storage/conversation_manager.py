@@ -4,27 +4,34 @@ from pathlib import Path
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from .atomic_write import atomic_write_json
+
 class ConversationManager:
     """LLM对话记录管理器"""
     
     def __init__(self, file_manager):
         self.file_manager = file_manager
+        # SQLite 元数据存储（可选）：消息逐条保存，追加消息不再重写整个对话文件
+        self.metadata = file_manager.metadata
+    
+    def _export_conversation(self, conversations_dir: Path, conversation_id: str):
+        """sqlite 后端下按需写出对话的JSON文件"""
+        if self.metadata and self.file_manager.write_json_files:
+            conversation = self.metadata.get_conversation(conversation_id)
+            if conversation:
+                atomic_write_json(conversations_dir / f"{conversation_id}.json", conversation, kind="conversation")
     
     def get_board_conversations_dir(self, board_id: str) -> Optional[Path]:
         """获取指定展板的对话目录"""
-        # 遍历所有课程寻找对应的展板
-        for course_dir in self.file_manager.courses_dir.iterdir():
-            if course_dir.is_dir():
-                board_dir = course_dir / board_id
-                if board_dir.exists():
-                    conversations_dir = board_dir / "llm_conversations"
-                    if conversations_dir.exists():
-                        return conversations_dir
-                    else:
-                        # 如果不存在，创建目录
-                        conversations_dir.mkdir(exist_ok=True)
-                        return conversations_dir
-        return None
+        board_dir = self.file_manager.get_board_dir(board_id)
+        if not board_dir:
+            return None
+        
+        conversations_dir = board_dir / "llm_conversations"
+        if not conversations_dir.exists():
+            # 如果不存在，创建目录
+            conversations_dir.mkdir(exist_ok=True)
+        return conversations_dir
     
     def create_conversation(self, board_id: str, title: str = "") -> Dict:
         """创建新的对话记录"""
@@ -45,15 +52,25 @@ class ConversationManager:
             "messages": []
         }
         
+        if self.metadata:
+            self.metadata.put_conversation(conversation_data)
+            self._export_conversation(conversations_dir, conversation_id)
+            return conversation_data
+        
         # 保存到文件
         conversation_file = conversations_dir / f"{conversation_id}.json"
-        with open(conversation_file, "w", encoding="utf-8") as f:
-            json.dump(conversation_data, f, ensure_ascii=False, indent=2)
+        atomic_write_json(conversation_file, conversation_data, kind="conversation")
         
         return conversation_data
     
     def get_conversation(self, board_id: str, conversation_id: str) -> Optional[Dict]:
         """获取指定对话记录"""
+        if self.metadata:
+            conversation = self.metadata.get_conversation(conversation_id)
+            if conversation and conversation.get("board_id") == board_id:
+                return conversation
+            return None
+        
         conversations_dir = self.get_board_conversations_dir(board_id)
         if not conversations_dir:
             return None
@@ -71,6 +88,9 @@ class ConversationManager:
     
     def get_board_conversations(self, board_id: str) -> List[Dict]:
         """获取展板的所有对话记录（仅基本信息）"""
+        if self.metadata:
+            return self.metadata.list_conversations(board_id)
+        
         conversations_dir = self.get_board_conversations_dir(board_id)
         if not conversations_dir:
             return []
@@ -112,6 +132,15 @@ class ConversationManager:
                 if "timestamp" not in file_info:
                     file_info["timestamp"] = message["timestamp"]
         
+        if self.metadata:
+            try:
+                self.metadata.append_messages(conversation_id, [message], updated_at=datetime.now().isoformat())
+                self._export_conversation(self.get_board_conversations_dir(board_id), conversation_id)
+                return True
+            except Exception as e:
+                print(f"保存对话失败: {e}")
+                return False
+        
         # 添加消息到对话记录
         conversation["messages"].append(message)
         conversation["updated_at"] = datetime.now().isoformat()
@@ -121,8 +150,7 @@ class ConversationManager:
         conversation_file = conversations_dir / f"{conversation_id}.json"
         
         try:
-            with open(conversation_file, "w", encoding="utf-8") as f:
-                json.dump(conversation, f, ensure_ascii=False, indent=2)
+            atomic_write_json(conversation_file, conversation, kind="conversation")
             return True
         except Exception as e:
             print(f"保存对话失败: {e}")
@@ -137,12 +165,20 @@ class ConversationManager:
         conversation["title"] = new_title
         conversation["updated_at"] = datetime.now().isoformat()
         
+        if self.metadata:
+            try:
+                self.metadata.put_conversation(conversation)
+                self._export_conversation(self.get_board_conversations_dir(board_id), conversation_id)
+                return True
+            except Exception as e:
+                print(f"更新对话标题失败: {e}")
+                return False
+        
         conversations_dir = self.get_board_conversations_dir(board_id)
         conversation_file = conversations_dir / f"{conversation_id}.json"
         
         try:
-            with open(conversation_file, "w", encoding="utf-8") as f:
-                json.dump(conversation, f, ensure_ascii=False, indent=2)
+            atomic_write_json(conversation_file, conversation, kind="conversation")
             return True
         except Exception as e:
             print(f"更新对话标题失败: {e}")
@@ -154,6 +190,15 @@ class ConversationManager:
         if not conversations_dir:
             return False
         
+        if self.metadata:
+            if not self.get_conversation(board_id, conversation_id):
+                return False
+            self.metadata.delete_conversation(conversation_id)
+            conversation_file = conversations_dir / f"{conversation_id}.json"
+            if conversation_file.exists():
+                conversation_file.unlink()
+            return True
+        
         conversation_file = conversations_dir / f"{conversation_id}.json"
         if not conversation_file.exists():
             return False
@@ -0,0 +1,103 @@
+"""
+尾沿防抖
+同一个键在延迟时间内反复触发时，只在最后一次触发后（或首次触发 max_wait 秒后）交付一次，连续写入的最后一次变化一定会被交付。
+到期时间保存在最小堆中，事件循环上只挂一个定时器；交付后条目即被删除，待交付的条目数有上限，内存不会无限增长
+"""
+
+import asyncio
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import metrics
+
+
+class _Pending:
+    __slots__ = ("deadline", "first_seen", "value")
+
+    def __init__(self, deadline: float, first_seen: float, value: Any):
+        self.deadline = deadline
+        self.first_seen = first_seen
+        self.value = value
+
+
+class Debouncer:
+    """只在事件循环线程中使用；on_fire 收到同一时刻到期的 [(键, 最后一次的值)]"""
+
+    def __init__(self, on_fire: Callable[[List[Tuple[Hashable, Any]]], None],
+                 max_wait: float, max_pending: int):
+        self.on_fire = on_fire
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self._pending: Dict[Hashable, _Pending] = {}
+        # (到期时间, 序号, 键)；键被再次触发后旧的堆元素作废，弹出时跳过
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, key: Hashable, delay: float, value: Any = None):
+        """记录一次触发，把该键的交付推迟到 delay 秒后"""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        now = self._loop.time()
+        entry = self._pending.get(key)
+        first_seen = entry.first_seen if entry else now
+        deadline = min(now + delay, first_seen + self.max_wait)
+        self._pending[key] = _Pending(deadline, first_seen, value)
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        if entry:
+            metrics.increment("debouncer.coalesced")
+
+        if len(self._pending) > self.max_pending:
+            # 超出上限：立即交付最早到期的条目，而不是丢弃
+            self._fire(self._pop_due(float("inf"), limit=len(self._pending) - self.max_pending))
+        if len(self._heap) > 2 * len(self._pending) + 64:
+            self._compact()
+        self._schedule()
+
+    def flush(self):
+        """立即交付所有待交付的条目（停止监控时调用）"""
+        self._fire(self._pop_due(float("inf")))
+
+    def _pop_due(self, now: float, limit: Optional[int] = None) -> List[Tuple[Hashable, Any]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(due) < limit):
+            deadline, _, key = heapq.heappop(self._heap)
+            entry = self._pending.get(key)
+            if entry is not None and entry.deadline == deadline:
+                del self._pending[key]
+                due.append((key, entry.value))
+        return due
+
+    def _compact(self):
+        """丢弃堆中作废的元素"""
+        self._heap = [item for item in self._heap
+                      if item[2] in self._pending and self._pending[item[2]].deadline == item[0]]
+        heapq.heapify(self._heap)
+
+    def _schedule(self):
+        if not self._heap:
+            return
+        earliest = self._heap[0][0]
+        if self._timer is not None:
+            if self._timer_at <= earliest:
+                return
+            self._timer.cancel()
+        self._timer_at = earliest
+        self._timer = self._loop.call_at(earliest, self._expire)
+
+    def _expire(self):
+        self._timer = None
+        self._fire(self._pop_due(self._loop.time()))
+        self._schedule()
+
+    def _fire(self, due: List[Tuple[Hashable, Any]]):
+        metrics.set_gauge("debouncer.pending", len(self._pending))
+        if due:
+            metrics.increment("debouncer.delivered", len(due))
+            self.on_fire(due)
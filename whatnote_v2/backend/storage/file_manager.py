@@ -2,9 +2,12 @@ import os
 import json
 import shutil
 from pathlib import Path
-from config import DATA_DIR
+from config import DATA_DIR, METADATA_BACKEND, METADATA_DB_FILE, METADATA_SIDECAR_EXPORT
 from typing import Dict, List, Optional
 from datetime import datetime
+from .board_index import BoardIndex
+from .metadata_store import SqliteMetadataStore
+from .atomic_write import atomic_write_json
 
 class FileSystemManager:
     def __init__(self, data_dir: str | Path = None):
@@ -12,6 +15,16 @@ class FileSystemManager:
         self.data_dir = Path(data_dir) if data_dir else Path(DATA_DIR)
         self.courses_dir = self.data_dir / "courses"
         self._ensure_directories()
+        self.board_index = BoardIndex(self.courses_dir)
+        # SQLite 元数据存储（可选）：课程、展板、窗口配置等保存在数据库中
+        db_file = self.data_dir / Path(METADATA_DB_FILE).name if data_dir else METADATA_DB_FILE
+        self.metadata = SqliteMetadataStore(db_file) if METADATA_BACKEND == "sqlite" else None
+        # 是否写出JSON配置文件（json 后端总是写出；sqlite 后端作为可读的导出）
+        self.write_json_files = self.metadata is None or METADATA_SIDECAR_EXPORT
+        if self.metadata and not self.metadata.get_meta("migrated_at"):
+            from .metadata_migrator import migrate_to_sqlite
+            counts = migrate_to_sqlite(self.metadata, self)
+            print(f"已将JSON元数据导入SQLite: {counts}")
     
     def _ensure_directories(self):
         """确保基础目录存在"""
@@ -32,8 +45,7 @@ class FileSystemManager:
             "boards": []
         }
         
-        with open(course_dir / "course_info.json", "w", encoding="utf-8") as f:
-            json.dump(course_info, f, ensure_ascii=False, indent=2)
+        self._save_course_info(course_dir, course_info)
         
         return course_info
     
@@ -65,30 +77,49 @@ class FileSystemManager:
             "windows": []
         }
         
-        with open(board_dir / "board_info.json", "w", encoding="utf-8") as f:
-            json.dump(board_info, f, ensure_ascii=False, indent=2)
+        if self.metadata:
+            self.metadata.put_board(board_info)
+        if self.write_json_files:
+            atomic_write_json(board_dir / "board_info.json", board_info, kind="board_info")
+        
+        self.board_index.add(board_id, board_dir)
         
         # 更新课程信息
         self._update_course_boards(course_id, board_id)
         
         return board_info
     
-    def _update_course_boards(self, course_id: str, board_id: str):
-        """更新课程信息中的展板列表"""
-        course_info_path = self.courses_dir / course_id / "course_info.json"
+    def _load_course_info(self, course_dir: Path) -> Optional[Dict]:
+        """读取课程信息（sqlite 后端从数据库读取）"""
+        if self.metadata:
+            return self.metadata.get_course(course_dir.name)
+        course_info_path = course_dir / "course_info.json"
         if course_info_path.exists():
             with open(course_info_path, "r", encoding="utf-8") as f:
-                course_info = json.load(f)
-            
+                return json.load(f)
+        return None
+    
+    def _save_course_info(self, course_dir: Path, course_info: Dict):
+        """保存课程信息（数据库和/或 course_info.json）"""
+        if self.metadata:
+            self.metadata.put_course(course_info)
+        if self.write_json_files:
+            atomic_write_json(course_dir / "course_info.json", course_info, kind="course_info")
+    
+    def _update_course_boards(self, course_id: str, board_id: str):
+        """更新课程信息中的展板列表"""
+        course_dir = self.courses_dir / course_id
+        course_info = self._load_course_info(course_dir)
+        if course_info:
             if board_id not in course_info["boards"]:
                 course_info["boards"].append(board_id)
                 course_info["updated_at"] = datetime.now().isoformat()
-                
-                with open(course_info_path, "w", encoding="utf-8") as f:
-                    json.dump(course_info, f, ensure_ascii=False, indent=2)
+                self._save_course_info(course_dir, course_info)
     
     def get_courses(self) -> List[Dict]:
         """获取所有课程"""
+        if self.metadata:
+            return self.metadata.list_courses()
         courses = []
         for course_dir in self.courses_dir.iterdir():
             if course_dir.is_dir():
@@ -100,6 +131,8 @@ class FileSystemManager:
     
     def get_boards(self, course_id: str) -> List[Dict]:
         """获取课程的所有展板"""
+        if self.metadata:
+            return self.metadata.list_boards(course_id)
         course_dir = self.courses_dir / course_id
         if not course_dir.exists():
             return []
@@ -113,40 +146,40 @@ class FileSystemManager:
                         boards.append(json.load(f))
         return boards
     
+    def get_board_dir(self, board_id: str) -> Optional[Path]:
+        """通过展板索引定位展板目录"""
+        return self.board_index.resolve(board_id)
+    
     def get_board_info(self, board_id: str) -> Optional[Dict]:
         """获取展板信息"""
-        for course_dir in self.courses_dir.iterdir():
-            if course_dir.is_dir():
-                board_dir = course_dir / board_id
-                if board_dir.exists():
-                    board_info_path = board_dir / "board_info.json"
-                    if board_info_path.exists():
-                        with open(board_info_path, "r", encoding="utf-8") as f:
-                            return json.load(f)
+        if self.metadata:
+            return self.metadata.get_board(board_id)
+        board_dir = self.get_board_dir(board_id)
+        if board_dir:
+            board_info_path = board_dir / "board_info.json"
+            if board_info_path.exists():
+                with open(board_info_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
         return None
     
     def delete_board(self, board_id: str) -> bool:
         """删除展板文件夹"""
-        for course_dir in self.courses_dir.iterdir():
-            if course_dir.is_dir():
-                board_dir = course_dir / board_id
-                if board_dir.exists():
-                    shutil.rmtree(board_dir)
-                    # 更新课程信息
-                    self._remove_board_from_course(course_dir, board_id)
-                    return True
+        board_dir = self.get_board_dir(board_id)
+        if board_dir and board_dir.exists():
+            shutil.rmtree(board_dir)
+            self.board_index.remove(board_id)
+            if self.metadata:
+                self.metadata.delete_board(board_id)
+            # 更新课程信息
+            self._remove_board_from_course(board_dir.parent, board_id)
+            return True
         return False
     
     def _remove_board_from_course(self, course_dir: Path, board_id: str):
         """从课程信息中移除展板"""
-        course_info_path = course_dir / "course_info.json"
-        if course_info_path.exists():
-            with open(course_info_path, "r", encoding="utf-8") as f:
-                course_info = json.load(f)
-            
+        course_info = self._load_course_info(course_dir)
+        if course_info:
             if board_id in course_info["boards"]:
                 course_info["boards"].remove(board_id)
                 course_info["updated_at"] = datetime.now().isoformat()
-                
-                with open(course_info_path, "w", encoding="utf-8") as f:
-                    json.dump(course_info, f, ensure_ascii=False, indent=2) 
\ No newline at end of file
+                self._save_course_info(course_dir, course_info)
\ No newline at end of file
@@ -1,6 +1,8 @@
 """
 文件监控服务
-使用 watchdog 监控文件系统变化，并通过 WebSocket 通知前端
+使用 watchdog 监控文件系统变化，并通过 WebSocket 通知前端。
+同一展板在 WATCHER_BATCH_WINDOW 内的事件先合并为净变化再处理，每个展板每批只发送一条 board_changes 消息。
+ContentManager 登记过写入意图的路径（服务端自己的写入）上的事件在 watchdog 线程中直接丢弃
 """
 
 import os
@@ -15,54 +17,45 @@ from datetime import datetime
 import re
 import time
 
+import metrics
+from config import (
+    WATCHER_BATCH_WINDOW,
+    WATCHER_DEBOUNCE_DEFAULT,
+    WATCHER_DEBOUNCE_DELAYS,
+    WATCHER_DEBOUNCE_MAX_PENDING,
+    WATCHER_DEBOUNCE_MAX_WAIT,
+)
+from .async_storage import AsyncStorage, StorageExecutor
+from .atomic_write import is_temp_path
+from .debouncer import Debouncer
+from .change_set import ChangeSet, CHANGE_CREATED, CHANGE_DELETED, CHANGE_MODIFIED, CHANGE_MOVED
+
 class FileWatcherHandler(FileSystemEventHandler):
     def __init__(self, file_watcher):
         super().__init__()
         self.file_watcher = file_watcher
         
     def on_created(self, event):
-        if not event.is_directory:
-            try:
-                if self.file_watcher.loop and self.file_watcher.loop.is_running():
-                    asyncio.run_coroutine_threadsafe(
-                        self.file_watcher.handle_file_created(event.src_path), 
-                        self.file_watcher.loop
-                    )
-            except Exception as e:
-                print(f"处理文件创建事件失败: {e}")
+        if event.is_directory:
+            self.file_watcher.handle_directory_event('created', event.src_path)
+        else:
+            self.file_watcher.enqueue_event('created', event.src_path)
     
     def on_modified(self, event):
         if not event.is_directory:
-            try:
-                if self.file_watcher.loop and self.file_watcher.loop.is_running():
-                    asyncio.run_coroutine_threadsafe(
-                        self.file_watcher.handle_file_modified(event.src_path), 
-                        self.file_watcher.loop
-                    )
-            except Exception as e:
-                print(f"处理文件修改事件失败: {e}")
+            self.file_watcher.enqueue_event('modified', event.src_path)
     
     def on_deleted(self, event):
-        if not event.is_directory:
-            try:
-                if self.file_watcher.loop and self.file_watcher.loop.is_running():
-                    asyncio.run_coroutine_threadsafe(
-                        self.file_watcher.handle_file_deleted(event.src_path), 
-                        self.file_watcher.loop
-                    )
-            except Exception as e:
-                print(f"处理文件删除事件失败: {e}")
+        if event.is_directory:
+            self.file_watcher.handle_directory_event('deleted', event.src_path)
+        else:
+            self.file_watcher.enqueue_event('deleted', event.src_path)
     
     def on_moved(self, event):
-        if not event.is_directory:
-            try:
-                if self.file_watcher.loop and self.file_watcher.loop.is_running():
-                    asyncio.run_coroutine_threadsafe(
-                        self.file_watcher.handle_file_moved(event.src_path, event.dest_path), 
-                        self.file_watcher.loop
-                    )
-            except Exception as e:
-                print(f"处理文件移动事件失败: {e}")
+        if event.is_directory:
+            self.file_watcher.handle_directory_event('moved', event.src_path, event.dest_path)
+        else:
+            self.file_watcher.enqueue_event('moved', event.src_path, event.dest_path)
 
 class FileWatcher:
     def __init__(self, data_dir: Path, websocket_manager):
@@ -72,11 +65,22 @@ class FileWatcher:
         self.watched_paths = set()
         self.file_manager = None
         self.content_manager = None
+        self.async_content_manager = None
+        self.orphan_reconciler = None
         self.loop = None
         
-        # 防抖机制：避免频繁的文件修改通知
-        self.modified_files = {}  # 存储文件路径和最后修改时间
-        self.debounce_delay = 2.0  # 2秒防抖延迟
+        # 事件合并：board_id -> 等待处理的 ChangeSet（只在事件循环线程中访问）
+        self.batch_window = WATCHER_BATCH_WINDOW
+        self._pending_changes: Dict[str, ChangeSet] = {}
+        # 正在处理的批次中收集的通知：board_id -> 消息列表
+        self._batch_messages: Dict[str, List[Dict]] = {}
+        
+        # 文件修改通知的尾沿防抖：连续修改只在最后一次修改后通知一次
+        self.content_change_debouncer = Debouncer(
+            self._deliver_content_changes,
+            max_wait=WATCHER_DEBOUNCE_MAX_WAIT,
+            max_pending=WATCHER_DEBOUNCE_MAX_PENDING,
+        )
         
         # 支持的文件类型映射
         self.file_type_mapping = {
@@ -103,10 +107,12 @@ class FileWatcher:
             '.pdf': 'pdf'
         }
     
-    def set_managers(self, file_manager, content_manager):
-        """设置文件管理器和内容管理器"""
+    def set_managers(self, file_manager, content_manager, orphan_reconciler=None, async_content_manager=None):
+        """设置文件管理器、内容管理器、孤立文件补建服务和内容管理器的异步代理（在存储线程池中执行调用）"""
         self.file_manager = file_manager
         self.content_manager = content_manager
+        self.orphan_reconciler = orphan_reconciler
+        self.async_content_manager = async_content_manager or AsyncStorage(content_manager, StorageExecutor())
     
     def start_watching(self):
         """开始监控文件系统"""
@@ -130,6 +136,7 @@ class FileWatcher:
         """停止监控文件系统"""
         self.observer.stop()
         self.observer.join()
+        self.content_change_debouncer.flush()
         print("文件监控服务已停止")
     
     def _watch_course_directory(self, course_dir: Path):
@@ -146,6 +153,148 @@ class FileWatcher:
         if course_dir.exists():
             self._watch_course_directory(course_dir)
     
+    def handle_directory_event(self, event_type: str, src_path: str, dest_path: str = None):
+        """处理目录事件，保持展板索引与磁盘同步（在watchdog线程中直接调用）"""
+        if not self.file_manager:
+            return
+        
+        try:
+            board_index = self.file_manager.board_index
+            courses_dir = self.file_manager.courses_dir
+            src = Path(src_path)
+            
+            # 课程目录被移动或删除：其下所有展板路径都失效，直接重建
+            if src.parent == courses_dir and event_type in ('deleted', 'moved'):
+                board_index.rebuild()
+                return
+            
+            if event_type == 'moved':
+                dest = Path(dest_path)
+                src_is_board = src.parent.parent == courses_dir and src.name.startswith('board-')
+                dest_is_board = dest.parent.parent == courses_dir and dest.name.startswith('board-')
+                if src_is_board or dest_is_board:
+                    board_index.move(src, dest)
+                    print(f"展板目录移动: {src.name} -> {dest}")
+                return
+            
+            if not (src.parent.parent == courses_dir and src.name.startswith('board-')):
+                return
+            
+            if event_type == 'created':
+                board_index.add(src.name, src)
+                print(f"检测到新展板目录: {src.name}")
+            elif event_type == 'deleted':
+                board_index.remove(src.name)
+                if self.content_manager:
+                    self.content_manager.window_index.unregister_board(src.name)
+                    self.content_manager.window_cache.invalidate(src.name)
+                print(f"检测到展板目录删除: {src.name}")
+        except Exception as e:
+            print(f"处理目录事件失败: {e}")
+    
+    def enqueue_event(self, event_type: str, src_path: str, dest_path: str = None):
+        """在watchdog线程中调用：丢弃服务端自己的写入，其余事件交给事件循环合并"""
+        if is_temp_path(src_path):
+            # 原子写入的临时文件：只关心最后的 rename，按目标文件被修改处理
+            if event_type != 'moved' or not dest_path or is_temp_path(dest_path):
+                return
+            event_type, src_path, dest_path = 'modified', dest_path, None
+        elif dest_path and is_temp_path(dest_path):
+            return
+        if self._is_own_write(src_path, dest_path):
+            return
+        try:
+            if self.loop and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self._add_event, event_type, src_path, dest_path)
+        except Exception as e:
+            print(f"处理文件{event_type}事件失败: {e}")
+    
+    def _is_own_write(self, src_path: str, dest_path: Optional[str]) -> bool:
+        if not self.content_manager:
+            return False
+        write_intents = self.content_manager.write_intents
+        if not write_intents.is_own_write(src_path):
+            return False
+        return dest_path is None or write_intents.is_own_write(dest_path)
+    
+    def _add_event(self, event_type: str, src_path: str, dest_path: Optional[str]):
+        """把事件加入所属展板的 ChangeSet，展板的第一个事件启动合并计时"""
+        src_info = self._parse_file_path(src_path)
+        if event_type == 'moved':
+            dest_info = self._parse_file_path(dest_path)
+            if src_info and dest_info and src_info['board_id'] == dest_info['board_id']:
+                self._change_set(src_info).moved(src_info['filename'], dest_info['filename'])
+            else:
+                # 移入或移出展板的 files 目录（如跨展板移动、移入回收站）：按删除 + 创建处理
+                if src_info:
+                    self._change_set(src_info).deleted(src_info['filename'])
+                if dest_info:
+                    self._change_set(dest_info).created(dest_info['filename'])
+            return
+        
+        if not src_info:
+            return
+        change_set = self._change_set(src_info)
+        getattr(change_set, event_type)(src_info['filename'])
+    
+    def _change_set(self, path_info: Dict) -> ChangeSet:
+        board_id = path_info['board_id']
+        change_set = self._pending_changes.get(board_id)
+        if change_set is None:
+            change_set = self._pending_changes[board_id] = ChangeSet(path_info['file_path'].parent)
+            self.loop.call_later(self.batch_window, self._start_flush, board_id)
+        return change_set
+    
+    def _start_flush(self, board_id: str):
+        self.loop.create_task(self.flush_board(board_id))
+    
+    async def flush_board(self, board_id: str):
+        """处理展板的一批事件：逐个处理净变化，收集到的通知合并为一条消息发送"""
+        change_set = self._pending_changes.pop(board_id, None)
+        if change_set is None:
+            return
+        
+        changes = change_set.changes()
+        metrics.increment("file_watcher.raw_events", change_set.raw_events)
+        metrics.increment("file_watcher.net_changes", len(changes))
+        metrics.increment("file_watcher.batches")
+        if not changes:
+            return
+        
+        files_dir = change_set.files_dir
+        self._batch_messages[board_id] = []
+        try:
+            for change in changes:
+                try:
+                    kind, name = change[0], change[1]
+                    if kind == CHANGE_DELETED:
+                        await self.handle_file_deleted(str(files_dir / name))
+                    elif kind == CHANGE_MOVED:
+                        await self.handle_file_moved(str(files_dir / name), str(files_dir / change[2]))
+                    elif kind == CHANGE_CREATED:
+                        await self.handle_file_created(str(files_dir / name))
+                    elif kind == CHANGE_MODIFIED:
+                        await self.handle_file_modified(str(files_dir / name))
+                except Exception as e:
+                    print(f"处理文件变化失败 {change}: {e}")
+        finally:
+            messages = self._batch_messages.pop(board_id, [])
+        
+        await self._publish_changes(board_id, messages)
+    
+    async def _publish_changes(self, board_id: str, messages: List[Dict]):
+        """把同一展板的多条通知合并为一条 board_changes 消息发送"""
+        if not messages or not self.websocket_manager:
+            return
+        batch = {
+            'type': 'board_changes',
+            'board_id': board_id,
+            'changes': messages,
+            'timestamp': datetime.now().isoformat()
+        }
+        await self.websocket_manager.publish(json.dumps(batch), board_id=board_id)
+        metrics.increment("file_watcher.batches_sent")
+    
     def _parse_file_path(self, file_path: str) -> Optional[Dict]:
         """解析文件路径，提取课程ID、展板ID等信息"""
         path = Path(file_path)
@@ -202,8 +351,14 @@ class FileWatcher:
         return safe_name.strip(' ') if safe_name.strip(' ') else "未命名"
     
     def _generate_window_id(self) -> str:
-        """生成新的窗口ID"""
-        return f"window_{int(datetime.now().timestamp() * 1000)}"
+        """生成新的窗口ID（同一毫秒内创建多个窗口时追加序号）"""
+        timestamp = int(datetime.now().timestamp() * 1000)
+        window_id = f"window_{timestamp}"
+        suffix = 1
+        while self.content_manager and self.content_manager.window_index.lookup(window_id):
+            window_id = f"window_{timestamp}_{suffix}"
+            suffix += 1
+        return window_id
     
     async def handle_file_created(self, file_path: str):
         """处理文件创建事件"""
@@ -212,14 +367,11 @@ class FileWatcher:
             return
         
         print(f"检测到新文件: {path_info['filename']}")
+        self._invalidate_window_cache(path_info)
         
-        # 忽略临时文件（以_temp_开头的文件）
-        if path_info['filename'].startswith('_temp_'):
-            print(f"临时文件 {path_info['filename']}，跳过窗口创建")
-            return
-        
-        # 如果是JSON配置文件，不需要创建窗口
+        # 如果是JSON配置文件，不需要创建窗口，只同步窗口索引
         if path_info['filename'].endswith('.json'):
+            self._sync_window_index(path_info)
             print(f"JSON配置文件 {path_info['filename']}，跳过窗口创建")
             return
         
@@ -230,30 +382,33 @@ class FileWatcher:
         
         # 只为真正的"孤立文件"创建窗口（用户直接拖拽到文件夹的文件）
         await self._create_window_for_file(path_info)
+        self._schedule_orphan_reconcile(path_info)
     
     async def handle_file_modified(self, file_path: str):
-        """处理文件修改事件（带防抖机制）"""
+        """处理文件修改事件：缓存和索引立即更新，内容变化通知经过尾沿防抖"""
         path_info = self._parse_file_path(file_path)
         if not path_info:
             return
         
-        current_time = time.time()
-        file_path_str = str(file_path)
-        
-        # 检查是否需要防抖
-        if file_path_str in self.modified_files:
-            last_modified = self.modified_files[file_path_str]
-            if current_time - last_modified < self.debounce_delay:
-                # 还在防抖期内，忽略此次修改
-                return
-        
-        # 更新最后修改时间
-        self.modified_files[file_path_str] = current_time
+        self._invalidate_window_cache(path_info)
+        if path_info['filename'].endswith('.json'):
+            self._sync_window_index(path_info)
         
         print(f"检测到文件修改: {path_info['filename']}")
-        
-        # 通知前端刷新对应窗口内容
-        await self._notify_file_content_changed(path_info)
+        self.content_change_debouncer.touch(str(path_info['file_path']), self._debounce_delay(path_info['filename']),
+                                            path_info)
+    
+    def _debounce_delay(self, filename: str) -> float:
+        """按扩展名取防抖延迟"""
+        return WATCHER_DEBOUNCE_DELAYS.get(Path(filename).suffix.lower(), WATCHER_DEBOUNCE_DEFAULT)
+    
+    def _deliver_content_changes(self, due):
+        """防抖到期：按展板把内容变化通知合并发送（在事件循环线程中调用）"""
+        by_board: Dict[str, List[Dict]] = {}
+        for _, path_info in due:
+            by_board.setdefault(path_info['board_id'], []).append(self._content_changed_message(path_info))
+        for board_id, messages in by_board.items():
+            asyncio.ensure_future(self._publish_changes(board_id, messages))
     
     async def handle_file_deleted(self, file_path: str):
         """处理文件删除事件"""
@@ -262,15 +417,32 @@ class FileWatcher:
             return
         
         print(f"检测到文件删除: {path_info['filename']}")
+        self._invalidate_window_cache(path_info)
+        
+        if path_info['filename'].endswith('.json'):
+            self._sync_window_index(path_info, deleted=True)
         
         # 删除对应的窗口
         await self._delete_window_for_file(path_info)
+        self._schedule_orphan_reconcile(path_info)
     
     async def handle_file_moved(self, old_path: str, new_path: str):
         """处理文件移动/重命名事件"""
         old_path_info = self._parse_file_path(old_path)
         new_path_info = self._parse_file_path(new_path)
         
+        for path_info in (old_path_info, new_path_info):
+            if path_info:
+                self._invalidate_window_cache(path_info)
+        
+        if old_path_info and old_path_info['filename'].endswith('.json'):
+            self._sync_window_index(old_path_info, deleted=True)
+        if new_path_info and new_path_info['filename'].endswith('.json'):
+            self._sync_window_index(new_path_info)
+        
+        if new_path_info:
+            self._schedule_orphan_reconcile(new_path_info)
+        
         if not (old_path_info and new_path_info):
             return
         
@@ -279,60 +451,48 @@ class FileWatcher:
         # 更新对应窗口的标题
         await self._rename_window_for_file(old_path_info, new_path_info)
     
+    def _sync_window_index(self, path_info: Dict, deleted: bool = False):
+        """JSON配置文件变化时同步窗口索引（sqlite 后端同时同步数据库）"""
+        if not self.content_manager:
+            return
+        if deleted:
+            self.content_manager.sync_window_sidecar(path_info['board_id'], path_info['file_path'], deleted=True)
+        elif path_info['file_path'].exists():
+            self.content_manager.sync_window_sidecar(path_info['board_id'], path_info['file_path'])
+    
+    def _schedule_orphan_reconcile(self, path_info: Dict):
+        """文件增删改名后，交给后台任务检查该展板的孤立文件"""
+        if self.orphan_reconciler:
+            self.orphan_reconciler.schedule(path_info['board_id'])
+    
+    def _invalidate_window_cache(self, path_info: Dict):
+        """文件变化时使对应窗口的快照缓存失效（内容文件对应同名的 .json 配置文件）"""
+        if not self.content_manager:
+            return
+        filename = path_info['filename']
+        sidecar = filename if filename.endswith('.json') else f"{filename}.json"
+        self.content_manager.window_cache.invalidate(path_info['board_id'], sidecar)
+    
     def _window_exists_for_file(self, board_id: str, filename: str) -> bool:
-        """检查是否已存在对应文件的窗口"""
+        """检查是否已存在对应文件的窗口（查窗口索引的反向映射，不扫描展板下的JSON配置文件）"""
         if not self.content_manager:
             return False
         
+        # JSON文件本身总是被认为有对应的窗口
+        if filename.endswith('.json'):
+            return True
+        
+        window_index = self.content_manager.window_index
+        if window_index.window_for_file(board_id, filename):
+            return True
+        # 按命名规则（xxx.ext.json）对应的配置文件
+        if window_index.window_for_sidecar(board_id, f"{filename}.json"):
+            return True
+        
+        # 配置文件可能刚写入、还没有被索引（与内容文件在同一批事件中创建）
         try:
-            # 检查是否已存在对应的JSON配置文件
-            filename_without_ext = Path(filename).stem
-            
-            # 找到展板目录
-            board_dir = None
-            for course_dir in self.content_manager.file_manager.courses_dir.iterdir():
-                if course_dir.is_dir():
-                    potential_board_dir = course_dir / board_id
-                    if potential_board_dir.exists():
-                        board_dir = potential_board_dir
-                        break
-            
-            if not board_dir:
-                return False
-            
-            files_dir = board_dir / "files"
-            if not files_dir.exists():
-                return False
-            
-            # 检查是否已有对应的JSON配置文件（新命名规则：xxx.ext.json 或 xxx.md.json）
-            # 方法1：检查 filename.json（旧格式）
-            json_file_old = files_dir / f"{filename}.json"
-            if json_file_old.exists():
-                return True
-            
-            # 方法2：检查 filename.md.json（新格式，适用于文本文件）
-            if filename.endswith('.md'):
-                json_file_new = files_dir / f"{filename}.md.json"
-                if json_file_new.exists():
-                    return True
-            
-            # 方法3：扫描所有JSON文件，检查是否有匹配的file_path
-            for json_file in files_dir.glob("*.json"):
-                try:
-                    with open(json_file, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    file_path = data.get("file_path", "")
-                    if file_path == f"files/{filename}":
-                        print(f"找到匹配的窗口配置: {json_file.name} -> {filename}")
-                        return True
-                except Exception:
-                    continue
-            
-            # 如果是JSON文件本身，检查是否有对应的实际文件
-            if filename.endswith('.json'):
-                return True  # JSON文件总是被认为有对应的窗口
-            
-            return False
+            board_dir = self.content_manager.file_manager.get_board_dir(board_id)
+            return bool(board_dir) and (board_dir / "files" / f"{filename}.json").exists()
         except Exception as e:
             print(f"检查窗口存在性失败: {e}")
             return False
@@ -370,7 +530,7 @@ class FileWatcher:
             
             # 保存窗口数据
             if self.content_manager:
-                success = self.content_manager.save_window_content(path_info['board_id'], window_data)
+                success = await self.async_content_manager.save_window_content(path_info['board_id'], window_data)
                 if success:
                     print(f"成功为文件 {path_info['filename']} 创建窗口: {window_id}")
                     
@@ -382,15 +542,14 @@ class FileWatcher:
         except Exception as e:
             print(f"创建窗口失败: {e}")
     
-    async def _notify_file_content_changed(self, path_info: Dict):
-        """通知前端文件内容已变化"""
-        message = {
+    def _content_changed_message(self, path_info: Dict) -> Dict:
+        """文件内容已变化的通知"""
+        return {
             'type': 'file_content_changed',
             'board_id': path_info['board_id'],
             'filename': path_info['filename'],
             'timestamp': datetime.now().isoformat()
         }
-        await self._broadcast_message(message)
     
     async def _notify_window_created(self, board_id: str, window_data: Dict):
         """通知前端有新窗口创建"""
@@ -414,14 +573,14 @@ class FileWatcher:
                 return
             
             # 查找对应的窗口
-            windows = self.content_manager.get_board_windows(path_info['board_id'])
+            windows = await self.async_content_manager.get_board_windows(path_info['board_id'])
             filename_without_ext = Path(path_info['filename']).stem
             
             for window in windows:
                 if window.get('title') == filename_without_ext:
                     window_id = window.get('id')
                     # 删除窗口
-                    success = self.content_manager.delete_window_content(path_info['board_id'], window_id)
+                    success = await self.async_content_manager.delete_window_content(path_info['board_id'], window_id)
                     if success:
                         print(f"成功删除文件 {path_info['filename']} 对应的窗口: {window_id}")
                         
@@ -442,13 +601,7 @@ class FileWatcher:
                 base_name = json_filename[:-5]
                 
                 # 找到展板目录
-                board_dir = None
-                for course_dir in self.content_manager.file_manager.courses_dir.iterdir():
-                    if course_dir.is_dir():
-                        potential_board_dir = course_dir / path_info['board_id']
-                        if potential_board_dir.exists():
-                            board_dir = potential_board_dir
-                            break
+                board_dir = self.content_manager.file_manager.get_board_dir(path_info['board_id'])
                 
                 if not board_dir:
                     return
@@ -468,7 +621,7 @@ class FileWatcher:
                 
                 # 没有找到转换后的文件，说明是真正的删除
                 # 但是我们也需要检查对应的窗口ID是否仍然存在
-                windows = self.content_manager.get_board_windows(path_info['board_id'])
+                windows = await self.async_content_manager.get_board_windows(path_info['board_id'])
                 
                 # 从JSON文件内容中获取窗口ID（如果可能的话）
                 # 由于文件已经被删除，我们只能通过标题匹配
@@ -482,7 +635,8 @@ class FileWatcher:
                             if (content_file.name.startswith(base_name) and 
                                 not content_file.name.endswith('.json')):
                                 try:
-                                    content_file.unlink()
+                                    with self.content_manager.write_intents.writing(content_file):
+                                        content_file.unlink()
                                     print(f"删除内容文件: {content_file}")
                                 except:
                                     pass
@@ -516,7 +670,7 @@ class FileWatcher:
                                 print(f"处理PDF pages文件夹失败: {e}")
                         
                         # 删除窗口
-                        success = self.content_manager.delete_window_content(path_info['board_id'], window_id)
+                        success = await self.async_content_manager.delete_window_content(path_info['board_id'], window_id)
                         if success:
                             print(f"成功删除文件 {json_filename} 对应的窗口: {window_id}")
                             await self._notify_window_deleted(path_info['board_id'], window_id)
@@ -542,7 +696,7 @@ class FileWatcher:
                 return
             
             # 查找对应的窗口
-            windows = self.content_manager.get_board_windows(old_path_info['board_id'])
+            windows = await self.async_content_manager.get_board_windows(old_path_info['board_id'])
             old_filename_without_ext = Path(old_path_info['filename']).stem
             new_filename_without_ext = Path(new_path_info['filename']).stem
             
@@ -555,7 +709,7 @@ class FileWatcher:
                     window['file_path'] = new_path_info['relative_path']
                     
                     # 保存更新后的窗口数据
-                    success = self.content_manager.save_window_content(new_path_info['board_id'], window)
+                    success = await self.async_content_manager.save_window_content(new_path_info['board_id'], window)
                     if success:
                         print(f"成功重命名窗口: {old_filename_without_ext} -> {new_filename_without_ext}")
                         
@@ -578,6 +732,10 @@ class FileWatcher:
         await self._broadcast_message(message)
     
     async def _broadcast_message(self, message: Dict):
-        """广播消息给所有WebSocket连接"""
+        """把展板事件发送给订阅了该展板的WebSocket连接（批次处理中的事件先收集，批次结束后一起发送）"""
+        batch = self._batch_messages.get(message.get('board_id'))
+        if batch is not None:
+            batch.append(message)
+            return
         if self.websocket_manager:
-            await self.websocket_manager.broadcast(json.dumps(message))
+            await self.websocket_manager.publish(json.dumps(message), board_id=message.get('board_id'))
@@ -0,0 +1,143 @@
+"""
+元数据迁移
+在 JSON 配置文件和 SQLite 元数据存储之间转换：migrate_to_sqlite 把数据目录中的 course_info.json、board_info.json、
+窗口配置文件、icon_positions.json、trash_info.json 和对话文件导入数据库；export_json_files 把数据库内容写回 JSON 文件，
+使数据目录保持可直接阅读
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import TRASH_DIR
+from .atomic_write import atomic_write_json
+
+
+def _read_json(path: Path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"读取JSON文件失败: {path}, 错误: {e}")
+        return None
+
+
+def _write_json(path: Path, data, kind: str):
+    """导出的文件与 json 后端写入的文件一样原子替换，持久性按 kind 配置"""
+    atomic_write_json(path, data, kind=kind)
+
+
+def _iter_board_dirs(courses_dir: Path):
+    for course_dir in sorted(courses_dir.iterdir()):
+        if not course_dir.is_dir():
+            continue
+        for board_dir in sorted(course_dir.iterdir()):
+            if board_dir.is_dir() and board_dir.name.startswith("board-"):
+                yield course_dir, board_dir
+
+
+def migrate_to_sqlite(store, file_manager, trash_info_file: Optional[Path] = None) -> Dict[str, int]:
+    """把数据目录中的 JSON 元数据导入数据库（已有的行被覆盖），返回各类记录数"""
+    courses_dir = file_manager.courses_dir
+    trash_info_file = Path(trash_info_file) if trash_info_file else TRASH_DIR / "trash_info.json"
+    counts = {"courses": 0, "boards": 0, "windows": 0, "icon_positions": 0, "trash": 0, "conversations": 0}
+
+    with store.transaction() as conn:
+        for course_dir in sorted(courses_dir.iterdir()):
+            course_info = _read_json(course_dir / "course_info.json") if course_dir.is_dir() else None
+            if isinstance(course_info, dict) and course_info.get("id"):
+                store.put_course(course_info, conn=conn)
+                counts["courses"] += 1
+
+        for course_dir, board_dir in _iter_board_dirs(courses_dir):
+            board_id = board_dir.name
+            board_info_path = board_dir / "board_info.json"
+            board_info = _read_json(board_info_path) if board_info_path.exists() else None
+            if not isinstance(board_info, dict):
+                continue
+            board_info.setdefault("id", board_id)
+            board_info.setdefault("course_id", course_dir.name)
+            store.put_board(board_info, conn=conn)
+            counts["boards"] += 1
+
+            files_dir = board_dir / "files"
+            if files_dir.exists():
+                for json_file in sorted(files_dir.glob("*.json")):
+                    window_data = _read_json(json_file)
+                    if isinstance(window_data, dict) and window_data.get("id"):
+                        store.put_window(board_id, json_file.name, window_data, conn=conn)
+                        counts["windows"] += 1
+
+            icon_positions_file = board_dir / "icon_positions.json"
+            positions = _read_json(icon_positions_file) if icon_positions_file.exists() else None
+            if isinstance(positions, dict):
+                store.set_icon_positions(board_id, positions, conn=conn)
+                counts["icon_positions"] += len(positions)
+
+            conversations_dir = board_dir / "llm_conversations"
+            if conversations_dir.exists():
+                for conv_file in sorted(conversations_dir.glob("conv-*.json")):
+                    conversation = _read_json(conv_file)
+                    if not isinstance(conversation, dict) or not conversation.get("id"):
+                        continue
+                    conversation.setdefault("board_id", board_id)
+                    conn.execute("DELETE FROM conversation_messages WHERE conversation_id = ?", (conversation["id"],))
+                    store.put_conversation(conversation, conn=conn)
+                    store.append_messages(conversation["id"], conversation.get("messages") or [], conn=conn)
+                    counts["conversations"] += 1
+
+        trash_info = _read_json(trash_info_file) if trash_info_file.exists() else None
+        if isinstance(trash_info, list):
+            for item in trash_info:
+                if isinstance(item, dict) and item.get("id"):
+                    store.add_trash_item(item, conn=conn)
+                    counts["trash"] += 1
+
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_at', ?)",
+                     (datetime.now().isoformat(),))
+    return counts
+
+
+def export_json_files(store, file_manager, trash_info_file: Optional[Path] = None) -> Dict[str, int]:
+    """把数据库中的元数据写回 JSON 文件（与 json 后端的目录结构一致），返回各类记录数"""
+    courses_dir = file_manager.courses_dir
+    trash_info_file = Path(trash_info_file) if trash_info_file else TRASH_DIR / "trash_info.json"
+    counts = {"courses": 0, "boards": 0, "windows": 0, "icon_positions": 0, "trash": 0, "conversations": 0}
+
+    for course_info in store.list_courses():
+        course_dir = courses_dir / course_info["id"]
+        course_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(course_dir / "course_info.json", course_info, "course_info")
+        counts["courses"] += 1
+
+        for board_info in store.list_boards(course_info["id"]):
+            board_id = board_info["id"]
+            board_dir = course_dir / board_id
+            files_dir = board_dir / "files"
+            files_dir.mkdir(parents=True, exist_ok=True)
+            _write_json(board_dir / "board_info.json", board_info, "board_info")
+            counts["boards"] += 1
+
+            for sidecar, window_data in store.list_windows(board_id):
+                _write_json(files_dir / sidecar, window_data, "window_config")
+                counts["windows"] += 1
+
+            positions = store.get_icon_positions(board_id)
+            if positions:
+                _write_json(board_dir / "icon_positions.json", positions, "icon_positions")
+                counts["icon_positions"] += len(positions)
+
+            conversations = store.list_conversations(board_id)
+            if conversations:
+                conversations_dir = board_dir / "llm_conversations"
+                conversations_dir.mkdir(exist_ok=True)
+                for info in conversations:
+                    _write_json(conversations_dir / f"{info['id']}.json", store.get_conversation(info["id"]), "conversation")
+                    counts["conversations"] += 1
+
+    trash_info = store.list_trash()
+    trash_info_file.parent.mkdir(parents=True, exist_ok=True)
+    _write_json(trash_info_file, trash_info, "trash_info")
+    counts["trash"] = len(trash_info)
+    return counts
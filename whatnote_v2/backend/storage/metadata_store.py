@@ -0,0 +1,368 @@
+"""
+SQLite 元数据存储（可选后端，METADATA_BACKEND = "sqlite" 时启用）
+课程、展板、窗口配置、图标位置、回收站和对话记录保存在 WAL 模式的 SQLite 数据库中，按展板/窗口ID建立索引，
+查询不再需要扫描目录和逐个解析 JSON 文件。内容文件（.md、PDF、图片等）仍然保存在展板的 files 目录中。
+每个线程使用自己的连接，WAL 模式下读操作互不阻塞
+"""
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metrics
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS courses (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boards (
+    id TEXT PRIMARY KEY,
+    course_id TEXT NOT NULL,
+    name TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_boards_course ON boards(course_id);
+CREATE TABLE IF NOT EXISTS windows (
+    board_id TEXT NOT NULL,
+    sidecar TEXT NOT NULL,
+    window_id TEXT,
+    type TEXT,
+    file_path TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (board_id, sidecar)
+);
+CREATE INDEX IF NOT EXISTS idx_windows_window_id ON windows(window_id);
+CREATE INDEX IF NOT EXISTS idx_windows_file_path ON windows(board_id, file_path);
+CREATE TABLE IF NOT EXISTS icon_positions (
+    board_id TEXT NOT NULL,
+    window_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (board_id, window_id)
+);
+CREATE TABLE IF NOT EXISTS trash (
+    id TEXT PRIMARY KEY,
+    board_id TEXT,
+    deleted_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trash_deleted_at ON trash(deleted_at);
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    board_id TEXT NOT NULL,
+    title TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_board ON conversations(board_id, updated_at);
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    conversation_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (conversation_id, seq)
+);
+"""
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+class SqliteMetadataStore:
+    """元数据的 SQLite 存储，线程安全"""
+
+    def __init__(self, db_file: Path):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # executescript 会自行提交，不能放在事务中
+        self._connection().executescript(SCHEMA)
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                         (str(SCHEMA_VERSION),))
+
+    # ---------- 连接 ----------
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_file), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """写事务（BEGIN IMMEDIATE，出错回滚）"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        metrics.increment("metadata.transactions")
+
+    def _query(self, sql: str, params=()) -> List[tuple]:
+        metrics.increment("metadata.queries")
+        return self._connection().execute(sql, params).fetchall()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------- 元信息 ----------
+
+    def get_meta(self, key: str) -> Optional[str]:
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key: str, value: str):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ---------- 课程和展板 ----------
+
+    def put_course(self, course: Dict, conn: sqlite3.Connection = None):
+        params = (course["id"], course.get("name"), course.get("created_at"), course.get("updated_at"), _dumps(course))
+        sql = "INSERT OR REPLACE INTO courses (id, name, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)"
+        if conn is not None:
+            conn.execute(sql, params)
+            return
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def get_course(self, course_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM courses WHERE id = ?", (course_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def list_courses(self) -> List[Dict]:
+        return [json.loads(row[0]) for row in self._query("SELECT data FROM courses ORDER BY created_at")]
+
+    def put_board(self, board: Dict, conn: sqlite3.Connection = None):
+        params = (board["id"], board.get("course_id"), board.get("name"), board.get("created_at"),
+                  board.get("updated_at"), _dumps(board))
+        sql = "INSERT OR REPLACE INTO boards (id, course_id, name, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)"
+        if conn is not None:
+            conn.execute(sql, params)
+            return
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def get_board(self, board_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM boards WHERE id = ?", (board_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def list_boards(self, course_id: str) -> List[Dict]:
+        rows = self._query("SELECT data FROM boards WHERE course_id = ? ORDER BY created_at", (course_id,))
+        return [json.loads(row[0]) for row in rows]
+
+    def delete_board(self, board_id: str):
+        """删除展板及其窗口、图标位置和对话记录"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM boards WHERE id = ?", (board_id,))
+            conn.execute("DELETE FROM windows WHERE board_id = ?", (board_id,))
+            conn.execute("DELETE FROM icon_positions WHERE board_id = ?", (board_id,))
+            conn.execute("DELETE FROM conversation_messages WHERE conversation_id IN "
+                         "(SELECT id FROM conversations WHERE board_id = ?)", (board_id,))
+            conn.execute("DELETE FROM conversations WHERE board_id = ?", (board_id,))
+
+    # ---------- 窗口 ----------
+
+    def put_window(self, board_id: str, sidecar: str, window_data: Dict, conn: sqlite3.Connection = None):
+        params = (board_id, sidecar, window_data.get("id"), window_data.get("type"), window_data.get("file_path"),
+                  window_data.get("updated_at"), _dumps(window_data))
+        sql = ("INSERT OR REPLACE INTO windows (board_id, sidecar, window_id, type, file_path, updated_at, data) "
+               "VALUES (?, ?, ?, ?, ?, ?, ?)")
+        if conn is not None:
+            conn.execute(sql, params)
+            return
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def get_window(self, board_id: str, sidecar: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM windows WHERE board_id = ? AND sidecar = ?", (board_id, sidecar))
+        return json.loads(rows[0][0]) if rows else None
+
+    def find_window(self, window_id: str, board_id: str = None) -> Optional[Tuple[str, str, Dict]]:
+        """按窗口ID查找（可限定展板），返回 (board_id, 配置文件名, 窗口数据)"""
+        if board_id:
+            rows = self._query("SELECT board_id, sidecar, data FROM windows WHERE window_id = ? AND board_id = ? LIMIT 1",
+                               (window_id, board_id))
+        else:
+            rows = self._query("SELECT board_id, sidecar, data FROM windows WHERE window_id = ? LIMIT 1", (window_id,))
+        if not rows:
+            return None
+        board_id, sidecar, data = rows[0]
+        return board_id, sidecar, json.loads(data)
+
+    def list_windows(self, board_id: str) -> List[Tuple[str, Dict]]:
+        rows = self._query("SELECT sidecar, data FROM windows WHERE board_id = ? ORDER BY sidecar", (board_id,))
+        return [(sidecar, json.loads(data)) for sidecar, data in rows]
+
+    def list_sidecars(self, board_id: str) -> List[str]:
+        return [row[0] for row in self._query("SELECT sidecar FROM windows WHERE board_id = ?", (board_id,))]
+
+    def iter_all_windows(self) -> List[Tuple[str, str, Dict]]:
+        rows = self._query("SELECT board_id, sidecar, data FROM windows")
+        return [(board_id, sidecar, json.loads(data)) for board_id, sidecar, data in rows]
+
+    def delete_window(self, board_id: str, sidecar: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM windows WHERE board_id = ? AND sidecar = ?", (board_id, sidecar))
+
+    # ---------- 图标位置 ----------
+
+    def get_icon_positions(self, board_id: str) -> Dict:
+        rows = self._query("SELECT window_id, data FROM icon_positions WHERE board_id = ?", (board_id,))
+        return {window_id: json.loads(data) for window_id, data in rows}
+
+    def set_icon_positions(self, board_id: str, positions: Dict, conn: sqlite3.Connection = None):
+        """替换展板的全部图标位置"""
+        def write(conn):
+            conn.execute("DELETE FROM icon_positions WHERE board_id = ?", (board_id,))
+            conn.executemany("INSERT INTO icon_positions (board_id, window_id, data) VALUES (?, ?, ?)",
+                             [(board_id, window_id, _dumps(item)) for window_id, item in positions.items()])
+        if conn is not None:
+            write(conn)
+            return
+        with self.transaction() as conn:
+            write(conn)
+
+    def delete_icon_position(self, board_id: str, window_id: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM icon_positions WHERE board_id = ? AND window_id = ?", (board_id, window_id))
+
+    # ---------- 回收站 ----------
+
+    def list_trash(self) -> List[Dict]:
+        return [json.loads(row[0]) for row in self._query("SELECT data FROM trash ORDER BY rowid")]
+
+    def get_trash_item(self, trash_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM trash WHERE id = ?", (trash_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def add_trash_item(self, item: Dict, conn: sqlite3.Connection = None):
+        params = (item["id"], item.get("board_id"), item.get("deleted_at"), _dumps(item))
+        sql = "INSERT OR REPLACE INTO trash (id, board_id, deleted_at, data) VALUES (?, ?, ?, ?)"
+        if conn is not None:
+            conn.execute(sql, params)
+            return
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def delete_trash_item(self, trash_id: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM trash WHERE id = ?", (trash_id,))
+
+    def clear_trash(self):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM trash")
+
+    # ---------- 对话记录 ----------
+
+    def put_conversation(self, conversation: Dict, conn: sqlite3.Connection = None):
+        """保存对话的基本信息（消息单独保存，不在此处写入）"""
+        info = {k: v for k, v in conversation.items() if k != "messages"}
+        params = (info["id"], info.get("board_id"), info.get("title"), info.get("created_at"),
+                  info.get("updated_at"), _dumps(info))
+        sql = ("INSERT OR REPLACE INTO conversations (id, board_id, title, created_at, updated_at, data) "
+               "VALUES (?, ?, ?, ?, ?, ?)")
+        if conn is not None:
+            conn.execute(sql, params)
+            return
+        with self.transaction() as conn:
+            conn.execute(sql, params)
+
+    def get_conversation(self, conversation_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT data FROM conversations WHERE id = ?", (conversation_id,))
+        if not rows:
+            return None
+        conversation = json.loads(rows[0][0])
+        conversation["messages"] = [
+            json.loads(row[0]) for row in self._query(
+                "SELECT data FROM conversation_messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,)
+            )
+        ]
+        return conversation
+
+    def list_conversations(self, board_id: str) -> List[Dict]:
+        """展板的对话基本信息（含消息数），按更新时间倒序"""
+        rows = self._query(
+            "SELECT c.data, (SELECT COUNT(*) FROM conversation_messages m WHERE m.conversation_id = c.id) "
+            "FROM conversations c WHERE c.board_id = ? ORDER BY c.updated_at DESC", (board_id,)
+        )
+        conversations = []
+        for data, message_count in rows:
+            info = json.loads(data)
+            conversations.append({
+                "id": info.get("id"),
+                "title": info.get("title", "未命名对话"),
+                "created_at": info.get("created_at"),
+                "updated_at": info.get("updated_at"),
+                "message_count": message_count,
+            })
+        return conversations
+
+    def append_messages(self, conversation_id: str, messages: List[Dict], updated_at: str = None,
+                        conn: sqlite3.Connection = None):
+        """追加消息（不重写已有消息）"""
+        def write(conn):
+            row = conn.execute("SELECT COALESCE(MAX(seq), -1) FROM conversation_messages WHERE conversation_id = ?",
+                               (conversation_id,)).fetchone()
+            start = row[0] + 1
+            conn.executemany("INSERT INTO conversation_messages (conversation_id, seq, data) VALUES (?, ?, ?)",
+                             [(conversation_id, start + i, _dumps(message)) for i, message in enumerate(messages)])
+            if updated_at:
+                data_row = conn.execute("SELECT data FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+                if data_row:
+                    info = json.loads(data_row[0])
+                    info["updated_at"] = updated_at
+                    conn.execute("UPDATE conversations SET updated_at = ?, data = ? WHERE id = ?",
+                                 (updated_at, _dumps(info), conversation_id))
+        if conn is not None:
+            write(conn)
+            return
+        with self.transaction() as conn:
+            write(conn)
+
+    def delete_conversation(self, conversation_id: str):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM conversation_messages WHERE conversation_id = ?", (conversation_id,))
+            conn.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+
+    # ---------- 统计 ----------
+
+    def stats(self) -> Dict:
+        counts = {}
+        for table in ("courses", "boards", "windows", "icon_positions", "trash", "conversations",
+                      "conversation_messages"):
+            counts[table] = self._query(f"SELECT COUNT(*) FROM {table}")[0][0]
+        return {
+            "backend": "sqlite",
+            "db_file": str(self.db_file),
+            "db_bytes": self.db_file.stat().st_size if self.db_file.exists() else 0,
+            "migrated_at": self.get_meta("migrated_at"),
+            "rows": counts,
+        }
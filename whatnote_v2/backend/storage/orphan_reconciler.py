@@ -0,0 +1,158 @@
+"""
+孤立文件后台补建
+为 files 目录中没有 JSON 配置的文件补建窗口。由 FileWatcher 事件按展板触发，
+并定期全量巡检；同一展板的补建有最小间隔限制，读取接口不再写磁盘
+"""
+
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from config import ORPHAN_RECONCILE_MIN_INTERVAL, ORPHAN_RECONCILE_SETTLE_DELAY, ORPHAN_SWEEP_INTERVAL
+
+from .async_storage import AsyncStorage, StorageExecutor
+
+
+class OrphanReconciler:
+    """按展板调度的孤立文件补建任务"""
+
+    def __init__(self, file_manager, content_manager, websocket_manager, async_content_manager=None,
+                 min_interval: float = ORPHAN_RECONCILE_MIN_INTERVAL,
+                 settle_delay: float = ORPHAN_RECONCILE_SETTLE_DELAY,
+                 sweep_interval: float = ORPHAN_SWEEP_INTERVAL):
+        self.file_manager = file_manager
+        self.content_manager = content_manager
+        # 补建在存储线程池中执行（与 API 请求共享线程数上限和排队指标）
+        self.async_content_manager = async_content_manager or AsyncStorage(content_manager, StorageExecutor())
+        self.websocket_manager = websocket_manager
+        self.min_interval = min_interval
+        self.settle_delay = settle_delay
+        self.sweep_interval = sweep_interval
+
+        # board_id -> 最早执行时间
+        self._pending: Dict[str, float] = {}
+        # board_id -> 上次执行时间
+        self._last_run: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """在当前事件循环中启动补建任务和定期巡检"""
+        self._loop = asyncio.get_event_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            self._loop.create_task(self._worker()),
+            self._loop.create_task(self._sweep_loop()),
+        ]
+        print("孤立文件补建服务已启动")
+
+    async def stop(self):
+        """停止补建任务"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        print("孤立文件补建服务已停止")
+
+    def schedule(self, board_id: str):
+        """登记需要检查的展板（可在任意线程调用），同一展板的执行会被合并和限速"""
+        now = time.time()
+        with self._lock:
+            due = max(now + self.settle_delay, self._last_run.get(board_id, 0.0) + self.min_interval)
+            if board_id in self._pending:
+                due = min(due, self._pending[board_id])
+            self._pending[board_id] = due
+            metrics.set_gauge("orphan_reconciler.pending_boards", len(self._pending))
+        self._wake()
+
+    def _wake(self):
+        if self._loop is None or self._wakeup is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    def _pop_due_boards(self) -> Tuple[List[str], Optional[float]]:
+        """取出已到期的展板，并返回距离下一个到期展板的等待时间"""
+        now = time.time()
+        with self._lock:
+            due_boards = [board_id for board_id, due in self._pending.items() if due <= now]
+            for board_id in due_boards:
+                del self._pending[board_id]
+            next_due = min(self._pending.values()) if self._pending else None
+            metrics.set_gauge("orphan_reconciler.pending_boards", len(self._pending))
+        timeout = max(next_due - now, 0.0) if next_due is not None else None
+        return due_boards, timeout
+
+    async def _worker(self):
+        while True:
+            due_boards, timeout = self._pop_due_boards()
+            for board_id in due_boards:
+                try:
+                    await self.reconcile_board(board_id)
+                except Exception as e:
+                    print(f"补建孤立文件窗口失败: {board_id}, 错误: {e}")
+            if due_boards:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sweep_loop(self):
+        """定期巡检所有展板（也覆盖监控服务未运行期间放入的文件）"""
+        while True:
+            board_ids = [board_id for board_id, _ in self.file_manager.board_index.items()]
+            for board_id in board_ids:
+                self.schedule(board_id)
+            metrics.increment("orphan_reconciler.sweeps")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def reconcile_board(self, board_id: str) -> List[Dict]:
+        """检查单个展板并补建窗口，返回新创建的窗口"""
+        with self._lock:
+            self._last_run[board_id] = time.time()
+
+        with metrics.timer("orphan_reconciler.reconcile"):
+            created_windows = await self.async_content_manager.reconcile_orphaned_files(board_id)
+        metrics.increment("orphan_reconciler.runs")
+
+        if created_windows:
+            metrics.increment("orphan_reconciler.orphans_found", len(created_windows))
+            print(f"展板 {board_id} 补建了 {len(created_windows)} 个孤立文件窗口")
+            await self._notify_orphans_reconciled(board_id, created_windows)
+        return created_windows
+
+    async def _notify_orphans_reconciled(self, board_id: str, created_windows: List[Dict]):
+        """通知前端补建的窗口"""
+        if not self.websocket_manager:
+            return
+        timestamp = datetime.now().isoformat()
+        for window_data in created_windows:
+            await self.websocket_manager.publish(json.dumps({
+                'type': 'window_created',
+                'board_id': board_id,
+                'window_data': window_data,
+                'timestamp': timestamp
+            }), board_id=board_id)
+        await self.websocket_manager.publish(json.dumps({
+            'type': 'orphan_files_reconciled',
+            'board_id': board_id,
+            'count': len(created_windows),
+            'window_ids': [window_data['id'] for window_data in created_windows],
+            'timestamp': timestamp
+        }), board_id=board_id)
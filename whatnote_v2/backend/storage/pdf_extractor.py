@@ -0,0 +1,251 @@
+"""
+PDF文本提取
+按页区间把提取任务分发到进程池，每页保存为 pages/<pdf名>/<pdf名>_page_NNN.md。
+提取进度记录在同目录的 manifest.json 中（PDF哈希、总页数、每页状态和失败次数）：
+PDF 未变化时再次提取不做任何事，中断的提取从第一个缺失的页继续，
+提取失败的页在之后的提取中自动重试，直到失败 PDF_EXTRACT_MAX_ATTEMPTS 次；手动重新提取时总是重试
+"""
+
+import hashlib
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from config import PDF_EXTRACT_WORKERS, PDF_EXTRACT_PAGES_PER_TASK, PDF_EXTRACT_MAX_ATTEMPTS
+from .atomic_write import atomic_write_json, atomic_write_text
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+PAGE_DONE = "done"
+PAGE_ERROR = "error"
+
+
+def page_filename(pdf_name: str, page_number: int) -> str:
+    """第 page_number 页（从1开始）的MD文件名"""
+    return f"{pdf_name}_page_{page_number:03d}.md"
+
+
+def _render_page(pdf_name: str, title: str, page_number: int, total_pages: int, text: str) -> str:
+    md_content = f"# {pdf_name} - 第 {page_number} 页\n\n"
+    md_content += f"来源: {title}\n"
+    md_content += f"提取时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+    md_content += f"页码: {page_number}/{total_pages}\n\n"
+    md_content += "---\n\n"
+    if text.strip():
+        md_content += text.strip()
+    else:
+        md_content += "*此页面没有可提取的文本内容*"
+    return md_content
+
+
+def extract_page_range(pdf_path: str, pages_dir: str, pdf_name: str, title: str,
+                       page_numbers: List[int], total_pages: int) -> List[Tuple[int, str, Optional[str]]]:
+    """
+    提取指定页并写入MD文件（在子进程中执行，必须是模块级函数）
+
+    返回 [(页码, 状态, 错误信息)]
+    """
+    import pypdf
+
+    results = []
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = pypdf.PdfReader(file)
+        for page_number in page_numbers:
+            try:
+                text = pdf_reader.pages[page_number - 1].extract_text() or ""
+                page_file_path = Path(pages_dir) / page_filename(pdf_name, page_number)
+                atomic_write_text(page_file_path, _render_page(pdf_name, title, page_number, total_pages, text),
+                                  kind="pdf_page")
+                results.append((page_number, PAGE_DONE, None))
+            except Exception as e:
+                results.append((page_number, PAGE_ERROR, str(e)))
+    return results
+
+
+def _file_sha256(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _count_pages(pdf_path: Path) -> int:
+    import pypdf
+
+    with open(pdf_path, 'rb') as file:
+        return len(pypdf.PdfReader(file).pages)
+
+
+class PdfExtractor:
+    """带清单的增量PDF文本提取器"""
+
+    def __init__(self, max_workers: int = PDF_EXTRACT_WORKERS, pages_per_task: int = PDF_EXTRACT_PAGES_PER_TASK):
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        # 同一个PDF同时只允许一个提取任务
+        self._dir_locks: Dict[str, threading.Lock] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def _dir_lock(self, pdf_pages_dir: Path) -> threading.Lock:
+        with self._pool_lock:
+            return self._dir_locks.setdefault(str(pdf_pages_dir), threading.Lock())
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    @staticmethod
+    def load_manifest(pdf_pages_dir: Path) -> Optional[Dict]:
+        """读取提取清单，不存在或损坏返回None"""
+        try:
+            with open(pdf_pages_dir / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            return None
+        return manifest
+
+    @staticmethod
+    def _save_manifest(pdf_pages_dir: Path, manifest: Dict):
+        manifest["updated_at"] = datetime.now().isoformat()
+        atomic_write_json(pdf_pages_dir / MANIFEST_FILE, manifest, kind="pdf_manifest")
+
+    def _pending_pages(self, pdf_pages_dir: Path, pdf_name: str, manifest: Dict, retry_failed: bool = False) -> List[int]:
+        """
+        还需要提取的页：没有记录的页、记录为完成但文件丢失的页，以及失败次数未达到上限的页
+        （retry_failed 为True时失败的页全部重试）
+        """
+        attempts = manifest.setdefault("attempts", {})
+        pending = []
+        for page_number in range(1, manifest["page_count"] + 1):
+            status = manifest["pages"].get(str(page_number))
+            if status == PAGE_ERROR and not retry_failed \
+                    and attempts.get(str(page_number), 1) >= PDF_EXTRACT_MAX_ATTEMPTS:
+                continue
+            if status == PAGE_DONE and (pdf_pages_dir / page_filename(pdf_name, page_number)).exists():
+                continue
+            pending.append(page_number)
+        return pending
+
+    def _batches(self, pages: List[int]) -> List[List[int]]:
+        return [pages[i:i + self.pages_per_task] for i in range(0, len(pages), self.pages_per_task)]
+
+    def extract(self, pdf_file_path: Path, pdf_pages_dir: Path, title: str,
+                progress: Callable[[int, int, str], None] = None,
+                should_cancel: Callable[[], bool] = None, retry_failed: bool = False) -> Dict:
+        """
+        提取PDF文本到 pdf_pages_dir，返回
+        {"page_count", "extracted", "skipped", "failed", "cancelled", "manifest"}
+
+        每完成一批调用 progress(已处理页数, 总页数, 说明)；should_cancel() 返回True时
+        不再提交新的批次，已完成的页保留在清单中，下次提取从中断处继续。
+        retry_failed 为True时（手动重新提取）不论失败过几次都重试失败的页
+        """
+        pdf_file_path = Path(pdf_file_path)
+        pdf_pages_dir = Path(pdf_pages_dir)
+        pdf_name = pdf_file_path.stem
+
+        with self._dir_lock(pdf_pages_dir), metrics.timer("pdf_extract.run"):
+            pdf_pages_dir.mkdir(parents=True, exist_ok=True)
+            pdf_hash = _file_sha256(pdf_file_path)
+
+            manifest = self.load_manifest(pdf_pages_dir)
+            if not manifest or manifest.get("sha256") != pdf_hash:
+                # 新PDF或PDF内容已变化：重新建立清单，清理多余的旧页面
+                page_count = _count_pages(pdf_file_path)
+                if manifest:
+                    for page_number in range(page_count + 1, manifest.get("page_count", 0) + 1):
+                        stale_page = pdf_pages_dir / page_filename(pdf_name, page_number)
+                        if stale_page.exists():
+                            stale_page.unlink()
+                manifest = {
+                    "version": MANIFEST_VERSION,
+                    "pdf": pdf_file_path.name,
+                    "sha256": pdf_hash,
+                    "page_count": page_count,
+                    "pages": {},
+                    "errors": {},
+                    "attempts": {},
+                }
+                self._save_manifest(pdf_pages_dir, manifest)
+
+            page_count = manifest["page_count"]
+            pending = self._pending_pages(pdf_pages_dir, pdf_name, manifest, retry_failed)
+            skipped = page_count - len(pending)
+            metrics.increment("pdf_extract.pages_skipped", skipped)
+            if not pending:
+                metrics.increment("pdf_extract.noop")
+                print(f"PDF文本已是最新，跳过提取: {pdf_file_path.name} ({page_count} 页)")
+                if progress:
+                    progress(page_count, page_count, f"第 {page_count}/{page_count} 页")
+                return {"page_count": page_count, "extracted": 0, "skipped": skipped, "failed": 0,
+                        "cancelled": False, "manifest": manifest}
+
+            print(f"开始提取PDF文本: {pdf_file_path.name}，共 {page_count} 页，待提取 {len(pending)} 页（从第 {pending[0]} 页开始）")
+            args = (str(pdf_file_path), str(pdf_pages_dir), pdf_name, title)
+            batches = self._batches(pending)
+            extracted = failed = 0
+            cancelled = False
+
+            def record(results):
+                nonlocal extracted, failed
+                for page_number, status, error_message in results:
+                    manifest["pages"][str(page_number)] = status
+                    if status == PAGE_DONE:
+                        extracted += 1
+                        manifest["errors"].pop(str(page_number), None)
+                        manifest["attempts"].pop(str(page_number), None)
+                    else:
+                        failed += 1
+                        manifest["errors"][str(page_number)] = error_message
+                        manifest["attempts"][str(page_number)] = manifest["attempts"].get(str(page_number), 0) + 1
+                        print(f"提取第 {page_number} 页文本失败: {error_message}")
+                # 每完成一批就落盘，中断后可以从这里继续
+                self._save_manifest(pdf_pages_dir, manifest)
+                if progress:
+                    done = skipped + extracted + failed
+                    progress(done, page_count, f"第 {done}/{page_count} 页")
+
+            if should_cancel and should_cancel():
+                cancelled = True
+            elif len(batches) == 1:
+                # 页数少时直接在当前线程提取，省去进程间开销
+                record(extract_page_range(*args, batches[0], page_count))
+            else:
+                pool = self._get_pool()
+                futures = [pool.submit(extract_page_range, *args, batch, page_count) for batch in batches]
+                for future in as_completed(futures):
+                    record(future.result())
+                    if should_cancel and should_cancel():
+                        # 未开始的批次直接取消，正在执行的批次结果不再记录
+                        for pending_future in futures:
+                            pending_future.cancel()
+                        cancelled = True
+                        break
+
+            if cancelled:
+                metrics.increment("pdf_extract.cancelled")
+                print(f"PDF文本提取已取消: {pdf_file_path.name}，已完成 {skipped + extracted + failed}/{page_count} 页")
+
+            metrics.increment("pdf_extract.pages_extracted", extracted)
+            metrics.increment("pdf_extract.pages_failed", failed)
+            print(f"PDF文本提取完成: {extracted} 页新提取，{skipped} 页未变化，{failed} 页失败 -> {pdf_pages_dir}")
+            return {"page_count": page_count, "extracted": extracted, "skipped": skipped, "failed": failed,
+                    "cancelled": cancelled, "manifest": manifest}
@@ -0,0 +1,44 @@
+"""
+文本窗口内容的增量修改
+客户端基于内容版本号提交一组位置拼接操作，服务端在当前内容上依次应用，请求中只包含被修改的片段而不是整篇文档。
+操作格式: {"start": 起始位置, "end": 结束位置, "text": 替换文本, "expect": 可选，[start, end) 处应有的原文本}
+  插入: start == end；删除: text 为空；替换: 两者都有
+位置按字符（Unicode 码位）计算，每个操作作用在前一个操作的结果上
+"""
+
+from typing import Dict, List
+
+
+class ContentVersionConflict(Exception):
+    """增量修改基于的版本号与当前内容版本不一致，客户端需要重新获取内容"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"内容已被修改，当前版本: {current_version}")
+        self.current_version = current_version
+
+
+class TextPatchError(ValueError):
+    """增量修改操作无效（位置越界、原文本不匹配等）"""
+
+
+def apply_text_patch(text: str, ops: List[Dict]) -> str:
+    """依次应用位置拼接操作，返回修改后的文本"""
+    if not isinstance(ops, list):
+        raise TextPatchError("ops 必须是操作列表")
+    for index, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise TextPatchError(f"第 {index} 个操作格式无效")
+        start = op.get("start")
+        end = op.get("end", start)
+        replacement = op.get("text", "")
+        if not isinstance(start, int) or not isinstance(end, int) or isinstance(start, bool) or isinstance(end, bool):
+            raise TextPatchError(f"第 {index} 个操作缺少有效的 start/end")
+        if not isinstance(replacement, str):
+            raise TextPatchError(f"第 {index} 个操作的 text 必须是字符串")
+        if not 0 <= start <= end <= len(text):
+            raise TextPatchError(f"第 {index} 个操作的范围 [{start}, {end}) 超出内容长度 {len(text)}")
+        expect = op.get("expect")
+        if expect is not None and text[start:end] != expect:
+            raise TextPatchError(f"第 {index} 个操作的原文本不匹配")
+        text = text[:start] + replacement + text[end:]
+    return text
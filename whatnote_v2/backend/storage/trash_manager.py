@@ -6,26 +6,36 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 from config import TRASH_DIR
+from .atomic_write import atomic_write_json
 
 
 class TrashManager:
     """回收站管理器"""
     
-    def __init__(self):
+    def __init__(self, blob_store=None, metadata=None, write_json_files: bool = True, on_sidecar_restored=None):
         """初始化回收站管理器"""
         self.trash_dir = TRASH_DIR
+        # 回收站中的文件仍然引用内容存储，只有永久删除后才回收
+        self.blob_store = blob_store
+        # SQLite 元数据存储（可选）：回收站记录逐条保存在数据库中，trash_info.json 只是可选的导出
+        self.metadata = metadata
+        self.write_json_files = write_json_files
+        # 窗口的JSON配置文件恢复后的回调 (board_id, json_file)，用于把窗口重新登记到数据库
+        self.on_sidecar_restored = on_sidecar_restored
         self.trash_info_file = self.trash_dir / "trash_info.json"
         self._ensure_trash_dir()
     
     def _ensure_trash_dir(self):
         """确保回收站目录存在"""
         self.trash_dir.mkdir(parents=True, exist_ok=True)
-        if not self.trash_info_file.exists():
+        if self.write_json_files and not self.trash_info_file.exists():
             with open(self.trash_info_file, 'w', encoding='utf-8') as f:
                 json.dump([], f, ensure_ascii=False, indent=2)
     
     def _load_trash_info(self) -> List[Dict]:
         """加载回收站信息"""
+        if self.metadata:
+            return self.metadata.list_trash()
         try:
             with open(self.trash_info_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -36,11 +46,39 @@ class TrashManager:
     def _save_trash_info(self, trash_info: List[Dict]):
         """保存回收站信息"""
         try:
-            with open(self.trash_info_file, 'w', encoding='utf-8') as f:
-                json.dump(trash_info, f, ensure_ascii=False, indent=2)
+            atomic_write_json(self.trash_info_file, trash_info, kind="trash_info")
         except Exception as e:
             print(f"保存回收站信息失败: {e}")
     
+    def _add_trash_item(self, trash_item: Dict):
+        """追加一条回收站记录（sqlite 后端只插入一行）；同一毫秒内的记录ID追加序号"""
+        base_id = trash_item["id"]
+        suffix = 1
+        if self.metadata:
+            while self.metadata.get_trash_item(trash_item["id"]):
+                trash_item["id"] = f"{base_id}_{suffix}"
+                suffix += 1
+            self.metadata.add_trash_item(trash_item)
+            if self.write_json_files:
+                self._save_trash_info(self.metadata.list_trash())
+            return
+        trash_info = self._load_trash_info()
+        existing_ids = {item.get("id") for item in trash_info}
+        while trash_item["id"] in existing_ids:
+            trash_item["id"] = f"{base_id}_{suffix}"
+            suffix += 1
+        trash_info.append(trash_item)
+        self._save_trash_info(trash_info)
+    
+    def _remove_trash_item(self, trash_info: List[Dict], item_index: int):
+        """移除一条回收站记录"""
+        trash_item = trash_info.pop(item_index)
+        if self.metadata:
+            self.metadata.delete_trash_item(trash_item["id"])
+            if not self.write_json_files:
+                return
+        self._save_trash_info(trash_info)
+    
     def move_to_trash(self, file_path: Path, window_data: Dict, board_id: str) -> bool:
         """将文件移动到回收站"""
         try:
@@ -58,7 +96,6 @@ class TrashManager:
             shutil.move(str(file_path), str(trash_file_path))
             
             # 记录回收站信息
-            trash_info = self._load_trash_info()
             trash_item = {
                 "id": f"trash_{timestamp}",
                 "original_name": original_name,
@@ -69,8 +106,7 @@ class TrashManager:
                 "original_path": str(file_path.parent),
                 "file_size": trash_file_path.stat().st_size if trash_file_path.exists() else 0
             }
-            trash_info.append(trash_item)
-            self._save_trash_info(trash_info)
+            self._add_trash_item(trash_item)
             
             print(f"文件已移动到回收站: {original_name} -> {trash_filename}")
             return True
@@ -131,8 +167,10 @@ class TrashManager:
             shutil.move(str(trash_file_path), str(original_file_path))
             
             # 从回收站信息中移除
-            trash_info.pop(item_index)
-            self._save_trash_info(trash_info)
+            self._remove_trash_item(trash_info, item_index)
+            
+            if self.on_sidecar_restored and (trash_item.get("window_data") or {}).get("is_json_config"):
+                self.on_sidecar_restored(trash_item["board_id"], original_file_path)
             
             print(f"文件已从回收站恢复: {trash_item['original_name']}")
             return True
@@ -161,12 +199,13 @@ class TrashManager:
             
             # 删除回收站文件
             trash_file_path = self.trash_dir / trash_item["trash_filename"]
+            blobs = self._referenced_blobs([trash_file_path])
             if trash_file_path.exists():
                 trash_file_path.unlink()
             
             # 从回收站信息中移除
-            trash_info.pop(item_index)
-            self._save_trash_info(trash_info)
+            self._remove_trash_item(trash_info, item_index)
+            self._release_blobs(blobs)
             
             print(f"文件已永久删除: {trash_item['original_name']}")
             return True
@@ -181,13 +220,18 @@ class TrashManager:
             trash_info = self._load_trash_info()
             
             # 删除所有回收站文件
+            blobs = self._referenced_blobs(self.trash_dir / item["trash_filename"] for item in trash_info)
             for item in trash_info:
                 trash_file_path = self.trash_dir / item["trash_filename"]
                 if trash_file_path.exists():
                     trash_file_path.unlink()
             
             # 清空回收站信息
-            self._save_trash_info([])
+            if self.metadata:
+                self.metadata.clear_trash()
+            if self.write_json_files:
+                self._save_trash_info([])
+            self._release_blobs(blobs)
             
             print("回收站已清空")
             return True
@@ -196,6 +240,18 @@ class TrashManager:
             print(f"清空回收站失败: {e}")
             return False
     
+    def _referenced_blobs(self, paths) -> set:
+        """永久删除前记下文件引用的内容存储对象"""
+        return self.blob_store.referenced_blobs(paths) if self.blob_store else set()
+    
+    def _release_blobs(self, blobs):
+        """永久删除后只检查这些内容存储对象的引用数，回收没有引用的"""
+        if self.blob_store and blobs:
+            try:
+                self.blob_store.release(blobs)
+            except Exception as e:
+                print(f"回收内容存储失败: {e}")
+    
     def get_trash_size(self) -> int:
         """获取回收站总大小（字节）"""
         try:
@@ -236,7 +292,6 @@ class TrashManager:
             shutil.move(str(pdf_pages_dir), str(trash_folder_path))
             
             # 记录回收站信息
-            trash_info = self._load_trash_info()
             trash_item = {
                 "id": f"trash_{timestamp}_pages",
                 "original_name": f"{pdf_name}_pages",
@@ -247,8 +302,7 @@ class TrashManager:
                 "original_path": str(pdf_pages_dir.parent),
                 "is_folder": True
             }
-            trash_info.append(trash_item)
-            self._save_trash_info(trash_info)
+            self._add_trash_item(trash_item)
             
             print(f"PDF pages文件夹已移动到回收站: {pdf_name} -> {trash_folder_name}")
             return True
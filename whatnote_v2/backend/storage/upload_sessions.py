@@ -0,0 +1,264 @@
+"""
+可续传的分块上传
+每个上传会话保存在展板暂存目录 .uploads/sessions/<session_id>/ 下：
+session.json 记录文件信息和已接收的字节区间，data.part 是按偏移写入的数据文件。
+会话状态在每个分块写入后落盘，服务重启后可以继续上传；客户端可以并行上传多个分块。
+客户端声明的 sha256 在内容存储中已存在时不需要上传数据，但完成会话时必须提交服务端随机选定的区间内容作为持有证明，
+只知道哈希值不能把其他展板的文件链接过来
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import metrics
+from config import MAX_UPLOAD_SIZE, UPLOAD_DEDUP_PROOF_BYTES, UPLOAD_SESSION_CHUNK_SIZE, UPLOAD_SESSION_TTL
+from .atomic_write import atomic_write_text
+from .upload_stream import STAGING_DIR_NAME, UploadTooLargeError
+
+SESSIONS_DIR_NAME = "sessions"
+SESSION_FILE = "session.json"
+DATA_FILE = "data.part"
+
+
+class UploadSessionError(ValueError):
+    """上传会话操作无效（偏移越界、会话未完成等）"""
+
+
+def _merge_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """把 [start, end) 合并进已排序、不重叠的区间列表"""
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+class UploadSessionManager:
+    """分块上传会话管理"""
+
+    def __init__(self, file_manager, blob_store=None):
+        self.file_manager = file_manager
+        self.blob_store = blob_store
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(session_id, threading.Lock())
+
+    def _sessions_dir(self, board_id: str) -> Path:
+        board_dir = self.file_manager.get_board_dir(board_id)
+        if not board_dir:
+            raise FileNotFoundError(f"展板不存在: {board_id}")
+        return board_dir / STAGING_DIR_NAME / SESSIONS_DIR_NAME
+
+    def _session_dir(self, board_id: str, session_id: str) -> Path:
+        # session_id 由服务端生成，只允许十六进制字符，防止路径穿越
+        if not session_id or not all(c in "0123456789abcdef" for c in session_id):
+            raise UploadSessionError(f"无效的上传会话ID: {session_id}")
+        return self._sessions_dir(board_id) / session_id
+
+    def _load(self, session_dir: Path) -> Optional[Dict]:
+        try:
+            with open(session_dir / SESSION_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, session_dir: Path, session: Dict):
+        session["updated_at"] = time.time()
+        atomic_write_text(session_dir / SESSION_FILE, json.dumps(session, ensure_ascii=False), kind="upload_session")
+
+    @staticmethod
+    def _public_view(session: Dict) -> Dict:
+        received = sum(end - start for start, end in session["ranges"])
+        return {
+            "session_id": session["id"],
+            "board_id": session["board_id"],
+            "filename": session["filename"],
+            "file_type": session["file_type"],
+            "window_id": session.get("window_id"),
+            "size": session["size"],
+            "chunk_size": session["chunk_size"],
+            "received": received,
+            "ranges": session["ranges"],
+            "complete": received == session["size"],
+            "deduplicated": session.get("deduplicated", False),
+            # 去重的会话完成时需要提交的区间 [offset, length]
+            "proof_range": session.get("proof_range"),
+        }
+
+    def create_session(self, board_id: str, filename: str, file_type: str, size: int,
+                       window_id: str = None, sha256: str = None) -> Dict:
+        """创建上传会话，预分配数据文件"""
+        if size < 0:
+            raise UploadSessionError("文件大小无效")
+        if size > MAX_UPLOAD_SIZE:
+            raise UploadTooLargeError(f"文件超过大小限制 ({MAX_UPLOAD_SIZE} 字节)")
+
+        # 内容存储中已有相同内容：无需上传数据，完成时提交随机区间的内容证明持有该文件
+        deduplicated = bool(self.blob_store and sha256 and self.blob_store.accepts(filename)
+                            and self.blob_store.exists(sha256, size))
+        proof_range = None
+        if deduplicated:
+            length = min(size, UPLOAD_DEDUP_PROOF_BYTES)
+            proof_range = [secrets.randbelow(size - length + 1), length]
+        
+        session_id = uuid.uuid4().hex
+        session_dir = self._session_dir(board_id, session_id)
+        session_dir.mkdir(parents=True)
+        if not deduplicated:
+            with open(session_dir / DATA_FILE, "wb") as f:
+                f.truncate(size)
+
+        now = time.time()
+        session = {
+            "id": session_id,
+            "board_id": board_id,
+            "filename": Path(filename).name,
+            "file_type": file_type,
+            "window_id": window_id,
+            "size": size,
+            "sha256": sha256,
+            "chunk_size": UPLOAD_SESSION_CHUNK_SIZE,
+            "ranges": [[0, size]] if deduplicated and size else [],
+            "deduplicated": deduplicated,
+            "proof_range": proof_range,
+            "created_at": now,
+        }
+        self._save(session_dir, session)
+        metrics.increment("upload_session.created")
+        print(f"创建上传会话: {session_id} ({filename}, {size} 字节)")
+        return self._public_view(session)
+
+    def get_session(self, board_id: str, session_id: str) -> Optional[Dict]:
+        """查询会话状态和已接收的区间"""
+        session = self._load(self._session_dir(board_id, session_id))
+        return self._public_view(session) if session else None
+
+    def open_chunk(self, board_id: str, session_id: str, offset: int):
+        """打开数据文件准备在 offset 处写入分块，返回 (文件对象, 会话大小)"""
+        session_dir = self._session_dir(board_id, session_id)
+        session = self._load(session_dir)
+        if not session:
+            raise FileNotFoundError(f"上传会话不存在: {session_id}")
+        if session.get("deduplicated"):
+            raise UploadSessionError("内容已存在，无需上传分块")
+        if offset < 0 or offset > session["size"]:
+            raise UploadSessionError(f"偏移越界: {offset}")
+        f = open(session_dir / DATA_FILE, "r+b")
+        f.seek(offset)
+        return f, session["size"]
+
+    def commit_chunk(self, board_id: str, session_id: str, offset: int, length: int) -> Dict:
+        """分块写入完成后记录区间（数据先落盘，再记录区间）"""
+        session_dir = self._session_dir(board_id, session_id)
+        with self._session_lock(session_id):
+            session = self._load(session_dir)
+            if not session:
+                raise FileNotFoundError(f"上传会话不存在: {session_id}")
+            if length > 0:
+                session["ranges"] = _merge_range(session["ranges"], offset, offset + length)
+            self._save(session_dir, session)
+        metrics.increment("upload_session.chunks")
+        metrics.increment("upload_session.bytes", length)
+        return self._public_view(session)
+
+    def complete_session(self, board_id: str, session_id: str, sha256: str = None, proof: str = None) -> Dict:
+        """
+        校验会话已接收全部数据并计算 SHA-256，返回 {"path", "size", "sha256", "session"}
+
+        数据文件仍留在暂存目录，调用方把它移动到 files 目录后调用 delete_session；
+        去重的会话没有数据文件，返回的 path 为None。去重的会话需要提交 proof（proof_range 区间内容的 base64），
+        证明无效时会话转为普通上传（需要上传全部分块）并抛出 UploadSessionError
+        """
+        session_dir = self._session_dir(board_id, session_id)
+        session = self._load(session_dir)
+        if not session:
+            raise FileNotFoundError(f"上传会话不存在: {session_id}")
+        view = self._public_view(session)
+        if not view["complete"]:
+            raise UploadSessionError(f"上传尚未完成: 已接收 {view['received']}/{session['size']} 字节")
+
+        if session.get("deduplicated"):
+            if not self.blob_store.exists(session["sha256"], session["size"]):
+                raise UploadSessionError("已存在的内容已被删除，请重新创建上传会话")
+            if not self._verify_proof(session, proof):
+                metrics.increment("upload_session.dedup_proof_failed")
+                self._require_full_upload(session_dir, session_id)
+                raise UploadSessionError("内容持有证明无效，请上传完整文件")
+            metrics.increment("upload_session.deduplicated")
+            return {"path": None, "size": session["size"], "sha256": session["sha256"].lower(), "session": view}
+        
+        data_file = session_dir / DATA_FILE
+        hasher = hashlib.sha256()
+        with open(data_file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        expected = sha256 or session.get("sha256")
+        if expected and expected.lower() != digest:
+            raise UploadSessionError(f"SHA-256 校验失败: 期望 {expected}, 实际 {digest}")
+        return {"path": data_file, "size": session["size"], "sha256": digest, "session": view}
+
+    def _verify_proof(self, session: Dict, proof: Optional[str]) -> bool:
+        """比较客户端提交的区间内容与存储中的内容"""
+        offset, length = session.get("proof_range") or (0, 0)
+        try:
+            data = base64.b64decode(proof or "", validate=True)
+        except ValueError:
+            return False
+        expected = self.blob_store.read_range(session["sha256"], offset, length)
+        return len(data) == length and hmac.compare_digest(data, expected)
+
+    def _require_full_upload(self, session_dir: Path, session_id: str):
+        """去重失败：预分配数据文件，会话改为按分块上传全部内容"""
+        with self._session_lock(session_id):
+            session = self._load(session_dir)
+            if not session or not session.get("deduplicated"):
+                return
+            with open(session_dir / DATA_FILE, "wb") as f:
+                f.truncate(session["size"])
+            session["deduplicated"] = False
+            session["proof_range"] = None
+            session["ranges"] = []
+            self._save(session_dir, session)
+
+    def delete_session(self, board_id: str, session_id: str) -> bool:
+        """删除会话（完成或取消后）"""
+        session_dir = self._session_dir(board_id, session_id)
+        with self._locks_guard:
+            self._locks.pop(session_id, None)
+        if not session_dir.exists():
+            return False
+        shutil.rmtree(session_dir, ignore_errors=True)
+        return True
+
+    def cleanup_expired(self, ttl: float = UPLOAD_SESSION_TTL) -> int:
+        """删除超过 ttl 秒未更新的会话，返回删除数量"""
+        removed = 0
+        now = time.time()
+        for board_id, board_dir in self.file_manager.board_index.items():
+            sessions_dir = board_dir / STAGING_DIR_NAME / SESSIONS_DIR_NAME
+            if not sessions_dir.exists():
+                continue
+            for session_dir in sessions_dir.iterdir():
+                session = self._load(session_dir)
+                updated_at = session.get("updated_at", 0) if session else 0
+                if now - updated_at > ttl:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+        if removed:
+            print(f"清理过期上传会话: {removed} 个")
+        return removed
@@ -0,0 +1,213 @@
+"""
+流式上传
+直接从请求体边接收边解析 multipart/form-data，把文件部分分块写入展板目录下的暂存文件（与 files 目录在同一文件系统），
+写入的同时计算 SHA-256 和检查大小限制，之后由存储管理器原子重命名到 files 目录。
+请求体不经过框架的表单解析，不会先被完整缓存到系统临时目录，超过大小限制时在接收过程中立即拒绝
+"""
+
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+import metrics
+from config import MAX_UPLOAD_SIZE, UPLOAD_CHUNK_SIZE
+
+# 暂存目录位于展板目录下、files目录之外，FileWatcher不会处理其中的文件
+STAGING_DIR_NAME = ".uploads"
+
+
+# 表单文本字段的总大小上限，multipart 的分隔行和头部也计入请求体大小的余量
+MAX_FORM_FIELDS_SIZE = 64 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """上传文件超过大小限制"""
+
+
+class MultipartUploadError(ValueError):
+    """请求体不是有效的 multipart/form-data"""
+
+
+class StagedUpload:
+    """已写入暂存目录的上传文件"""
+
+    def __init__(self, path: Path, size: int, sha256: str, filename: str = None):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+
+class MultipartUpload:
+    """解析后的上传请求：file 是文件字段对应的暂存文件（没有文件时为None），fields 是其余的文本字段"""
+
+    def __init__(self, file: Optional[StagedUpload], fields: Dict[str, str]):
+        self.file = file
+        self.fields = fields
+
+
+def get_staging_dir(board_dir: Path) -> Path:
+    """展板的上传暂存目录"""
+    staging_dir = Path(board_dir) / STAGING_DIR_NAME
+    staging_dir.mkdir(exist_ok=True)
+    return staging_dir
+
+
+class _StagingWriter:
+    """在线程池中执行的分块写入器"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._file = open(path, "wb")
+
+    def write(self, chunk: bytes):
+        self._hasher.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    @property
+    def sha256(self) -> str:
+        return self._hasher.hexdigest()
+
+
+def _decode_header_value(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("latin-1")
+
+
+async def stream_multipart_upload(request, board_dir: Path, executor, file_field: str = "file",
+                                  max_size: int = MAX_UPLOAD_SIZE,
+                                  chunk_size: int = UPLOAD_CHUNK_SIZE) -> MultipartUpload:
+    """
+    从请求体流式解析 multipart/form-data：file_field 字段的文件写入展板暂存目录，其他文本字段收集到 fields
+
+    内存中最多只保留约 chunk_size 的文件数据；文件超过 max_size（或 Content-Length 已声明超过）时删除暂存文件并抛出
+    UploadTooLargeError，请求体格式无效时抛出 MultipartUploadError。调用方负责把暂存文件移动到最终位置，或在失败时删除它
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise MultipartUploadError("请求体必须是 multipart/form-data")
+    max_body_size = max_size + MAX_FORM_FIELDS_SIZE
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body_size:
+        metrics.increment("upload.rejected_too_large")
+        raise UploadTooLargeError(f"文件超过大小限制 ({max_size} 字节)")
+
+    events: List[tuple] = []
+    parser = MultipartParser(boundary, {
+        "on_part_begin": lambda: events.append(("part_begin", b"")),
+        "on_header_field": lambda data, start, end: events.append(("header_field", data[start:end])),
+        "on_header_value": lambda data, start, end: events.append(("header_value", data[start:end])),
+        "on_header_end": lambda: events.append(("header_end", b"")),
+        "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+        "on_part_data": lambda data, start, end: events.append(("part_data", data[start:end])),
+        "on_part_end": lambda: events.append(("part_end", b"")),
+    })
+
+    def open_writer(filename: str) -> _StagingWriter:
+        staging_dir = get_staging_dir(board_dir)
+        return _StagingWriter(staging_dir / f"{uuid.uuid4().hex}_{Path(filename).name or 'upload'}")
+
+    staged: Optional[StagedUpload] = None
+    fields: Dict[str, str] = {}
+    fields_size = 0
+    writer: Optional[_StagingWriter] = None
+    filename = None
+    # 当前部分的状态
+    header_field, header_value, headers = b"", b"", {}
+    part_name, part_is_file, field_data = None, False, bytearray()
+    pending: List[bytes] = []
+    pending_size = 0
+
+    with metrics.timer("upload.stream"):
+        try:
+            async for chunk in request.stream():
+                try:
+                    parser.write(chunk)
+                except ValueError as e:
+                    raise MultipartUploadError(f"multipart 请求体无效: {e}")
+                for event, data in events:
+                    if event == "part_begin":
+                        header_field, header_value, headers = b"", b"", {}
+                        part_name, part_is_file, field_data = None, False, bytearray()
+                    elif event == "header_field":
+                        header_field += data
+                    elif event == "header_value":
+                        header_value += data
+                    elif event == "header_end":
+                        headers[header_field.lower()] = header_value
+                        header_field, header_value = b"", b""
+                    elif event == "headers_finished":
+                        _, disposition = parse_options_header(headers.get(b"content-disposition", b""))
+                        part_name = _decode_header_value(disposition.get(b"name", b""))
+                        if b"filename" in disposition and part_name == file_field and writer is None and staged is None:
+                            filename = _decode_header_value(disposition[b"filename"]) or "upload"
+                            writer = await executor.run(open_writer, filename)
+                            part_is_file = True
+                    elif event == "part_data":
+                        if part_is_file:
+                            if writer.size + pending_size + len(data) > max_size:
+                                metrics.increment("upload.rejected_too_large")
+                                raise UploadTooLargeError(f"文件超过大小限制 ({max_size} 字节)")
+                            pending.append(data)
+                            pending_size += len(data)
+                            if pending_size >= chunk_size:
+                                await executor.run(writer.write, b"".join(pending))
+                                pending, pending_size = [], 0
+                        else:
+                            # 文本字段和多余的文件字段只在内存中保留有限的大小
+                            fields_size += len(data)
+                            if fields_size > MAX_FORM_FIELDS_SIZE:
+                                raise UploadTooLargeError(f"表单字段超过大小限制 ({MAX_FORM_FIELDS_SIZE} 字节)")
+                            field_data += data
+                    elif event == "part_end":
+                        if part_is_file:
+                            if pending:
+                                await executor.run(writer.write, b"".join(pending))
+                                pending, pending_size = [], 0
+                            await executor.run(writer.close)
+                            staged = StagedUpload(writer.path, writer.size, writer.sha256, filename)
+                            writer = None
+                        elif part_name:
+                            fields[part_name] = field_data.decode("utf-8", "replace")
+                events.clear()
+            try:
+                parser.finalize()
+            except ValueError as e:
+                raise MultipartUploadError(f"multipart 请求体无效: {e}")
+            if writer is not None:
+                raise MultipartUploadError("multipart 请求体不完整")
+        except BaseException:
+            # 取消时不能再等待线程池，直接同步清理
+            if writer is not None:
+                writer.discard()
+            if staged is not None:
+                try:
+                    os.remove(staged.path)
+                except OSError:
+                    pass
+            raise
+
+    if staged is not None:
+        metrics.increment("upload.files")
+        metrics.increment("upload.bytes", staged.size)
+    return MultipartUpload(staged, fields)
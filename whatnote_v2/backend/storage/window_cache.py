@@ -0,0 +1,107 @@
+"""
+展板窗口快照缓存
+按展板缓存已解析的窗口数据，以 JSON 配置文件和内容文件的 (mtime, size) 作为校验键，
+每次读取只重新解析发生变化的条目
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """返回文件的 (mtime_ns, size)，文件不存在返回None"""
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class BoardWindowCache:
+    """展板窗口快照缓存，写操作和 FileWatcher 事件负责使条目失效"""
+
+    def __init__(self, max_boards: int = 64):
+        self.max_boards = max_boards
+        # board_id -> {JSON配置文件名: 缓存条目}
+        self._boards: "OrderedDict[str, Dict[str, Dict]]" = OrderedDict()
+        # board_id -> 被显式标记失效的JSON配置文件名
+        self._dirty: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, board_id: str, sidecar: str = None):
+        """使缓存失效：指定JSON配置文件名时只失效该条目，否则丢弃整个展板"""
+        with self._lock:
+            if sidecar is None:
+                self._boards.pop(board_id, None)
+                self._dirty.pop(board_id, None)
+            elif board_id in self._boards:
+                self._dirty.setdefault(board_id, set()).add(sidecar)
+
+    def get_windows(self, board_id: str, files_dir: Path,
+                    load_window: Callable[[Path], Optional[Dict]]) -> List[Tuple[str, Dict]]:
+        """
+        返回展板所有窗口的 (JSON配置文件名, 窗口数据) 列表
+
+        load_window(json_file) 负责解析单个JSON配置文件及其内容，
+        只有签名变化或被标记失效的条目才会调用它。返回的窗口数据是浅副本，调用方可以替换顶层字段，
+        但不能原地修改嵌套的值（例如 position 字典）。
+        """
+        with self._lock:
+            cached_entries = self._boards.get(board_id, {})
+            dirty = self._dirty.pop(board_id, set())
+
+        board_dir = files_dir.parent
+        entries = {}
+        result = []
+        with os.scandir(files_dir) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".json") or not dir_entry.is_file():
+                    continue
+                name = dir_entry.name
+                stat = dir_entry.stat()
+                sidecar_sig = (stat.st_mtime_ns, stat.st_size)
+
+                cached = cached_entries.get(name)
+                if (cached and name not in dirty and cached["sidecar_sig"] == sidecar_sig
+                        and self._content_signature(board_dir, cached["window"]) == cached["content_sig"]):
+                    self.hits += 1
+                    entry = cached
+                else:
+                    self.misses += 1
+                    window = load_window(Path(dir_entry.path))
+                    if window is None:
+                        continue
+                    entry = {
+                        "sidecar_sig": sidecar_sig,
+                        "content_sig": self._content_signature(board_dir, window),
+                        "window": window,
+                    }
+                entries[name] = entry
+                # 浅复制：调用方只替换顶层字段（如 content），缓存中的嵌套值不会被修改
+                result.append((name, dict(entry["window"])))
+
+        with self._lock:
+            self._boards[board_id] = entries
+            self._boards.move_to_end(board_id)
+            while len(self._boards) > self.max_boards:
+                evicted_id, _ = self._boards.popitem(last=False)
+                self._dirty.pop(evicted_id, None)
+        return result
+
+    @staticmethod
+    def _content_signature(board_dir: Path, window: Dict) -> Optional[Tuple[int, int]]:
+        file_path = window.get("file_path")
+        if window.get("type") == "generic" or not file_path:
+            return None
+        return _file_signature(board_dir / file_path)
+
+    def stats(self) -> Dict:
+        """缓存命中统计"""
+        with self._lock:
+            boards = len(self._boards)
+        return {"boards": boards, "hits": self.hits, "misses": self.misses}
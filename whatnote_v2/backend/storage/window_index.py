@@ -0,0 +1,196 @@
+"""
+窗口索引
+维护 window_id -> (展板ID, JSON配置文件名, 内容文件名) 的持久化索引，
+避免每次查找窗口都遍历并解析展板下所有的 JSON 配置文件
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from .atomic_write import atomic_write_text
+
+
+class WindowIndex:
+    """window_id -> 窗口位置 的索引，所有写操作和文件监控事件都会同步更新"""
+
+    def __init__(self, index_file: Path, save_interval: float = 2.0):
+        self.index_file = Path(index_file)
+        self.save_interval = save_interval
+        self._windows: Dict[str, Dict] = {}
+        # (展板ID, JSON配置文件名) -> window_id 的反向映射
+        self._by_sidecar: Dict[Tuple[str, str], str] = {}
+        # (展板ID, 内容文件名) -> window_id 的反向映射
+        self._by_content: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+
+    def load(self) -> bool:
+        """从磁盘加载索引，文件不存在或损坏时返回False"""
+        if not self.index_file.exists():
+            return False
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                windows = json.load(f)
+            with self._lock:
+                self._replace_all(windows)
+                self._dirty = False
+            return True
+        except Exception as e:
+            print(f"加载窗口索引失败: {e}")
+            return False
+
+    def save(self):
+        """将索引写回磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._windows)
+            self._dirty = False
+            self._last_save = time.time()
+        try:
+            atomic_write_text(self.index_file, json.dumps(snapshot, ensure_ascii=False), kind="window_index")
+        except Exception as e:
+            print(f"保存窗口索引失败: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def _maybe_save(self):
+        """节流保存：距离上次保存超过 save_interval 才落盘"""
+        if time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def rebuild(self, board_index) -> int:
+        """扫描所有展板的 JSON 配置文件重建索引，返回窗口数量"""
+        def sidecars():
+            for board_id, board_dir in board_index.items():
+                files_dir = board_dir / "files"
+                if not files_dir.exists():
+                    continue
+                for json_file in files_dir.glob("*.json"):
+                    try:
+                        with open(json_file, "r", encoding="utf-8") as f:
+                            data = json.load(f)
+                    except Exception:
+                        continue
+                    if isinstance(data, dict):
+                        yield board_id, json_file.name, data
+        return self.rebuild_from(sidecars())
+
+    def rebuild_from(self, sidecars: Iterable[Tuple[str, str, Dict]]) -> int:
+        """从 (展板ID, JSON配置文件名, 窗口数据) 重建索引（sqlite 后端从数据库读取），返回窗口数量"""
+        windows = {}
+        for board_id, sidecar, data in sidecars:
+            window_id = data.get("id")
+            if window_id:
+                windows[window_id] = self._make_entry(board_id, sidecar, data)
+        with self._lock:
+            self._replace_all(windows)
+            self._dirty = True
+        self.save()
+        return len(windows)
+
+    def _replace_all(self, windows: Dict[str, Dict]):
+        self._windows = {}
+        self._by_sidecar = {}
+        self._by_content = {}
+        for window_id, entry in windows.items():
+            self._put(window_id, entry)
+
+    def _put(self, window_id: str, entry: Dict):
+        old_entry = self._windows.get(window_id)
+        if old_entry:
+            self._unmap(window_id, old_entry)
+        self._windows[window_id] = entry
+        self._by_sidecar[(entry["board_id"], entry["sidecar"])] = window_id
+        if entry["content"]:
+            self._by_content[(entry["board_id"], entry["content"])] = window_id
+
+    def _unmap(self, window_id: str, entry: Dict):
+        if self._by_sidecar.get((entry["board_id"], entry["sidecar"])) == window_id:
+            del self._by_sidecar[(entry["board_id"], entry["sidecar"])]
+        if entry["content"] and self._by_content.get((entry["board_id"], entry["content"])) == window_id:
+            del self._by_content[(entry["board_id"], entry["content"])]
+
+    def _drop(self, window_id: str) -> bool:
+        entry = self._windows.pop(window_id, None)
+        if entry is None:
+            return False
+        self._unmap(window_id, entry)
+        return True
+
+    @staticmethod
+    def _make_entry(board_id: str, sidecar: str, window_data: Dict) -> Dict:
+        file_path = window_data.get("file_path") or ""
+        content = file_path[6:] if file_path.startswith("files/") else None
+        return {"board_id": board_id, "sidecar": sidecar, "content": content}
+
+    def lookup(self, window_id: str) -> Optional[Dict]:
+        """查找窗口位置：{"board_id", "sidecar", "content"}"""
+        with self._lock:
+            entry = self._windows.get(window_id)
+            return dict(entry) if entry else None
+
+    def window_for_sidecar(self, board_id: str, sidecar: str) -> Optional[str]:
+        """JSON配置文件对应的窗口ID"""
+        with self._lock:
+            return self._by_sidecar.get((board_id, sidecar))
+
+    def window_for_file(self, board_id: str, filename: str) -> Optional[str]:
+        """内容文件（files/ 下的文件名）对应的窗口ID"""
+        with self._lock:
+            return self._by_content.get((board_id, filename))
+
+    def register(self, board_id: str, sidecar: str, window_data: Dict):
+        """登记（或更新）窗口的 JSON 配置文件"""
+        window_id = window_data.get("id")
+        if not window_id:
+            return
+        entry = self._make_entry(board_id, sidecar, window_data)
+        with self._lock:
+            if self._windows.get(window_id) == entry:
+                return
+            # 同一个JSON配置文件被改写成另一个窗口ID时，移除旧窗口
+            previous_id = self._by_sidecar.get((board_id, sidecar))
+            if previous_id and previous_id != window_id:
+                self._drop(previous_id)
+            self._put(window_id, entry)
+            self._dirty = True
+        self._maybe_save()
+
+    def unregister(self, window_id: str):
+        """移除窗口"""
+        with self._lock:
+            if not self._drop(window_id):
+                return
+            self._dirty = True
+        self._maybe_save()
+
+    def unregister_sidecar(self, board_id: str, sidecar: str):
+        """按 JSON 配置文件名移除窗口（文件被删除或改名时）"""
+        with self._lock:
+            window_id = self._by_sidecar.get((board_id, sidecar))
+            if not window_id:
+                return
+            self._drop(window_id)
+            self._dirty = True
+        self._maybe_save()
+
+    def unregister_board(self, board_id: str):
+        """移除整个展板的窗口（展板被删除时）"""
+        with self._lock:
+            stale = [window_id for window_id, entry in self._windows.items()
+                     if entry["board_id"] == board_id]
+            for window_id in stale:
+                self._drop(window_id)
+            if stale:
+                self._dirty = True
+        if stale:
+            self._maybe_save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._windows)
@@ -0,0 +1,124 @@
+"""
+服务端写入意图登记
+ContentManager 写入、删除或重命名展板文件前先登记目标路径，文件监控收到这些路径上的事件时直接丢弃，
+不需要重新读取展板，只有外部修改才进入完整的处理流程。
+每次登记分配一个递增的写入代数；写入结束时记录路径的文件状态（inode、大小、修改时间，文件不存在时为None），
+之后 WRITE_INTENT_GRACE 秒内只丢弃文件状态仍与之一致的事件（覆盖事件的投递延迟），
+期间外部程序对同一文件的修改会改变文件状态，照常处理
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+import metrics
+from config import WRITE_INTENT_GRACE, WRITE_INTENT_MAX_ENTRIES
+
+
+def _stat_signature(path) -> Optional[Tuple[int, int, int]]:
+    """文件状态 (inode, 大小, 修改时间ns)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class _Intent:
+    __slots__ = ("generation", "active", "expires_at", "signature")
+
+    def __init__(self):
+        self.generation = 0
+        self.active = 0
+        self.expires_at = 0.0
+        self.signature = None
+
+
+class WriteIntentRegistry:
+    """路径 -> 写入意图，线程安全（watchdog线程查询，存储线程登记）"""
+
+    def __init__(self, grace: float = WRITE_INTENT_GRACE, max_entries: int = WRITE_INTENT_MAX_ENTRIES):
+        self.grace = grace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._intents: Dict[str, _Intent] = {}
+        self._generation = 0
+        self.suppressed = 0
+
+    @staticmethod
+    def _key(path) -> str:
+        return os.path.normcase(os.path.abspath(str(path)))
+
+    def begin(self, *paths) -> int:
+        """登记即将写入的路径，返回本次写入的代数"""
+        with self._lock:
+            self._generation += 1
+            for path in paths:
+                key = self._key(path)
+                intent = self._intents.get(key)
+                if intent is None:
+                    intent = self._intents[key] = _Intent()
+                intent.generation = self._generation
+                intent.active += 1
+            if len(self._intents) > self.max_entries:
+                self._prune(time.monotonic())
+            return self._generation
+
+    def end(self, *paths):
+        """写入完成：记录写入后的文件状态，意图再保留 grace 秒，等待文件事件到达"""
+        signatures = {self._key(path): _stat_signature(path) for path in paths}
+        expires_at = time.monotonic() + self.grace
+        with self._lock:
+            for key, signature in signatures.items():
+                intent = self._intents.get(key)
+                if intent is not None:
+                    intent.active = max(0, intent.active - 1)
+                    intent.expires_at = max(intent.expires_at, expires_at)
+                    intent.signature = signature
+
+    @contextmanager
+    def writing(self, *paths):
+        """with registry.writing(path, ...): 期间及结束后 grace 秒内这些路径上的事件视为服务端自己的写入"""
+        generation = self.begin(*paths)
+        try:
+            yield generation
+        finally:
+            self.end(*paths)
+
+    def is_own_write(self, path) -> bool:
+        """
+        事件是否来自服务端自己的写入：写入进行中，或写入结束后 grace 秒内且文件状态与写入后记录的一致
+        （过期的意图在此顺便删除）
+        """
+        key = self._key(path)
+        with self._lock:
+            intent = self._intents.get(key)
+            if intent is None:
+                return False
+            writing, signature = intent.active > 0, intent.signature
+            if not writing and time.monotonic() > intent.expires_at:
+                del self._intents[key]
+                return False
+        if not writing and _stat_signature(key) != signature:
+            # 服务端写入之后文件又被外部修改
+            metrics.increment("write_intents.external_changes")
+            return False
+        with self._lock:
+            self.suppressed += 1
+        metrics.increment("write_intents.suppressed")
+        return True
+
+    def _prune(self, now: float):
+        for key in [key for key, intent in self._intents.items() if not intent.active and intent.expires_at < now]:
+            del self._intents[key]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._intents),
+                "active": sum(1 for intent in self._intents.values() if intent.active),
+                "generation": self._generation,
+                "suppressed": self.suppressed,
+            }
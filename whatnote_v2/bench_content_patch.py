@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+文本窗口增量修改基准测试
+
+在临时数据目录中创建一个大文本窗口，模拟连续编辑（在随机位置输入、删除字符），
+分别用整篇内容更新（PUT .../windows/{id} 的 content）和增量修改（PATCH .../windows/{id}/content）提交每次编辑，
+报告每次编辑的请求体字节数和服务端处理耗时（包括请求体的 JSON 编解码）。
+
+用法:
+    python bench_content_patch.py
+    python bench_content_patch.py --size 1000000 --edits 500
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from storage.content_manager import ContentManager  # noqa: E402
+from storage.file_manager import FileSystemManager  # noqa: E402
+
+
+def make_document(size: int) -> str:
+    """生成约 size 个字符的 markdown 文本"""
+    paragraph = "## 小节标题\n\n这是一段用于基准测试的笔记内容，包含中文和 English words 以及一些 `code`。\n\n"
+    return (paragraph * (size // len(paragraph) + 1))[:size]
+
+
+def make_edits(text: str, count: int, seed: int):
+    """生成编辑序列 [(start, end, 插入文本)]：大部分是输入单个字符，少量是删除"""
+    rng = random.Random(seed)
+    length = len(text)
+    edits = []
+    for _ in range(count):
+        start = rng.randrange(length)
+        if rng.random() < 0.2 and start < length:
+            edits.append((start, start + 1, ""))
+            length -= 1
+        else:
+            edits.append((start, start, rng.choice("abc你好 \n")))
+            length += 1
+    return edits
+
+
+def setup(data_dir: Path, text: str):
+    file_manager = FileSystemManager(data_dir)
+    course = file_manager.create_course("基准测试", "")
+    board = file_manager.create_board(course["id"], "基准测试")
+    content_manager = ContentManager(file_manager)
+    window = {"id": "bench-window", "type": "text", "title": "bench", "content": text}
+    content_manager.save_window_content(board["id"], window)
+    return content_manager, board["id"], window["id"]
+
+
+def run_full(content_manager, board_id, window_id, text, edits):
+    """整篇内容更新，返回 (每次编辑的请求字节数, 每次编辑的耗时)"""
+    sizes, timings = [], []
+    for start, end, insert in edits:
+        text = text[:start] + insert + text[end:]
+        body = json.dumps({"content": text}, ensure_ascii=False).encode("utf-8")
+        started = time.perf_counter()
+        content_manager.update_window_content_only(board_id, window_id, json.loads(body)["content"])
+        timings.append(time.perf_counter() - started)
+        sizes.append(len(body))
+    return sizes, timings
+
+
+def run_patch(content_manager, board_id, window_id, version, edits):
+    """增量修改，返回 (每次编辑的请求字节数, 每次编辑的耗时)"""
+    sizes, timings = [], []
+    for start, end, insert in edits:
+        body = json.dumps({"base_version": version, "ops": [{"start": start, "end": end, "text": insert}]},
+                          ensure_ascii=False).encode("utf-8")
+        started = time.perf_counter()
+        patch = json.loads(body)
+        version = content_manager.patch_window_content(board_id, window_id, patch["base_version"], patch["ops"])["version"]
+        timings.append(time.perf_counter() - started)
+        sizes.append(len(body))
+    return sizes, timings
+
+
+def report(name: str, sizes, timings):
+    print(f"{name}: 每次编辑 {statistics.mean(sizes):,.0f} 字节，"
+          f"耗时中位数 {statistics.median(timings) * 1000:.2f}ms，总计 {sum(sizes) / 1024 / 1024:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本窗口增量修改基准测试")
+    parser.add_argument("--size", type=int, default=500_000, help="文档字符数")
+    parser.add_argument("--edits", type=int, default=200, help="编辑次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    text = make_document(args.size)
+    edits = make_edits(text, args.edits, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            content_manager, board_id, window_id = setup(Path(tmp) / "full", text)
+            full = run_full(content_manager, board_id, window_id, text, edits)
+            content_manager.flush_autosave()
+            expected = content_manager.get_board_windows(board_id)[0]["content"]
+
+            content_manager, board_id, window_id = setup(Path(tmp) / "patch", text)
+            version = content_manager.get_board_windows(board_id)[0]["content_version"]
+            patch = run_patch(content_manager, board_id, window_id, version, edits)
+            content_manager.flush_autosave()
+            actual = content_manager.get_board_windows(board_id)[0]["content"]
+
+    print(f"文档 {args.size:,} 字符，{args.edits} 次编辑")
+    report("整篇更新", *full)
+    report("增量修改", *patch)
+    print(f"请求字节数减少 {statistics.mean(full[0]) / statistics.mean(patch[0]):,.0f} 倍，"
+          f"最终内容{'一致' if actual == expected else '不一致'}")
+    return 0 if actual == expected else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
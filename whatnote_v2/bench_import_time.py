@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+后端导入耗时基准测试
+
+在全新的子进程中多次导入指定模块（默认 backend.main 和 document_converter），
+报告导入耗时的中位数和最小值，以及 -X importtime 统计中累计耗时最多的模块。
+
+用法:
+    python bench_import_time.py
+    python bench_import_time.py --runs 10 --top 15 backend.main
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+# 与 backend/run.py 相同的导入路径：backend 目录和项目根目录
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {backend!r})
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import {module}
+print("IMPORT_SECONDS", time.perf_counter() - start)
+"""
+
+
+def measure(module: str, importtime: bool = False):
+    """在子进程中导入模块，返回 (耗时秒数, stderr)"""
+    code = IMPORT_SNIPPET.format(backend=BACKEND_DIR, root=ROOT_DIR, module=module)
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+    result = subprocess.run(cmd, capture_output=True, text=True, cwd=BACKEND_DIR)
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr.strip()}")
+    for line in result.stdout.splitlines():
+        if line.startswith("IMPORT_SECONDS"):
+            return float(line.split()[1]), result.stderr
+    raise RuntimeError(f"没有得到 {module} 的导入耗时")
+
+
+def top_imports(importtime_output: str, count: int):
+    """解析 -X importtime 输出，返回累计耗时最多的模块 [(微秒, 模块名)]"""
+    entries = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # 格式: "import time:   自身耗时 | 累计耗时 | 模块名"
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            entries.append((int(parts[1].strip()), parts[2].rstrip()))
+        except ValueError:
+            continue
+    entries.sort(reverse=True)
+    return entries[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端导入耗时基准测试")
+    parser.add_argument("modules", nargs="*", default=["backend.main", "document_converter"])
+    parser.add_argument("--runs", type=int, default=5, help="每个模块的测量次数")
+    parser.add_argument("--top", type=int, default=10, help="显示累计耗时最多的模块数")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        try:
+            timings = [measure(module)[0] for _ in range(args.runs)]
+            _, importtime_output = measure(module, importtime=True)
+        except RuntimeError as e:
+            print(e)
+            continue
+
+        print(f"\n{module}: 中位数 {statistics.median(timings) * 1000:.1f} ms, "
+              f"最小 {min(timings) * 1000:.1f} ms ({args.runs} 次)")
+        for cumulative_us, name in top_imports(importtime_output, args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { BrowserRouter as Router, Routes, Route } from 'react-router-dom';
 import './App.css';
 
@@ -36,13 +36,20 @@ function App() {
   const [hiddenWindows, setHiddenWindows] = useState(new Set());
   const [focusedWindowId, setFocusedWindowId] = useState(null);
 
-  // WebSocket连接
+  // WebSocket连接（只订阅当前展板的事件）
+  const wsRef = useRef(null);
+  const subscribedBoardRef = useRef(null);
+
   useEffect(() => {
     const ws = new WebSocket('ws://localhost:8081/ws/logs');
+    wsRef.current = ws;
     
     ws.onopen = () => {
       console.log('WebSocket连接已建立');
       setIsConnected(true);
+      if (subscribedBoardRef.current) {
+        ws.send(JSON.stringify({ action: 'subscribe', boards: [subscribedBoardRef.current] }));
+      }
     };
     
     ws.onmessage = (event) => {
@@ -350,6 +357,21 @@ function App() {
     }
   }, [selectedBoard]);
 
+  // 切换展板时更新WebSocket订阅
+  useEffect(() => {
+    const ws = wsRef.current;
+    const boardId = selectedBoard ? selectedBoard.id : null;
+    const previousBoardId = subscribedBoardRef.current;
+    subscribedBoardRef.current = boardId;
+    if (!ws || ws.readyState !== WebSocket.OPEN || previousBoardId === boardId) return;
+    if (previousBoardId) {
+      ws.send(JSON.stringify({ action: 'unsubscribe', boards: [previousBoardId] }));
+    }
+    if (boardId) {
+      ws.send(JSON.stringify({ action: 'subscribe', boards: [boardId] }));
+    }
+  }, [selectedBoard]);
+
   // 快捷键处理
   useEffect(() => {
     const handleKeyPress = (event) => {
@@ -9,8 +9,8 @@ function Console({ onClose }) {
   const logsEndRef = useRef(null);
 
   useEffect(() => {
-    // 连接WebSocket（与后端 /ws/logs 对齐）
-    const ws = new WebSocket('ws://localhost:8081/ws/logs');
+    // 连接WebSocket（与后端 /ws/logs 对齐），控制台订阅所有展板的事件
+    const ws = new WebSocket('ws://localhost:8081/ws/logs?all=1');
     wsRef.current = ws;
 
     ws.onopen = () => {
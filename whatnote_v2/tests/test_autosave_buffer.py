@@ -0,0 +1,119 @@
+"""AutosaveBuffer：合并修改、写盘失败后放回内容并按间隔重试"""
+
+import threading
+import time
+
+from storage.autosave_buffer import AutosaveBuffer
+
+
+class _Disk:
+    """模拟 ContentManager 的 flush_window：take() 后写盘，失败时 restore() 并抛出异常"""
+
+    def __init__(self):
+        self.buffer = None
+        self.written = []
+        self.fail = 0
+        self.attempts = 0
+        self.lock = threading.Lock()
+
+    def flush_window(self, board_id, window_id):
+        content = self.buffer.take(board_id, window_id)
+        if content is None:
+            return
+        with self.lock:
+            self.attempts += 1
+            if self.fail:
+                self.fail -= 1
+                self.buffer.restore(board_id, window_id, content)
+                raise OSError("disk full")
+            self.written.append((window_id, content))
+
+
+def _buffer(disk, **kwargs):
+    options = {"idle": 0.02, "max_delay": 1.0, "max_pending_bytes": 1 << 20, "retry": 0.1}
+    options.update(kwargs)
+    disk.buffer = AutosaveBuffer(disk.flush_window, **options)
+    return disk.buffer
+
+
+def _wait_until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+
+def test_coalesces_to_latest_content():
+    disk = _Disk()
+    buffer = _buffer(disk, idle=0.05)
+    for text in ("a", "ab", "abc"):
+        buffer.put("b1", "w1", text)
+    assert buffer.get("b1", "w1") == "abc"
+    _wait_until(lambda: disk.written)
+    assert disk.written == [("w1", "abc")]
+    assert buffer.stats() == {"windows": 0, "bytes": 0}
+    buffer.close()
+
+
+def test_failed_flush_keeps_content_and_retries():
+    disk = _Disk()
+    disk.fail = 1
+    buffer = _buffer(disk)
+    buffer.put("b1", "w1", "draft")
+    _wait_until(lambda: disk.attempts == 1)
+    # 写盘失败后内容仍可读取，不会丢失
+    assert buffer.get("b1", "w1") == "draft"
+    failed_at = time.monotonic()
+    _wait_until(lambda: disk.written)
+    assert disk.written == [("w1", "draft")]
+    assert time.monotonic() - failed_at >= 0.05
+    assert not buffer.contains("b1", "w1")
+    buffer.close()
+
+
+def test_restore_keeps_newer_content():
+    disk = _Disk()
+    buffer = _buffer(disk, idle=10)
+    buffer.put("b1", "w1", "old")
+    taken = buffer.take("b1", "w1")
+    buffer.put("b1", "w1", "new")
+    buffer.restore("b1", "w1", taken)
+    assert buffer.get("b1", "w1") == "new"
+    assert buffer.stats()["bytes"] == len("new")
+    buffer.close()
+    assert disk.written == [("w1", "new")]
+
+
+def test_restore_after_take_counts_bytes_again():
+    disk = _Disk()
+    buffer = _buffer(disk, idle=10)
+    buffer.put("b1", "w1", "内容")
+    taken = buffer.take("b1", "w1")
+    assert buffer.stats() == {"windows": 0, "bytes": 0}
+    buffer.restore("b1", "w1", taken)
+    assert buffer.stats() == {"windows": 1, "bytes": len("内容".encode("utf-8"))}
+    buffer.close()
+
+
+def test_flush_by_board_and_failure_does_not_raise():
+    disk = _Disk()
+    buffer = _buffer(disk, idle=10)
+    buffer.put("b1", "w1", "one")
+    buffer.put("b2", "w2", "two")
+    disk.fail = 1
+    buffer.flush("b1")
+    assert buffer.get("b1", "w1") == "one"
+    assert buffer.get("b2", "w2") == "two"
+    buffer.flush("b1")
+    assert disk.written == [("w1", "one")]
+    assert buffer.contains("b2", "w2")
+    buffer.close()
+    assert disk.written == [("w1", "one"), ("w2", "two")]
+
+
+def test_put_after_close_returns_false():
+    disk = _Disk()
+    buffer = _buffer(disk)
+    buffer.close()
+    assert buffer.put("b1", "w1", "late") is False
+    assert not buffer.contains("b1", "w1")
@@ -0,0 +1,237 @@
+"""展板读写锁（RWLock、BoardLockManager）和事件循环侧闸门（AsyncBoardGates）"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from storage.board_locks import AsyncBoardGates, BoardLockManager, RWLock
+
+
+def _wait_until(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+
+# ---------- RWLock ----------
+
+def test_read_is_reentrant_and_shared():
+    lock = RWLock()
+    assert lock.acquire_read() is False
+    assert lock.acquire_read() is False
+    acquired = threading.Event()
+
+    def other_reader():
+        lock.acquire_read()
+        acquired.set()
+        lock.release_read()
+
+    thread = threading.Thread(target=other_reader)
+    thread.start()
+    assert acquired.wait(2)
+    thread.join()
+    lock.release_read()
+    lock.release_read()
+
+
+def test_writer_can_reenter_and_take_read():
+    lock = RWLock()
+    lock.acquire_write()
+    assert lock.acquire_write() is False
+    assert lock.acquire_read() is False
+    lock.release_read()
+    lock.release_write()
+    lock.release_write()
+    # 完全释放后其他线程可以获取写锁
+    thread = threading.Thread(target=lambda: (lock.acquire_write(), lock.release_write()))
+    thread.start()
+    thread.join(2)
+    assert not thread.is_alive()
+
+
+def test_reader_cannot_upgrade():
+    lock = RWLock()
+    lock.acquire_read()
+    with pytest.raises(RuntimeError):
+        lock.acquire_write()
+    lock.release_read()
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = RWLock()
+    order = []
+    lock.acquire_read()
+
+    def writer():
+        lock.acquire_write()
+        order.append("writer")
+        lock.release_write()
+
+    def late_reader():
+        contended = lock.acquire_read()
+        order.append(("reader", contended))
+        lock.release_read()
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    _wait_until(lock.has_waiting_writers)
+
+    reader_thread = threading.Thread(target=late_reader)
+    reader_thread.start()
+    time.sleep(0.05)
+    assert order == []
+
+    lock.release_read()
+    writer_thread.join(2)
+    reader_thread.join(2)
+    assert order == ["writer", ("reader", True)]
+
+
+# ---------- BoardLockManager ----------
+
+def test_before_write_runs_on_each_write():
+    flushed = []
+    locks = BoardLockManager(before_write=flushed.append)
+    with locks.write("b1"):
+        pass
+    with locks.read("b1"):
+        pass
+    assert flushed == ["b1"]
+
+
+def test_write_pending_and_boards_independent():
+    locks = BoardLockManager()
+    assert locks.write_pending("b1") is False
+    entered = threading.Event()
+    with locks.read("b1"):
+        writer = threading.Thread(target=lambda: _hold_write(locks, "b1", entered))
+        writer.start()
+        _wait_until(lambda: locks.write_pending("b1"))
+        # 其他展板不受影响
+        assert locks.write_pending("b2") is False
+        with locks.write("b2"):
+            pass
+        assert not entered.is_set()
+    writer.join(2)
+    assert entered.is_set()
+    assert locks.write_pending("b1") is False
+
+
+def _hold_write(locks, board_id, entered):
+    with locks.write(board_id):
+        entered.set()
+
+
+def test_window_locks_serialize_same_window_only():
+    locks = BoardLockManager()
+    inside = threading.Event()
+    release = threading.Event()
+
+    def hold_window():
+        with locks.window("b1", "w1"):
+            inside.set()
+            release.wait(2)
+
+    thread = threading.Thread(target=hold_window)
+    thread.start()
+    assert inside.wait(2)
+    # 同一展板的其他窗口可以并行修改
+    with locks.window("b1", "w2"):
+        pass
+    blocked = threading.Event()
+    done = threading.Event()
+
+    def same_window():
+        blocked.set()
+        with locks.window("b1", "w1"):
+            done.set()
+
+    other = threading.Thread(target=same_window)
+    other.start()
+    assert blocked.wait(2)
+    time.sleep(0.05)
+    assert not done.is_set()
+    release.set()
+    thread.join(2)
+    other.join(2)
+    assert done.is_set()
+
+
+# ---------- AsyncBoardGates ----------
+
+def test_gates_are_fifo_with_writer_blocking_later_readers():
+    order = []
+
+    async def use(gates, mode, name, hold: float = 0.0):
+        async with gates.hold(mode, "b1"):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def main():
+        gates = AsyncBoardGates()
+        first = asyncio.create_task(use(gates, "read", "reader1", 0.05))
+        await asyncio.sleep(0)
+        writer = asyncio.create_task(use(gates, "write", "writer", 0.02))
+        await asyncio.sleep(0)
+        reader2 = asyncio.create_task(use(gates, "read", "reader2"))
+        await asyncio.gather(first, writer, reader2)
+        assert gates.stats() == {"boards": 0, "windows": 0}
+
+    asyncio.run(main())
+    assert order == ["reader1", "writer", "reader2"]
+
+
+def test_gate_window_mode_serializes_same_window():
+    active = {"w1": 0}
+    peak = {"w1": 0}
+
+    async def edit(gates, window_id):
+        async with gates.hold("window", "b1", window_id):
+            active[window_id] = active.get(window_id, 0) + 1
+            peak[window_id] = max(peak.get(window_id, 0), active[window_id])
+            await asyncio.sleep(0.01)
+            active[window_id] -= 1
+
+    async def main():
+        gates = AsyncBoardGates()
+        await asyncio.gather(edit(gates, "w1"), edit(gates, "w1"), edit(gates, "w2"), edit(gates, "w2"))
+        assert gates.stats() == {"boards": 0, "windows": 0}
+
+    asyncio.run(main())
+    assert peak == {"w1": 1, "w2": 1}
+
+
+def test_cancelled_waiter_does_not_leak():
+    async def main():
+        gates = AsyncBoardGates()
+        holding = asyncio.Event()
+        release = asyncio.Event()
+
+        async def writer():
+            async with gates.hold("write", "b1"):
+                holding.set()
+                await release.wait()
+
+        async def waiter():
+            async with gates.hold("read", "b1"):
+                pass
+
+        first = asyncio.create_task(writer())
+        await holding.wait()
+        pending = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        release.set()
+        await first
+        # 取消的等待没有遗留占用，之后的写操作可以立即进入
+        await asyncio.wait_for(waiter(), 1)
+        async with gates.hold("write", "b1"):
+            pass
+        assert gates.stats() == {"boards": 0, "windows": 0}
+
+    asyncio.run(main())
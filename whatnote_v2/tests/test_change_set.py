@@ -0,0 +1,97 @@
+"""ChangeSet：同一时间窗口内的原始文件事件合并为净变化"""
+
+from storage.change_set import (
+    CHANGE_CREATED, CHANGE_DELETED, CHANGE_MODIFIED, CHANGE_MOVED, ChangeSet,
+)
+
+
+def test_created_then_modified_is_created():
+    changes = ChangeSet()
+    changes.created("a.md")
+    changes.modified("a.md")
+    changes.modified("a.md")
+    assert changes.changes() == [(CHANGE_CREATED, "a.md")]
+    assert changes.raw_events == 3
+
+
+def test_created_then_deleted_has_no_change():
+    changes = ChangeSet()
+    changes.created("a.md")
+    changes.modified("a.md")
+    changes.deleted("a.md")
+    assert changes.changes() == []
+
+
+def test_existing_file_modified_then_deleted_is_deleted():
+    changes = ChangeSet()
+    changes.modified("a.md")
+    changes.deleted("a.md")
+    assert changes.changes() == [(CHANGE_DELETED, "a.md")]
+
+
+def test_delete_then_create_is_modified():
+    """原子替换：删除后又创建同名文件"""
+    changes = ChangeSet()
+    changes.deleted("a.md")
+    changes.created("a.md")
+    assert changes.changes() == [(CHANGE_MODIFIED, "a.md")]
+
+
+def test_move_chain_collapses():
+    changes = ChangeSet()
+    changes.moved("a.md", "b.md")
+    changes.moved("b.md", "c.md")
+    assert changes.changes() == [(CHANGE_MOVED, "a.md", "c.md")]
+
+
+def test_move_back_to_origin_has_no_change():
+    changes = ChangeSet()
+    changes.moved("a.md", "b.md")
+    changes.moved("b.md", "a.md")
+    assert changes.changes() == []
+
+
+def test_created_then_moved_is_created_at_destination():
+    changes = ChangeSet()
+    changes.created("tmp.md")
+    changes.moved("tmp.md", "a.md")
+    assert changes.changes() == [(CHANGE_CREATED, "a.md")]
+
+
+def test_move_over_existing_file_deletes_it():
+    changes = ChangeSet()
+    changes.modified("b.md")
+    changes.moved("a.md", "b.md")
+    assert changes.changes() == [(CHANGE_DELETED, "b.md"), (CHANGE_MOVED, "a.md", "b.md")]
+
+
+def test_moved_then_modified_reports_both():
+    changes = ChangeSet()
+    changes.moved("a.md", "b.md")
+    changes.modified("b.md")
+    assert changes.changes() == [(CHANGE_MOVED, "a.md", "b.md"), (CHANGE_MODIFIED, "b.md")]
+
+
+def test_moved_then_deleted_deletes_origin():
+    changes = ChangeSet()
+    changes.moved("a.md", "b.md")
+    changes.deleted("b.md")
+    assert changes.changes() == [(CHANGE_DELETED, "a.md")]
+
+
+def test_changes_ordered_deleted_moved_created_modified():
+    changes = ChangeSet()
+    changes.modified("m.md")
+    changes.created("new.md")
+    changes.moved("old.md", "renamed.md")
+    changes.deleted("gone.md")
+    assert [change[0] for change in changes.changes()] == [
+        CHANGE_DELETED, CHANGE_MOVED, CHANGE_CREATED, CHANGE_MODIFIED,
+    ]
+
+
+def test_created_sidecars_come_before_content_files():
+    changes = ChangeSet()
+    changes.created("a.md")
+    changes.created("a.md.json")
+    assert changes.changes() == [(CHANGE_CREATED, "a.md.json"), (CHANGE_CREATED, "a.md")]
@@ -0,0 +1,88 @@
+"""Debouncer：尾沿交付、最长等待、待交付数量上限"""
+
+import asyncio
+
+from storage.debouncer import Debouncer
+
+
+def _run(scenario):
+    """在新的事件循环中执行 scenario(debouncer, delivered)，返回交付的批次"""
+    delivered = []
+
+    async def main():
+        debouncer = Debouncer(delivered.append, max_wait=0.3, max_pending=100)
+        await scenario(debouncer, delivered)
+
+    asyncio.run(main())
+    return delivered
+
+
+def test_repeated_touches_deliver_once_with_last_value():
+    async def scenario(debouncer, delivered):
+        for value in range(5):
+            debouncer.touch("a", 0.05, value)
+            await asyncio.sleep(0.01)
+        assert delivered == []
+        await asyncio.sleep(0.1)
+
+    assert _run(scenario) == [[("a", 4)]]
+
+
+def test_keys_are_debounced_independently():
+    async def scenario(debouncer, delivered):
+        debouncer.touch("slow", 0.15, 1)
+        debouncer.touch("fast", 0.02, 2)
+        await asyncio.sleep(0.08)
+        assert delivered == [[("fast", 2)]]
+        await asyncio.sleep(0.15)
+
+    assert _run(scenario) == [[("fast", 2)], [("slow", 1)]]
+
+
+def test_max_wait_bounds_continuous_touches():
+    async def scenario(debouncer, delivered):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        while not delivered and loop.time() - started < 1.0:
+            debouncer.touch("a", 0.1, "latest")
+            await asyncio.sleep(0.02)
+        assert delivered
+        assert loop.time() - started < 0.5
+
+    assert _run(scenario)[0] == [("a", "latest")]
+
+
+def test_entry_removed_after_delivery():
+    async def scenario(debouncer, delivered):
+        debouncer.touch("a", 0.02)
+        assert len(debouncer) == 1
+        await asyncio.sleep(0.06)
+        assert len(debouncer) == 0
+
+    _run(scenario)
+
+
+def test_overflow_delivers_earliest_instead_of_dropping():
+    delivered = []
+
+    async def main():
+        debouncer = Debouncer(delivered.append, max_wait=10, max_pending=2)
+        debouncer.touch("a", 1.0, 1)
+        debouncer.touch("b", 2.0, 2)
+        debouncer.touch("c", 3.0, 3)
+        assert delivered == [[("a", 1)]]
+        assert len(debouncer) == 2
+        debouncer.flush()
+
+    asyncio.run(main())
+    assert delivered == [[("a", 1)], [("b", 2), ("c", 3)]]
+
+
+def test_flush_delivers_everything_pending():
+    async def scenario(debouncer, delivered):
+        debouncer.touch("a", 10, 1)
+        debouncer.touch("b", 10, 2)
+        debouncer.flush()
+        assert len(debouncer) == 0
+
+    assert _run(scenario) == [[("a", 1), ("b", 2)]]
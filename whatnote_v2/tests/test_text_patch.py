@@ -0,0 +1,88 @@
+"""apply_text_patch：插入/删除/替换、顺序应用、越界和 expect 校验"""
+
+import pytest
+
+from storage.text_patch import TextPatchError, apply_text_patch
+
+
+def test_insert_delete_replace():
+    assert apply_text_patch("hello world", [{"start": 5, "end": 5, "text": ","}]) == "hello, world"
+    assert apply_text_patch("hello world", [{"start": 5, "end": 11, "text": ""}]) == "hello"
+    assert apply_text_patch("hello world", [{"start": 6, "end": 11, "text": "there"}]) == "hello there"
+
+
+def test_end_defaults_to_start():
+    assert apply_text_patch("ac", [{"start": 1, "text": "b"}]) == "abc"
+
+
+def test_ops_apply_to_previous_result():
+    ops = [
+        {"start": 0, "end": 0, "text": "ab"},
+        {"start": 2, "end": 2, "text": "cd"},
+        {"start": 1, "end": 3, "text": "X"},
+    ]
+    assert apply_text_patch("", ops) == "aXd"
+
+
+def test_positions_count_code_points():
+    assert apply_text_patch("你好世界", [{"start": 2, "end": 4, "text": "😀"}]) == "你好😀"
+
+
+def test_empty_ops_returns_text_unchanged():
+    assert apply_text_patch("abc", []) == "abc"
+
+
+def test_bounds_at_edges_are_accepted():
+    assert apply_text_patch("abc", [{"start": 3, "end": 3, "text": "d"}]) == "abcd"
+    assert apply_text_patch("abc", [{"start": 0, "end": 3, "text": ""}]) == ""
+
+
+@pytest.mark.parametrize("op", [
+    {"start": -1, "end": 0, "text": "x"},
+    {"start": 0, "end": 4, "text": ""},
+    {"start": 4, "end": 4, "text": "x"},
+    {"start": 2, "end": 1, "text": ""},
+])
+def test_out_of_bounds_rejected(op):
+    with pytest.raises(TextPatchError):
+        apply_text_patch("abc", [op])
+
+
+@pytest.mark.parametrize("ops", [
+    {"start": 0},
+    [["start", 0]],
+    [{"end": 1, "text": "x"}],
+    [{"start": "0", "end": 1}],
+    [{"start": True, "end": True}],
+    [{"start": 0, "end": 0, "text": 1}],
+])
+def test_malformed_ops_rejected(ops):
+    with pytest.raises(TextPatchError):
+        apply_text_patch("abc", ops)
+
+
+def test_expect_matches():
+    ops = [{"start": 0, "end": 5, "text": "HELLO", "expect": "hello"}]
+    assert apply_text_patch("hello world", ops) == "HELLO world"
+
+
+def test_expect_mismatch_rejected():
+    ops = [{"start": 0, "end": 5, "text": "HELLO", "expect": "howdy"}]
+    with pytest.raises(TextPatchError):
+        apply_text_patch("hello world", ops)
+
+
+def test_expect_checked_against_previous_result():
+    ops = [
+        {"start": 0, "end": 0, "text": ">"},
+        {"start": 1, "end": 6, "text": "bye", "expect": "hello"},
+    ]
+    assert apply_text_patch("hello", ops) == ">bye"
+    with pytest.raises(TextPatchError):
+        apply_text_patch("hello", [ops[0], dict(ops[1], start=0, end=5)])
+
+
+def test_failed_patch_is_value_error():
+    """调用方按 ValueError 返回 400"""
+    with pytest.raises(ValueError):
+        apply_text_patch("abc", [{"start": 10}])
@@ -0,0 +1,104 @@
+"""分块上传会话：已接收区间的合并、乱序和重复分块、完成校验"""
+
+import hashlib
+
+import pytest
+
+from storage.file_manager import FileSystemManager
+from storage.upload_sessions import UploadSessionError, UploadSessionManager, _merge_range
+
+
+@pytest.mark.parametrize("ranges, start, end, expected", [
+    ([], 0, 4, [[0, 4]]),
+    ([[0, 4]], 4, 8, [[0, 8]]),
+    ([[4, 8]], 0, 4, [[0, 8]]),
+    ([[0, 4]], 6, 8, [[0, 4], [6, 8]]),
+    ([[0, 4], [6, 8]], 4, 6, [[0, 8]]),
+    ([[0, 4], [6, 8]], 2, 7, [[0, 8]]),
+    ([[2, 6]], 3, 5, [[2, 6]]),
+    ([[0, 2], [4, 6], [8, 10]], 1, 9, [[0, 10]]),
+    ([[0, 4]], 0, 4, [[0, 4]]),
+])
+def test_merge_range(ranges, start, end, expected):
+    assert _merge_range(ranges, start, end) == expected
+
+
+def test_merge_range_does_not_mutate_input():
+    ranges = [[0, 4]]
+    _merge_range(ranges, 2, 8)
+    assert ranges == [[0, 4]]
+
+
+@pytest.fixture
+def board(tmp_path):
+    file_manager = FileSystemManager(tmp_path)
+    course = file_manager.create_course("课程", "")
+    board = file_manager.create_board(course["id"], "展板")
+    file_manager.board_index.rebuild()
+    return UploadSessionManager(file_manager), board["id"]
+
+
+def _send(sessions, board_id, session_id, data: bytes, offset: int, length: int):
+    f, _ = sessions.open_chunk(board_id, session_id, offset)
+    with f:
+        f.write(data[offset:offset + length])
+    return sessions.commit_chunk(board_id, session_id, offset, length)
+
+
+def test_out_of_order_and_duplicate_chunks(board):
+    sessions, board_id = board
+    data = bytes(range(10)) * 3
+    session = sessions.create_session(board_id, "a.bin", "file", len(data))
+    session_id = session["session_id"]
+    assert session["ranges"] == [] and not session["complete"]
+
+    view = _send(sessions, board_id, session_id, data, 20, 10)
+    assert view["ranges"] == [[20, 30]]
+    view = _send(sessions, board_id, session_id, data, 0, 8)
+    assert view["ranges"] == [[0, 8], [20, 30]]
+    assert view["received"] == 18
+    # 重发已接收的分块不会重复计数
+    view = _send(sessions, board_id, session_id, data, 4, 4)
+    assert view["received"] == 18
+    view = _send(sessions, board_id, session_id, data, 8, 12)
+    assert view["ranges"] == [[0, 30]]
+    assert view["complete"]
+
+    # 会话状态落盘，重新读取时区间不变
+    assert sessions.get_session(board_id, session_id)["ranges"] == [[0, 30]]
+    result = sessions.complete_session(board_id, session_id, sha256=hashlib.sha256(data).hexdigest())
+    assert result["path"].read_bytes() == data
+    assert result["size"] == len(data)
+
+
+def test_complete_requires_every_byte(board):
+    sessions, board_id = board
+    data = b"x" * 16
+    session_id = sessions.create_session(board_id, "a.bin", "file", len(data))["session_id"]
+    _send(sessions, board_id, session_id, data, 0, 8)
+    _send(sessions, board_id, session_id, data, 10, 6)
+    with pytest.raises(UploadSessionError):
+        sessions.complete_session(board_id, session_id)
+
+
+def test_complete_checks_sha256(board):
+    sessions, board_id = board
+    data = b"content"
+    session_id = sessions.create_session(board_id, "a.txt", "text", len(data))["session_id"]
+    _send(sessions, board_id, session_id, data, 0, len(data))
+    with pytest.raises(UploadSessionError):
+        sessions.complete_session(board_id, session_id, sha256="0" * 64)
+
+
+def test_offset_out_of_bounds_rejected(board):
+    sessions, board_id = board
+    session_id = sessions.create_session(board_id, "a.bin", "file", 8)["session_id"]
+    for offset in (-1, 9):
+        with pytest.raises(UploadSessionError):
+            sessions.open_chunk(board_id, session_id, offset)
+
+
+def test_invalid_session_id_rejected(board):
+    sessions, board_id = board
+    with pytest.raises(UploadSessionError):
+        sessions.get_session(board_id, "../evil")